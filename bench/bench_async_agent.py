@@ -0,0 +1,75 @@
+"""Compare sync and async support_agent throughput against the fake OpenAI server.
+
+Usage:
+    uv run python bench/bench_async_agent.py --conversations 200 --concurrency 100
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench.fake_openai import serve
+from bench.offline import discard_logs
+from order_store import fresh_refunds
+
+QUERIES = [
+    "What's the status of order ORD-1001?",
+    "I want a refund for order ORD-1002",
+    "How do I reset my password?",
+    "What's the status of order ORD-9999?",
+    "Can I integrate Acme with Slack?",
+    "Please refund order ORD-1003, I changed my mind.",
+]
+
+
+def bench_sync(support_agent, n: int) -> float:
+    start = time.perf_counter()
+    for i in range(n):
+        with fresh_refunds():
+            support_agent(QUERIES[i % len(QUERIES)])
+    return time.perf_counter() - start
+
+
+async def bench_async(support_agent_async, n: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            with fresh_refunds():
+                await support_agent_async(QUERIES[i % len(QUERIES)])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake model latency per completion (s)")
+    parser.add_argument("--sync-conversations", type=int, default=20, help="The sync baseline is slow; run fewer")
+    args = parser.parse_args()
+    discard_logs()
+
+    with serve(latency=args.latency) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+        from solution.agent import support_agent, support_agent_async
+
+        sync_elapsed = bench_sync(support_agent, args.sync_conversations)
+        async_elapsed = asyncio.run(bench_async(support_agent_async, args.conversations, args.concurrency))
+
+    sync_rate = args.sync_conversations / sync_elapsed
+    async_rate = args.conversations / async_elapsed
+    print(f"sync : {args.sync_conversations:>5} conversations in {sync_elapsed:6.2f}s  ({sync_rate:7.1f} conv/s)")
+    print(f"async: {args.conversations:>5} conversations in {async_elapsed:6.2f}s  ({async_rate:7.1f} conv/s, concurrency={args.concurrency})")
+    print(f"speedup: {async_rate / sync_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
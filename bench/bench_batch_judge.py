@@ -0,0 +1,138 @@
+"""Per-row vs batched BrandGuidelines judging: tokens, requests and time per row.
+
+Judges --rows (input, output) pairs built from the init.py DATASET with the
+per-row LLMClassifier and with BatchClassifier at each --batch size, with
+--concurrency rows asking for a verdict at once (as in an Eval). Reports
+judge requests, prompt and completion tokens per row, wall-clock time per
+row, per-row latency percentiles, fallbacks to per-row judging, and how
+often a batched verdict agrees with the per-row one.
+
+Batching cuts prompt tokens and requests per row, but one request now
+decodes every row's verdict in sequence, so with unlimited parallel requests
+a batch finishes later than the per-row calls it replaces. Under a request
+rate limit (--rps) fewer requests mean less waiting, and batching wins on
+time as well.
+
+Against the fake server, completion time grows with --token-latency per
+token and the verdicts are synthetic, so agreement is trivially 100%. Pass
+--live to use the real OpenAI API (OPENAI_API_KEY) and check agreement;
+token counts then come from the responses' usage.
+
+Usage:
+    uv run python bench/bench_batch_judge.py --rows 64 --batch 4 8 16
+    uv run python bench/bench_batch_judge.py --live --rows 32 --batch 8
+"""
+
+import argparse
+import asyncio
+import contextlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench.fake_openai import serve
+from bench.offline import discard_logs
+from bench.run import percentile
+from init import DATASET
+
+
+def judge_rows(n: int) -> list[dict]:
+    return [{"input": DATASET[i % len(DATASET)]["input"], "output": DATASET[i % len(DATASET)]["expected"]} for i in range(n)]
+
+
+class UsageCounter:
+    """Sums the usage of every judge response, for --live runs."""
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.requests = 0
+
+    async def __call__(self, response):
+        await response.aread()
+        usage = response.json().get("usage") or {}
+        self.prompt_tokens += usage.get("prompt_tokens", 0)
+        self.completion_tokens += usage.get("completion_tokens", 0)
+        self.requests += 1
+
+
+async def run_mode(judge, rows: list[dict], concurrency: int) -> tuple[float, list[float], list]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(row):
+        async with semaphore:
+            start = time.perf_counter()
+            score = await judge.eval_async(**row)
+            latencies.append(time.perf_counter() - start)
+            return score
+
+    start = time.perf_counter()
+    scores = await asyncio.gather(*(one(row) for row in rows))
+    return time.perf_counter() - start, latencies, scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=64)
+    parser.add_argument("--batch", type=int, nargs="+", default=[4, 8, 16], help="Batch sizes to compare with per-row")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--wait-ms", type=float, default=50)
+    parser.add_argument("--latency", type=float, default=0.3, help="Fake model latency per request (s)")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="Fake model seconds per completion token")
+    parser.add_argument("--rps", type=float, default=None, help="Fake server request rate limit (429 with Retry-After above it)")
+    parser.add_argument("--live", action="store_true", help="Use the real OpenAI API instead of the fake server")
+    args = parser.parse_args()
+
+    os.environ["SCORE_CACHE"] = "off"
+    discard_logs()
+
+    with contextlib.ExitStack() as stack:
+        server = None
+        if not args.live:
+            server = stack.enter_context(serve(latency=args.latency, token_latency=args.token_latency, rps=args.rps))
+            os.environ["OPENAI_BASE_URL"] = server.base_url
+            os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+        from solution.batch_judge import BatchClassifier
+        from solution.scorers import BRAND_QUESTION, BRAND_ROW, BRAND_RUBRIC, _brand_guidelines_scorer
+
+        usage = UsageCounter()
+        if args.live:
+            import httpx
+            from autoevals import init
+            from openai import AsyncOpenAI
+
+            init(client=AsyncOpenAI(http_client=httpx.AsyncClient(event_hooks={"response": [usage]})))
+        counter = server or usage
+        rows = judge_rows(args.rows)
+
+        async def run_all():
+            modes = [("per-row", _brand_guidelines_scorer)] + [
+                (f"batch {size}", BatchClassifier(_brand_guidelines_scorer, BRAND_RUBRIC, BRAND_ROW, BRAND_QUESTION, size, args.wait_ms / 1000))
+                for size in args.batch
+            ]
+            print(f"{'mode':<10} {'requests':>8} {'prompt/row':>10} {'compl/row':>10} {'ms/row':>8} {'p50 ms':>8} {'p95 ms':>8} {'fallbacks':>9} {'agree':>6}")
+            reference = None
+            for name, judge in modes:
+                before = (counter.requests, counter.prompt_tokens, counter.completion_tokens)
+                elapsed, latencies, scores = await run_mode(judge, rows, args.concurrency)
+                requests = counter.requests - before[0]
+                prompt = (counter.prompt_tokens - before[1]) / len(rows)
+                completion = (counter.completion_tokens - before[2]) / len(rows)
+                verdicts = [score.score for score in scores]
+                reference = reference or verdicts
+                agree = sum(a == b for a, b in zip(verdicts, reference)) / len(rows)
+                values = sorted(latencies)
+                fallbacks = getattr(judge, "fallbacks", 0)
+                print(
+                    f"{name:<10} {requests:>8} {prompt:>10.0f} {completion:>10.0f} {elapsed / len(rows) * 1000:>8.1f} "
+                    f"{percentile(values, 50) * 1000:>8.0f} {percentile(values, 95) * 1000:>8.0f} {fallbacks:>9} {agree:>6.0%}"
+                )
+
+        asyncio.run(run_all())
+
+
+if __name__ == "__main__":
+    main()
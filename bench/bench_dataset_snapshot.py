@@ -0,0 +1,103 @@
+"""Check and time solution/dataset_snapshot.py against a fake BTQL endpoint.
+
+Builds a dataset of --rows rows in bench/fake_btql.py, then reads it through
+DatasetSnapshots in turn:
+  download   no snapshot yet: every row is fetched page by page
+  hit        nothing changed: only the version query is sent
+  edit       --changes rows edited and as many added: only those are fetched
+  delete     --changes rows deleted: the live ids are streamed in as well
+  racing     two readers refresh the same snapshot at once, interleaved
+After each pass the rows read, and the snapshot left on disk, must equal the
+live dataset; any difference exits with an error. Reports requests, records
+fetched and seconds per pass.
+
+Usage:
+    uv run python bench/bench_dataset_snapshot.py --rows 100000 --changes 1000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench.fake_btql import FakeDataset, FakeStore
+from solution.dataset_snapshot import DatasetSnapshots, _read, _row
+
+PROJECT, NAME = "bench-project", "bench-dataset"
+
+
+def check(label: str, rows: list[dict], store: FakeStore, snapshots: DatasetSnapshots):
+    live = {row["id"]: _row(row) for row in store.rows.values()}
+    read = {row["id"]: row for row in rows}
+    folder = snapshots._folder(PROJECT, NAME)
+    manifest = snapshots._manifest(folder)
+    on_disk = {row["id"]: row for row in _read(os.path.join(folder, manifest["file"]))}
+    leftovers = [name for name in os.listdir(folder) if name.endswith((".partial", ".sqlite"))]
+    if len(rows) != len(read) or read != live or on_disk != live or manifest["rows"] != len(live) or leftovers:
+        sys.exit(f"{label}: snapshot differs from the live dataset (read {len(rows)}, live {len(live)}, left {leftovers})")
+
+
+def timed(label: str, store: FakeStore, snapshots: DatasetSnapshots, read) -> list[dict]:
+    requests, records = store.requests, store.records_sent
+    start = time.perf_counter()
+    rows = read()
+    seconds = time.perf_counter() - start
+    check(label, rows, store, snapshots)
+    print(f"{label:<9} {store.requests - requests:>8} {store.records_sent - records:>8} {seconds:>8.2f}  {snapshots.stats()}")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--changes", type=int, default=1000, help="Rows edited, added and deleted")
+    args = parser.parse_args()
+
+    store = FakeStore()
+    for i in range(args.rows):
+        store.insert({"id": f"row-{i}", "input": f"question {i}", "expected": f"answer {i}", "metadata": {"i": i}})
+
+    with tempfile.TemporaryDirectory() as directory:
+        snapshots = DatasetSnapshots(directory)
+
+        def read():
+            return list(snapshots._rows(PROJECT, NAME, FakeDataset(store)))
+
+        print(f"{'pass':<9} {'requests':>8} {'records':>8} {'seconds':>8}")
+        timed("download", store, snapshots, read)
+        timed("hit", store, snapshots, read)
+
+        step = max(1, args.rows // args.changes)
+        for i in range(0, args.rows, step)[:args.changes]:
+            store.update(f"row-{i}", expected=f"edited answer {i}")
+            store.insert({"id": f"new-{i}", "input": f"new question {i}", "expected": f"new answer {i}"})
+        timed("edit", store, snapshots, read)
+
+        for i in range(1, args.rows, step)[:args.changes]:
+            store.delete(f"row-{i}")
+        timed("delete", store, snapshots, read)
+
+        # Both readers start from the same snapshot and write the same new version
+        store.update("row-2", expected="raced")
+
+        def race():
+            first = snapshots._rows(PROJECT, NAME, FakeDataset(store))
+            second = snapshots._rows(PROJECT, NAME, FakeDataset(store))
+            rows, other = [], []
+            for a, b in zip(first, second):
+                rows.append(a)
+                other.append(b)
+            rows.extend(first)
+            other.extend(second)
+            check("racing (second reader)", other, store, snapshots)
+            return rows
+
+        timed("racing", store, snapshots, race)
+    print("Every pass matched the live dataset")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Stream a large generated transcript file through init.py's incremental upload.
+
+Uploads into a local JSONL sink, so no API key is needed. Runs the load three
+times: once interrupted part-way, once resuming, and once more with nothing
+to do, reporting time and the process's peak RSS after each.
+
+Usage:
+    uv run python bench/bench_dataset_upload.py --rows 1000000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import resource
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from init import UploadState, JsonlSink, read_rows, upload
+
+
+class Interrupted(Exception):
+    pass
+
+
+class InterruptingSink(JsonlSink):
+    """Fails on the flush after `limit` rows, like a load killed mid-way."""
+
+    def __init__(self, path: str, limit: int):
+        super().__init__(path)
+        self.limit = limit
+        self.rows = 0
+
+    def insert(self, **row):
+        self.rows += 1
+        return super().insert(**row)
+
+    def flush(self):
+        if self.rows >= self.limit:
+            raise Interrupted
+        super().flush()
+
+
+def generate(path: str, rows: int):
+    with open(path, "w") as f:
+        for i in range(rows):
+            f.write(json.dumps({
+                "input": f"What's the status of order ORD-{i}?",
+                "expected": f"Order ORD-{i} has shipped.",
+                "metadata": {"category": "order_lookup", "expected_tool_path": ["lookup_order"]},
+            }) + "\n")
+
+
+def timed_load(label: str, path: str, sink, state_path: str, batch_size: int):
+    state = UploadState(state_path, "bench")
+    stat = os.stat(path)
+    fingerprint = f"{stat.st_size}:{stat.st_mtime_ns}"
+    start = state.resume_point(path, fingerprint)
+    began = time.perf_counter()
+    try:
+        stats = upload(read_rows(path, start), sink, state, path, fingerprint, start=start, batch_size=batch_size)
+    except Interrupted:
+        stats = {"read": state.resume_point(path, fingerprint), "uploaded": "?", "unchanged": "?"}
+    elapsed = time.perf_counter() - began
+    # ru_maxrss is in KiB on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    print(
+        f"{label:<11} resumed at {start:>8}, read up to {stats['read']:>8}, uploaded {stats['uploaded']:>8} "
+        f"in {elapsed:6.2f}s, peak RSS {peak / 1024 / 1024:6.1f} MiB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "transcripts.jsonl")
+        sink_path = os.path.join(tmp, "sink.jsonl")
+        state_path = os.path.join(tmp, "state.sqlite")
+        generate(source, args.rows)
+
+        timed_load("interrupted", source, InterruptingSink(sink_path, args.rows // 3), state_path, args.batch_size)
+        timed_load("resumed", source, JsonlSink(sink_path), state_path, args.batch_size)
+        timed_load("rerun", source, JsonlSink(sink_path), state_path, args.batch_size)
+
+        with open(sink_path) as f:
+            sent = sum(1 for _ in f)
+        # The interrupted batch was sent but never recorded, so it is sent again
+        print(f"sink holds {sent} rows for {args.rows} source rows")
+
+
+if __name__ == "__main__":
+    main()
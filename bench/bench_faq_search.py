@@ -0,0 +1,92 @@
+"""Compare BM25 and embedding FAQ retrieval on paraphrases, and time batched search.
+
+Accuracy is measured on hand-written paraphrases of the FAQ questions plus
+queries that should find nothing. Timing uses a synthetic knowledge base of
+--faqs entries and compares one query at a time with one batched search.
+
+Usage:
+    uv run python bench/bench_faq_search.py --faqs 20000 --queries 512
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from data import FAQS
+from faq_embeddings import FAQ_EMBEDDINGS, FAQEmbeddings
+from faq_index import FAQ_INDEX
+
+# (query, expected FAQ question or None for no match)
+PARAPHRASES = [
+    ("How can I pay?", "What payment methods do you accept?"),
+    ("Which payment options are available?", "What payment methods do you accept?"),
+    ("I need to change my password", "How do I reset my password?"),
+    ("Is there a trial period?", "Do you offer a free trial?"),
+    ("How do I end my subscription?", "How do I cancel my subscription?"),
+    ("Can I get my money back on a refunded plan?", "What is your refund policy?"),
+    ("How do I reach support?", "How do I contact support?"),
+    ("Can I integrate Acme with Slack?", None),
+    ("Do you have an Android app?", None),
+    ("What's the weather like today?", None),
+]
+
+
+def accuracy(search) -> float:
+    correct = 0
+    for query, expected in PARAPHRASES:
+        hits = search(query)
+        found = hits[0][1]["question"] if hits else None
+        correct += found == expected
+    return correct / len(PARAPHRASES)
+
+
+def synthetic_faqs(n: int) -> list[dict]:
+    rng = random.Random(0)
+    words = sorted({w for faq in FAQS for w in (faq["question"] + " " + faq["answer"]).lower().split()})
+    return [
+        {"question": " ".join(rng.choices(words, k=8)), "answer": " ".join(rng.choices(words, k=20))}
+        for _ in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--faqs", type=int, default=20000, help="Synthetic knowledge base size for timing")
+    parser.add_argument("--queries", type=int, default=512)
+    args = parser.parse_args()
+
+    print(f"paraphrase accuracy: bm25 {accuracy(lambda q: FAQ_INDEX.search(q, k=1)):.0%}, "
+          f"embeddings {accuracy(lambda q: FAQ_EMBEDDINGS.search(q, k=1)):.0%}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        # The matrix is built or loaded on first use
+        index = FAQEmbeddings(synthetic_faqs(args.faqs), directory=directory)
+        index.matrix
+        built = time.perf_counter() - start
+        start = time.perf_counter()
+        FAQEmbeddings(index.faqs, directory=directory).matrix
+        loaded = time.perf_counter() - start
+
+        queries = [query for query, _ in PARAPHRASES] * (args.queries // len(PARAPHRASES) + 1)
+        queries = queries[:args.queries]
+        start = time.perf_counter()
+        for query in queries:
+            index.search(query, k=3)
+        single = time.perf_counter() - start
+        start = time.perf_counter()
+        index.search_batch(queries, k=3)
+        batched = time.perf_counter() - start
+
+    print(f"{args.faqs} FAQs: build {built:.2f}s, memory-mapped load {loaded * 1000:.1f}ms")
+    print(f"{args.queries} queries: one at a time {single * 1000:.1f}ms, batched {batched * 1000:.1f}ms "
+          f"({single / batched:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Compare the agent with and without the intent router and response templates.
+
+Runs every init.py DATASET row through support_agent_async in three setups
+(no fast paths, router only, router and templates) and scores each answer
+with the eval's BrandGuidelines, Faithfulness and expected_tool_path scorers.
+Reports model rounds, tokens, estimated gpt-4o-mini cost, latency and mean
+scores per setup.
+
+Against the fake server the judge scores are synthetic; pass --live to use
+the real OpenAI API (OPENAI_API_KEY) and check that the scores hold up.
+
+Usage:
+    uv run python bench/bench_fast_paths.py
+    uv run python bench/bench_fast_paths.py --live --repeats 3
+"""
+
+import argparse
+import asyncio
+import contextlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench.fake_openai import serve
+from bench.offline import discard_logs
+from bench.run import percentile
+from order_store import fresh_refunds
+from init import DATASET
+
+# gpt-4o-mini list prices, USD per token
+INPUT_PRICE = 0.15 / 1_000_000
+OUTPUT_PRICE = 0.60 / 1_000_000
+
+SETUPS = {
+    "model only": (False, False),
+    "router": (True, False),
+    "router + templates": (True, True),
+}
+
+
+async def run_setup(rows: list[dict], concurrency: int) -> tuple[list[float], dict]:
+    from braintrust import start_span
+
+    from solution.agent import support_agent_async
+    from solution.scorers import brand_guidelines, expected_tool_path, faithfulness
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    scores = {}
+
+    async def one(row):
+        async with semaphore:
+            with start_span(name="bench-row"), fresh_refunds():
+                start = time.perf_counter()
+                output = await support_agent_async(row["input"])
+                latencies.append(time.perf_counter() - start)
+                kwargs = {"input": row["input"], "output": output, "expected": row["expected"], "metadata": row["metadata"]}
+                for scorer in (brand_guidelines, faithfulness, expected_tool_path):
+                    with start_span(name=scorer.__name__, type="score"):
+                        result = await scorer(**kwargs)
+                    if result is not None and result.score is not None:
+                        scores.setdefault(result.name, []).append(result.score)
+
+    await asyncio.gather(*(one(row) for row in rows))
+    return latencies, {name: sum(values) / len(values) for name, values in sorted(scores.items())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--live", action="store_true", help="Use the real OpenAI API instead of the fake server")
+    parser.add_argument("--repeats", type=int, default=5, help="Passes over the dataset per setup")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake model latency per completion (s)")
+    args = parser.parse_args()
+
+    os.environ["LLM_CACHE_MODE"] = "passthrough"
+    os.environ["SCORE_CACHE"] = "off"
+    discard_logs()
+
+    with contextlib.ExitStack() as stack:
+        if not args.live:
+            server = stack.enter_context(serve(latency=args.latency))
+            os.environ["OPENAI_BASE_URL"] = server.base_url
+            os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+        from solution.agent_metrics import COMPLETION_TOKENS, LLM_SECONDS, PROMPT_TOKENS
+        from solution.router import ROUTER
+        from solution.templates import RESPONSE_TEMPLATES
+
+        async def run_all():
+            print(f"{'setup':<20} {'rounds':>7} {'tokens':>8} {'$/1k conv':>10} {'p50 ms':>8} {'p95 ms':>8}  scores")
+            for name, (route, template) in SETUPS.items():
+                ROUTER.enabled, RESPONSE_TEMPLATES.enabled = route, template
+                before = (LLM_SECONDS.totals()[1], PROMPT_TOKENS.totals()[0], COMPLETION_TOKENS.totals()[0])
+                latencies, scores = await run_setup(DATASET * args.repeats, args.concurrency)
+                rounds = LLM_SECONDS.totals()[1] - before[0]
+                prompt = PROMPT_TOKENS.totals()[0] - before[1]
+                completion = COMPLETION_TOKENS.totals()[0] - before[2]
+                cost = (prompt * INPUT_PRICE + completion * OUTPUT_PRICE) / len(latencies) * 1000
+                values = sorted(latencies)
+                print(
+                    f"{name:<20} {rounds:>7} {int(prompt + completion):>8} {cost:>10.4f} "
+                    f"{percentile(values, 50) * 1000:>8.0f} {percentile(values, 95) * 1000:>8.0f}  "
+                    + "  ".join(f"{scorer} {mean:.2f}" for scorer, mean in scores.items())
+                )
+
+        asyncio.run(run_all())
+
+
+if __name__ == "__main__":
+    main()
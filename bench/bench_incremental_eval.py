@@ -0,0 +1,120 @@
+"""Full vs incremental re-evaluation after a change to one tool.
+
+Runs solution/eval_agent.py over --repeats copies of the init.py DATASET
+against the fake OpenAI server three times:
+  1. baseline: every row runs and records its fingerprint
+  2. search_faq changed: incremental against run 1, so only rows that
+     searched the FAQ run again
+  3. nothing changed: incremental against run 1, so every row is reused
+and reports rows rerun/reused per category, model requests, wall time and
+mean scores. The change in run 2 is a patched search_faq with a different
+body; a real edit to solution/agent.py fingerprints the same way.
+
+Usage:
+    uv run python bench/bench_incremental_eval.py --repeats 4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench.bench_sharded_eval import EVAL_FILE, write_snapshot
+from bench.fake_openai import serve
+from bench.offline import discard_logs
+from init import DATASET
+
+
+def changed_search_faq(query: str) -> str:
+    """search_faq with a stricter match threshold."""
+    from faq_embeddings import FAQ_EMBEDDINGS
+
+    hits = FAQ_EMBEDDINGS.search(query, k=1, min_similarity=0.2)
+    if hits:
+        return json.dumps(hits[0][1])
+    return json.dumps({"question": "No match", "answer": "I couldn't find a relevant FAQ entry. Please contact support@acme.com."})
+
+
+async def run_eval(path: str) -> tuple[list, float]:
+    from braintrust import EvalAsync
+
+    from solution.sharded_eval import QUIET, load_evaluator
+
+    evaluator = load_evaluator(EVAL_FILE)
+    start = time.perf_counter()
+    result = await EvalAsync(
+        evaluator.project_name,
+        data=evaluator.data,
+        task=evaluator.task,
+        scores=evaluator.scores,
+        no_send_logs=True,
+        reporter=QUIET,
+    )
+    elapsed = time.perf_counter() - start
+    with open(path, "w") as f:
+        for row in result.results:
+            f.write(json.dumps({"output": row.output, "scores": row.scores, "metadata": row.metadata, "error": None if row.error is None else repr(row.error)}, default=str) + "\n")
+    return result.results, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=4, help="Copies of the dataset")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake model latency per completion (s)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, serve(latency=args.latency) as server:
+        write_snapshot(os.path.join(tmp, "snapshots"), args.repeats * len(DATASET))
+        os.environ.update({
+            "OPENAI_BASE_URL": server.base_url,
+            "DATASET_SNAPSHOT": "offline",
+            "DATASET_SNAPSHOT_DIR": os.path.join(tmp, "snapshots"),
+            "LLM_CACHE_MODE": "passthrough",
+            "SCORE_CACHE": "off",
+        })
+        os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+        discard_logs()
+
+        from braintrust import traced
+
+        from solution import agent
+        from solution.incremental import INCREMENTAL
+        from solution.span_recorder import SPAN_RECORDER
+
+        baseline = os.path.join(tmp, "baseline.jsonl")
+        original = agent.search_faq
+        runs = [
+            ("baseline", None, original),
+            ("search_faq changed", baseline, traced(type="tool", name="search_faq")(SPAN_RECORDER.tool(changed_search_faq))),
+            ("nothing changed", baseline, original),
+        ]
+        print(f"{'run':<20} {'rerun':>6} {'reused':>7} {'requests':>9} {'seconds':>8}  rerun by category / mean scores")
+        for index, (name, base, search_faq) in enumerate(runs):
+            changed_search_faq.__name__ = "search_faq"
+            agent.search_faq = search_faq
+            INCREMENTAL.baseline, INCREMENTAL._baseline_rows = base, None
+            requests = server.requests
+            results, seconds = asyncio.run(run_eval(baseline if index == 0 else os.path.join(tmp, f"run-{index}.jsonl")))
+            rerun = Counter(row.metadata["category"] for row in results if not row.metadata["provenance"]["reused_from"])
+            reused = sum(1 for row in results if row.metadata["provenance"]["reused_from"])
+            scores = {}
+            for row in results:
+                for scorer, score in row.scores.items():
+                    if score is not None:
+                        scores.setdefault(scorer, []).append(score)
+            print(
+                f"{name:<20} {sum(rerun.values()):>6} {reused:>7} {server.requests - requests:>9} {seconds:>8.1f}  "
+                + ", ".join(f"{category} {count}" for category, count in sorted(rerun.items()))
+            )
+            print(" " * 55 + "  ".join(f"{scorer} {sum(values) / len(values):.2f}" for scorer, values in sorted(scores.items())))
+        agent.search_faq = original
+
+
+if __name__ == "__main__":
+    main()
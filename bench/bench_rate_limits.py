@@ -0,0 +1,67 @@
+"""Drive the agent against a fake server that enforces a request rate limit.
+
+Usage:
+    uv run python bench/bench_rate_limits.py --rps 40 --conversations 300
+    uv run python bench/bench_rate_limits.py --rps 40 --conversations 300 --agent-rpm 2400
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench.bench_async_agent import QUERIES
+from bench.fake_openai import serve
+from bench.offline import discard_logs
+from order_store import fresh_refunds
+
+
+async def run(support_agent_async, n: int, concurrency: int) -> tuple[int, int]:
+    semaphore = asyncio.Semaphore(concurrency)
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            try:
+                with fresh_refunds():
+                    await support_agent_async(QUERIES[i % len(QUERIES)])
+            except Exception:
+                errors += 1
+
+    await asyncio.gather(*(one(i) for i in range(n)))
+    return n - errors, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", type=float, default=40, help="Server-side request limit per second")
+    parser.add_argument("--conversations", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--agent-rpm", type=float, default=None, help="Client-side request budget (AGENT_RPM)")
+    args = parser.parse_args()
+    discard_logs()
+
+    if args.agent_rpm:
+        os.environ["AGENT_RPM"] = str(args.agent_rpm)
+    with serve(latency=args.latency, rps=args.rps) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+        from solution.agent import support_agent_async
+        from solution.rate_limits import AGENT_BUDGET
+
+        start = time.perf_counter()
+        completed, errors = asyncio.run(run(support_agent_async, args.conversations, args.concurrency))
+        elapsed = time.perf_counter() - start
+
+    print(f"completed {completed}/{args.conversations} conversations in {elapsed:.2f}s ({completed / elapsed:.1f} conv/s), {errors} failed")
+    print(f"server: {server.requests} requests, {server.rate_limited} answered 429")
+    print(f"agent budget: {AGENT_BUDGET.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Concurrent refund throughput by number of distinct orders, per locking scheme.
+
+Each run refunds --orders distinct delivered orders. Every order gets
+--attempts concurrent refund calls, each with its own idempotency key, plus
+one replay of the first call's key, all from --threads threads in random
+order. Issuing a refund (OrderStore.settle) takes --settle-ms, standing in for
+the payment provider. Stores:
+  global lock      DictOrderStore with one lock stripe: every refund waits on every other
+  per-order locks  DictOrderStore with 256 lock stripes
+  sqlite cas       SQLiteOrderStore: a unique-insert claim, no lock held while issuing
+The dict stores append their ledger to a JSONL file with fsync.
+
+Reports refunds issued per second and checks that every order was refunded
+exactly once, with the rest of the calls answered as replayed,
+already_refunded or (SQLite, while another call is issuing it) pending, and
+that the ledger has one entry per order.
+
+Usage:
+    uv run python bench/bench_refunds.py --orders 1 4 16 64 --threads 32 --settle-ms 5
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from order_store import DictOrderStore, SQLiteOrderStore
+
+
+def make_orders(n: int) -> list[dict]:
+    return [
+        {"order_id": f"ORD-B{i:05d}", "status": "delivered", "items": ["Pro Plan (Annual)"], "total": 299.99, "date": "2025-01-15"}
+        for i in range(n)
+    ]
+
+
+def open_bench_store(kind: str, orders: list[dict], directory: str):
+    if kind == "sqlite cas":
+        store = SQLiteOrderStore(os.path.join(directory, "orders.db"))
+        store.bulk_load(orders)
+        return store, lambda: store._conn.execute("SELECT COUNT(*) FROM refunds WHERE state = 'issued'").fetchone()[0]
+    ledger = os.path.join(directory, "refunds.jsonl")
+    store = DictOrderStore({}, ledger, lock_stripes=1 if kind == "global lock" else 256)
+    store.bulk_load(orders)
+
+    def ledger_entries():
+        with open(ledger) as f:
+            return len([json.loads(line)["order_id"] for line in f])
+
+    return store, ledger_entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--attempts", type=int, default=3, help="Refund calls per order, each with its own key")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--settle-ms", type=float, default=5, help="Time to issue one refund")
+    args = parser.parse_args()
+
+    print(f"{'store':<16} {'orders':>6} {'calls':>6} {'seconds':>8} {'refunds/s':>10} {'speedup':>8}  outcomes")
+    for kind in ("global lock", "per-order locks", "sqlite cas"):
+        baseline = None
+        for n in args.orders:
+            orders = make_orders(n)
+            with tempfile.TemporaryDirectory() as tmp:
+                store, ledger_entries = open_bench_store(kind, orders, tmp)
+                store.settle = lambda refund: time.sleep(args.settle_ms / 1000)
+                calls = [
+                    (order["order_id"], f"call_{order['order_id']}_{attempt}")
+                    for order in orders
+                    for attempt in range(args.attempts)
+                ]
+                calls += [(order["order_id"], f"call_{order['order_id']}_0") for order in orders]
+                random.shuffle(calls)
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(args.threads) as pool:
+                    results = list(pool.map(lambda call: store.refund(call[0], "bench", call[1]), calls))
+                seconds = time.perf_counter() - start
+
+                outcomes = Counter(result["outcome"] for result in results)
+                refunded = Counter(result["refund"]["order_id"] for result in results if result["outcome"] == "refunded")
+                assert len(refunded) == n and set(refunded.values()) == {1}, "an order was refunded twice or not at all"
+                assert outcomes["replayed"] + outcomes["already_refunded"] + outcomes["pending"] == len(calls) - n and ledger_entries() == n
+                rate = n / seconds
+                baseline = baseline or rate
+                print(
+                    f"{kind:<16} {n:>6} {len(calls):>6} {seconds:>8.3f} {rate:>10.1f} {rate / baseline:>8.1f}  "
+                    + ", ".join(f"{outcome} {count}" for outcome, count in sorted(outcomes.items()))
+                )
+
+
+if __name__ == "__main__":
+    main()
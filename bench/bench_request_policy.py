@@ -0,0 +1,100 @@
+"""Conversation latency under latency spikes and server errors, per request policy.
+
+Runs --conversations support_agent_async calls against the fake OpenAI
+server. --spike-rate of its requests are --spike-latency seconds slower, and
+--error-rate answer with a 500. The same load runs under each policy:
+  once           one attempt per round (no retries)
+  retry          up to 3 attempts with jittered exponential backoff
+  retry+hedge    as retry, plus a duplicate request after the recent p95
+  +deadline      as retry+hedge, with --deadline seconds per round
+and reports failed conversations, conversation latency percentiles, requests
+sent, and the policy's retries, hedges (won by the duplicate) and deadlines.
+
+Usage:
+    uv run python bench/bench_request_policy.py --conversations 300 --spike-rate 0.05 --spike-latency 2
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench.bench_async_agent import QUERIES
+from bench.fake_openai import serve
+from bench.offline import discard_logs
+from bench.run import percentile
+from order_store import fresh_refunds
+
+
+async def run(support_agent_async, n: int, concurrency: int) -> tuple[list[float], int]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failed = 0
+
+    async def one(i):
+        nonlocal failed
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                with fresh_refunds():
+                    await support_agent_async(QUERIES[i % len(QUERIES)])
+            except Exception:
+                failed += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(n)))
+    return sorted(latencies), failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake model latency per request (s)")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--spike-rate", type=float, default=0.05, help="Fraction of requests that spike")
+    parser.add_argument("--spike-latency", type=float, default=2.0, help="Extra seconds for a spiked request")
+    parser.add_argument("--error-rate", type=float, default=0.03, help="Fraction of requests answered with a 500")
+    parser.add_argument("--deadline", type=float, default=1.0, help="Round deadline for the +deadline policy (s)")
+    args = parser.parse_args()
+    discard_logs()
+
+    with serve(
+        latency=args.latency, jitter=args.jitter, spike_rate=args.spike_rate,
+        spike_latency=args.spike_latency, error_rate=args.error_rate,
+    ) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+        # Every conversation makes both of its model rounds
+        os.environ.update({"AGENT_ROUTER": "off", "AGENT_TEMPLATES": "off"})
+        from solution import agent
+        from solution.request_policy import RequestPolicy
+
+        policies = [
+            ("once", RequestPolicy(max_attempts=1)),
+            ("retry", RequestPolicy(base_delay=0.05)),
+            ("retry+hedge", RequestPolicy(base_delay=0.05, hedge=True)),
+            ("+deadline", RequestPolicy(base_delay=0.05, hedge=True, round_deadline=args.deadline)),
+        ]
+        print(
+            f"{'policy':<12} {'failed':>6} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'max ms':>7} "
+            f"{'requests':>8} {'retries':>7} {'hedges':>10} {'deadlines':>9}"
+        )
+        for name, policy in policies:
+            agent.REQUEST_POLICY = policy
+            requests = server.requests
+            latencies, failed = asyncio.run(run(agent.support_agent_async, args.conversations, args.concurrency))
+            p = {q: percentile(latencies, q) * 1000 for q in (50, 95, 99, 100)}
+            hedges = f"{policy.hedges} ({policy.hedge_wins})"
+            print(
+                f"{name:<12} {failed:>6} {p[50]:>7.0f} {p[95]:>7.0f} {p[99]:>7.0f} {p[100]:>7.0f} "
+                f"{server.requests - requests:>8} {policy.retries:>7} {hedges:>10} {policy.deadlines:>9}"
+            )
+
+
+if __name__ == "__main__":
+    main()
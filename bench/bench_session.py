@@ -0,0 +1,104 @@
+"""Prompt tokens and latency per turn over long conversations, full history vs. Session.
+
+Runs --conversations conversations of --turns messages each against the fake
+OpenAI server, with the router and templates off so every turn makes its
+model rounds. Each turn carries the conversation so far:
+  full history   every earlier message, tool results in full
+  session        solution/session.py: tool results by reference, older turns
+                 folded into a summary past --history-tokens
+The server remembers request prefixes like a provider's prompt cache and
+charges --prompt-token-latency per uncached prompt token.
+
+Reports prompt tokens per turn (all of a turn's requests) at a few turns,
+the share of prompt tokens served from the prefix cache, ms per turn over the
+first and last ten turns, and the session's compactions.
+
+Usage:
+    uv run python bench/bench_session.py --turns 50 --history-tokens 2000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench.fake_openai import serve
+from bench.offline import discard_logs
+from order_store import fresh_refunds
+
+MESSAGES = [
+    "What's the status of order ORD-1001?",
+    "How do I reset my password?",
+    "What's the status of order ORD-1003?",
+    "Can I integrate Acme with Slack?",
+    "I want a refund for order ORD-1002",
+    "What payment methods do you accept?",
+    "What's the status of order ORD-9999?",
+    "How do I cancel my subscription?",
+    "Please refund order ORD-1003, I changed my mind.",
+    "Can I export my data?",
+]
+
+
+async def converse(session, server, turns: int) -> list[tuple[int, int, float]]:
+    """(prompt tokens, cached prompt tokens, seconds) per turn."""
+    per_turn = []
+    for i in range(turns):
+        prompt, cached = server.prompt_tokens, server.cached_tokens
+        start = time.perf_counter()
+        await session.ask(MESSAGES[i % len(MESSAGES)])
+        per_turn.append((server.prompt_tokens - prompt, server.cached_tokens - cached, time.perf_counter() - start))
+    return per_turn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--conversations", type=int, default=3)
+    parser.add_argument("--history-tokens", type=int, default=2000, help="Session budget for recent turns")
+    parser.add_argument("--summary-tokens", type=int, default=400, help="Session budget for the summary")
+    parser.add_argument("--latency", type=float, default=0.02, help="Fake model latency per request (s)")
+    parser.add_argument("--prompt-token-latency", type=float, default=0.00002, help="Seconds per uncached prompt token")
+    args = parser.parse_args()
+    discard_logs()
+
+    with serve(latency=args.latency, prompt_token_latency=args.prompt_token_latency) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+        os.environ.update({"AGENT_ROUTER": "off", "AGENT_TEMPLATES": "off"})
+        from solution.session import Session
+
+        modes = [
+            ("full history", lambda: Session(history_tokens=10 ** 9, result_chars=10 ** 9)),
+            ("session", lambda: Session(history_tokens=args.history_tokens, summary_tokens=args.summary_tokens)),
+        ]
+        checkpoints = [t for t in (1, 10, 25, args.turns) if t <= args.turns]
+        print(
+            f"{'mode':<13} " + " ".join(f"{'turn ' + str(t):>8}" for t in checkpoints)
+            + f" {'max':>7} {'cached':>6} {'ms 1-10':>7} {'ms last10':>9} {'compactions':>11}"
+        )
+        for name, make_session in modes:
+            runs = []
+            compactions = 0
+            for _ in range(args.conversations):
+                # Every conversation refunds the same orders from scratch
+                session = make_session()
+                with fresh_refunds():
+                    runs.append(asyncio.run(converse(session, server, args.turns)))
+                compactions += session.compactions
+            tokens = [sum(run[t][0] for run in runs) / len(runs) for t in range(args.turns)]
+            cached = sum(turn[1] for run in runs for turn in run) / sum(turn[0] for run in runs for turn in run)
+            ms = [sum(run[t][2] for run in runs) / len(runs) * 1000 for t in range(args.turns)]
+            print(
+                f"{name:<13} " + " ".join(f"{tokens[t - 1]:>8.0f}" for t in checkpoints)
+                + f" {max(tokens):>7.0f} {cached:>6.0%} {sum(ms[:10]) / 10:>7.1f} {sum(ms[-10:]) / 10:>9.1f}"
+                + f" {compactions / len(runs):>11.1f}"
+            )
+        print("Columns turn N and max are prompt tokens per turn; cached is the share served from the prefix cache")
+
+
+if __name__ == "__main__":
+    main()
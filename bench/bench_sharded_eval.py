@@ -0,0 +1,103 @@
+"""Scaling of the sharded eval runner with the number of worker processes.
+
+Writes a dataset snapshot of --rows copies of the init.py DATASET rows, then
+runs solution/eval_agent.py through solution.sharded_eval with 1, 2, 4, ...
+workers against the fake OpenAI server, with spans discarded. Each worker
+keeps at most --concurrency rows in flight, standing in for the one core and
+event loop a single process is bound by, so ideal scaling is linear in the
+number of workers. Reports wall time, rows/s and parallel efficiency.
+
+--crash kills one worker process partway through the largest run, to show its
+shard being retried on its own while the other shards are left as they are.
+
+Usage:
+    uv run python bench/bench_sharded_eval.py --rows 400 --workers 1 2 4 8
+    uv run python bench/bench_sharded_eval.py --crash
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench.fake_openai import serve
+from bench.offline import discard_logs
+from init import DATASET, DATASET_NAME, PROJECT_NAME
+
+EVAL_FILE = os.path.join(os.path.dirname(__file__), "..", "solution", "eval_agent.py")
+
+
+def write_snapshot(directory: str, rows: int):
+    folder = os.path.join(directory, PROJECT_NAME, DATASET_NAME)
+    os.makedirs(folder)
+    with open(os.path.join(folder, "bench.jsonl"), "w") as f:
+        for i in range(rows):
+            f.write(json.dumps({**DATASET[i % len(DATASET)], "id": f"row-{i}"}) + "\n")
+    with open(os.path.join(folder, "manifest.json"), "w") as f:
+        json.dump({"version": "bench", "file": "bench.jsonl", "rows": rows}, f)
+
+
+def offline_worker():
+    """Worker initializer: drop spans, and with BENCH_CRASH_DIR set, let one worker die."""
+    discard_logs()
+    marker = os.environ.get("BENCH_CRASH_DIR")
+    if marker:
+        try:
+            os.close(os.open(os.path.join(marker, "crashed"), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return
+        threading.Timer(float(os.environ["BENCH_CRASH_AFTER"]), os._exit, args=(1,)).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=240)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=4, help="Rows in flight per worker")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake model latency per completion (s)")
+    parser.add_argument("--crash", action="store_true", help="Kill one worker during the largest run")
+    args = parser.parse_args()
+
+    from solution.sharded_eval import print_summary, run
+
+    with tempfile.TemporaryDirectory() as tmp, serve(latency=args.latency) as server:
+        write_snapshot(os.path.join(tmp, "snapshots"), args.rows)
+        os.environ.update({
+            "OPENAI_BASE_URL": server.base_url,
+            "DATASET_SNAPSHOT": "offline",
+            "DATASET_SNAPSHOT_DIR": os.path.join(tmp, "snapshots"),
+            "LLM_CACHE_MODE": "passthrough",
+            "SCORE_CACHE": "off",
+        })
+        os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+        discard_logs()
+
+        print(f"{'workers':>7} {'seconds':>8} {'rows/s':>8} {'speedup':>8} {'efficiency':>10}")
+        baseline = None
+        for workers in args.workers:
+            directory = os.path.join(tmp, f"run-{workers}")
+            if args.crash and workers == max(args.workers):
+                os.makedirs(directory)
+                os.environ.update({"BENCH_CRASH_DIR": directory, "BENCH_CRASH_AFTER": "5"})
+            start = time.perf_counter()
+            summary = run(
+                EVAL_FILE, directory, workers,
+                concurrency=args.concurrency, no_send_logs=True, lease=10.0, initializer=offline_worker,
+            )
+            seconds = time.perf_counter() - start
+            os.environ.pop("BENCH_CRASH_DIR", None)
+            rate = summary["rows"] / seconds
+            baseline = baseline or rate / workers
+            print(f"{workers:>7} {seconds:>8.1f} {rate:>8.1f} {rate / baseline:>8.2f} {rate / baseline / workers:>10.0%}")
+            if summary["rows"] != args.rows or summary["unfinished"]:
+                print_summary(summary)
+        print_summary(summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Per-conversation tracing overhead and backlog, with and without sampled export.
+
+Runs --conversations support_agent_async calls, one at a time, against the
+fake OpenAI server. --spike-rate of requests are --spike-latency slower and
+--error-rate fail, with retries off so those conversations end in an error.
+Spans go to a stand-in for a slow tracing backend that uploads
+--backend-rate events per second and, like braintrust's logger, holds at most
+25000 events before dropping. The same load runs with:
+  off           no current logger: @traced spans are no-ops
+  direct        every span event goes straight to the backend
+  sampled 100%  through TraceExporter, keeping every trace
+  sampled N%    through TraceExporter at --sample-rate, plus error and slow traces
+and reports ms and CPU ms per conversation, overhead against off, the
+events that reached the backend, its largest backlog, events dropped and
+the exporter's trace decisions.
+
+Usage:
+    uv run python bench/bench_trace_export.py --conversations 300 --sample-rate 0.1
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import braintrust.logger
+from braintrust.util import LazyValue
+
+from bench.bench_async_agent import QUERIES
+from bench.fake_openai import serve
+from bench.offline import computable_logs, discard_logs
+from bench.run import percentile
+from order_store import fresh_refunds
+
+
+class SlowBackend:
+    """Background logger that uploads `rate` events per second, holding at most `limit`."""
+
+    def __init__(self, rate: float, limit: int = 25000):
+        self.rate = rate
+        self.limit = limit
+        self.backlog = deque()
+        self.uploaded = 0
+        self.dropped = 0
+        self.max_backlog = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        threading.Thread(target=self._upload, daemon=True).start()
+
+    def log(self, *events):
+        with self._lock:
+            for event in events:
+                if len(self.backlog) >= self.limit:
+                    self.dropped += 1
+                else:
+                    self.backlog.append(event)
+            self.max_backlog = max(self.max_backlog, len(self.backlog))
+
+    def _upload(self):
+        tick = 0.05
+        while not self._stop.wait(tick):
+            with self._lock:
+                batch = [self.backlog.popleft() for _ in range(min(len(self.backlog), int(self.rate * tick)))]
+            for event in batch:
+                event.get()
+            self.uploaded += len(batch)
+
+    def close(self):
+        self._stop.set()
+
+    def flush(self, batch_size: int | None = None):
+        pass
+
+    def set_masking_function(self, masking_function):
+        pass
+
+    def enforce_queue_size_limit(self, enforce: bool):
+        pass
+
+    def internal_replace_api_conn(self, api_conn):
+        pass
+
+
+async def run(support_agent_async, n: int) -> tuple[list[float], float, int]:
+    latencies = []
+    failed = 0
+    cpu = time.process_time()
+    for i in range(n):
+        start = time.perf_counter()
+        try:
+            with fresh_refunds():
+                await support_agent_async(QUERIES[i % len(QUERIES)])
+        except Exception:
+            failed += 1
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies), time.process_time() - cpu, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake model latency per request (s)")
+    parser.add_argument("--spike-rate", type=float, default=0.03)
+    parser.add_argument("--spike-latency", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    parser.add_argument("--slow-ms", type=float, default=250, help="Traces at least this slow are kept")
+    parser.add_argument("--backend-rate", type=float, default=200, help="Events per second the backend uploads")
+    args = parser.parse_args()
+    discard_logs()
+
+    with serve(
+        latency=args.latency, spike_rate=args.spike_rate, spike_latency=args.spike_latency, error_rate=args.error_rate,
+    ) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+        os.environ.update({"AGENT_ROUTER": "off", "AGENT_TEMPLATES": "off"})
+        from solution import agent
+        from solution.request_policy import RequestPolicy
+        from solution.trace_export import TraceExporter
+
+        # Injected errors fail the conversation instead of being retried
+        agent.REQUEST_POLICY = RequestPolicy(max_attempts=1)
+        state = braintrust.logger._state
+        logger = computable_logs()
+
+        modes = [("off", None), ("direct", None), ("sampled 100%", 1.0), (f"sampled {args.sample_rate:.0%}", args.sample_rate)]
+        print(
+            f"{'mode':<13} {'p50 ms':>7} {'mean ms':>7} {'cpu ms':>7} {'overhead':>8} "
+            f"{'exported':>8} {'backlog':>7} {'dropped':>7}  traces kept (head/error/slow) of finished"
+        )
+        baseline = None
+        for name, rate in modes:
+            backend = SlowBackend(args.backend_rate)
+            exporter = None
+            state._global_bg_logger = LazyValue(lambda: backend, use_mutex=False)
+            if rate is not None:
+                exporter = TraceExporter(backend, sample_rate=rate, slow_seconds=args.slow_ms / 1000).install(state)
+            state._cv_logger.set(None if name == "off" else logger)
+            state._local_logger = None if name == "off" else logger
+
+            latencies, cpu, failed = asyncio.run(run(agent.support_agent_async, args.conversations))
+            if exporter:
+                exporter.close()
+            backend.close()
+            mean = sum(latencies) / len(latencies) * 1000
+            p50 = percentile(latencies, 50) * 1000
+            cpu_ms = cpu / len(latencies) * 1000
+            baseline = baseline or cpu_ms
+            traces = ""
+            dropped = backend.dropped
+            if exporter:
+                d = exporter.decisions
+                traces = f"{d['head']}/{d['error']}/{d['slow']} of {sum(d.values())}"
+                dropped += exporter.dropped
+            print(
+                f"{name:<13} {p50:>7.2f} {mean:>7.2f} {cpu_ms:>7.2f} {cpu_ms - baseline:>+8.2f} "
+                f"{backend.uploaded + len(backend.backlog):>8} {backend.max_backlog:>7} {dropped:>7}  {traces}"
+            )
+        print(f"{failed} of {args.conversations} conversations failed in the last run; overhead is CPU ms per conversation against off")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""In-process stand-in for a Braintrust dataset and its BTQL endpoint.
+
+FakeDataset quacks like the braintrust Dataset that solution/dataset_snapshot.py
+queries: it has an id, a logging_state whose api_conn().post("btql", json=...)
+answers the queries the snapshot code sends, and remote_version(). Rows are
+held in memory with increasing _xact_ids; insert, update and delete change
+them the way edits in the Braintrust UI would.
+
+Supported BTQL: select star or a list of aliased idents, measures max() and
+count(), a "gt" filter on a field, limit and cursor paging. Like the real
+endpoint, a query with both select and measures is rejected with a 400.
+Requests and returned records are counted, to show what each refresh costs.
+"""
+
+import itertools
+import json
+
+from solution.dataset_snapshot import fetch_version
+
+
+class FakeResponse:
+    def __init__(self, status: int, body: dict):
+        self.status_code = status
+        self._body = body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"BTQL {self.status_code}: {self._body.get('error')}")
+
+    def json(self) -> dict:
+        return self._body
+
+
+class FakeConn:
+    def __init__(self, store: "FakeStore"):
+        self.store = store
+
+    def post(self, path: str, json: dict, headers: dict | None = None) -> FakeResponse:
+        assert path == "btql"
+        return self.store.btql(json["query"])
+
+
+class FakeState:
+    def __init__(self, store: "FakeStore"):
+        self._conn = FakeConn(store)
+
+    def api_conn(self) -> FakeConn:
+        return self._conn
+
+
+class FakeStore:
+    """The dataset's live rows, by id, in insertion order."""
+
+    def __init__(self):
+        self.rows = {}
+        self.requests = 0
+        self.records_sent = 0
+        self._xact = itertools.count(1)
+
+    def _stamp(self, row: dict) -> dict:
+        return {**row, "_xact_id": f"{next(self._xact):020d}", "created": "2026-01-01T00:00:00Z"}
+
+    def insert(self, row: dict):
+        self.rows[row["id"]] = self._stamp(row)
+
+    def update(self, row_id: str, **fields):
+        # An edited row moves to the end, as it would in _xact_id order
+        row = self.rows.pop(row_id)
+        self.rows[row_id] = self._stamp({**row, **fields})
+
+    def delete(self, row_id: str):
+        del self.rows[row_id]
+        next(self._xact)
+
+    def btql(self, query: dict) -> FakeResponse:
+        self.requests += 1
+        if "select" in query and "measures" in query:
+            return FakeResponse(400, {"error": "select and measures cannot be combined"})
+        rows = list(self.rows.values())
+        where = query.get("filter")
+        if where:
+            assert where["op"] == "gt"
+            field, value = where["left"]["name"][0], where["right"]["value"]
+            rows = [row for row in rows if int(row[field]) > int(value)]
+        if "measures" in query:
+            result = {}
+            for measure in query["measures"]:
+                name = measure["expr"]["name"]["name"][0]
+                if name == "max":
+                    field = measure["expr"]["args"][0]["name"][0]
+                    result[measure["alias"]] = max((row[field] for row in rows), default=None)
+                else:
+                    result[measure["alias"]] = len(rows)
+            return FakeResponse(200, {"data": [result], "cursor": None})
+
+        start = int(query.get("cursor") or 0)
+        page = rows[start:start + query["limit"]]
+        if query["select"] != [{"op": "star"}]:
+            page = [{item["alias"]: row[item["expr"]["name"][0]] for item in query["select"]} for row in page]
+        self.records_sent += len(page)
+        # Cursors are opaque strings to the client
+        cursor = json.dumps(start + len(page)) if start + len(page) < len(rows) else None
+        return FakeResponse(200, {"data": page, "cursor": cursor})
+
+
+class FakeDataset:
+    """One handle on the store, as init_dataset returns a new Dataset per eval."""
+
+    def __init__(self, store: FakeStore, dataset_id: str = "fake-dataset"):
+        self.id = dataset_id
+        self.logging_state = FakeState(store)
+        self._remote_version = None
+
+    def remote_version(self) -> tuple[str, int]:
+        if self._remote_version is None:
+            self._remote_version = fetch_version(self)
+        return self._remote_version
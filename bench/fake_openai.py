@@ -0,0 +1,383 @@
+"""Local OpenAI-compatible stub for offline benchmarks.
+
+Serves POST /v1/chat/completions with a scripted support-agent trajectory:
+the first round picks a tool from the user message, the next round answers
+from the tool output. Point the agent at it with OPENAI_BASE_URL.
+
+A --script JSON file replaces the built-in trajectories. It is a list of
+{"match": regex, "tool_calls": [{"name", "arguments"}], "answer": str}; the
+first entry whose regex matches the user message is used, and either key may
+be left out to fall back to the built-in behaviour for that round.
+
+Requests that force a function through tool_choice (the autoevals judges) get
+arguments generated from the function's JSON schema, so scorers run offline.
+
+--token-latency adds that many seconds per completion token, so long answers
+(a batch of judge verdicts) take longer than short ones, as with a real model.
+
+--prompt-token-latency adds seconds per prompt token that isn't served from
+its prefix cache. Like a provider's prompt caching, the server remembers the
+prefixes (tools plus leading messages) of recent requests, reports the
+longest one a request starts with as usage.prompt_tokens_details.cached_tokens,
+and only charges the rest.
+
+--spike-rate makes that fraction of requests take --spike-latency seconds
+longer, and --error-rate answers that fraction with a 500, for exercising
+retries and hedging against a tail-heavy server.
+
+Usage:
+    uv run python bench/fake_openai.py --port 8011 --latency 0.2 --jitter 0.1
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ORDER_ID = re.compile(r"ORD-\d+")
+
+
+def _tool_call_message(calls: list[tuple[str, dict]]) -> dict:
+    return {
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [
+            {
+                "id": f"call_{uuid.uuid4().hex[:24]}",
+                "type": "function",
+                "function": {"name": name, "arguments": json.dumps(arguments)},
+            }
+            for name, arguments in calls
+        ],
+    }
+
+
+def _current_turn(messages: list[dict]) -> list[dict]:
+    """Messages from the latest user message on: earlier turns of a session don't steer the reply."""
+    users = [i for i, m in enumerate(messages) if m.get("role") == "user"]
+    return messages[users[-1]:] if users else messages
+
+
+def _scripted(script: list[dict] | None, messages: list[dict]) -> dict | None:
+    user = next((m["content"] for m in _current_turn(messages) if m.get("role") == "user"), "")
+    for entry in script or ():
+        if re.search(entry["match"], user, re.IGNORECASE):
+            return entry
+    return None
+
+
+def script_reply(messages: list[dict], tools: list[dict] | None, script: list[dict] | None = None) -> dict:
+    """Pick the next assistant message for a conversation."""
+    last = messages[-1]
+    entry = _scripted(script, messages) or {}
+    if last["role"] == "user" and tools:
+        if "tool_calls" in entry:
+            return _tool_call_message([(call["name"], call.get("arguments", {})) for call in entry["tool_calls"]])
+        text = last["content"]
+        match = ORDER_ID.search(text)
+        if match and "refund" in text.lower():
+            call = ("process_refund", {"order_id": match.group(), "reason": text})
+        elif match:
+            call = ("lookup_order", {"order_id": match.group()})
+        else:
+            call = ("search_faq", {"query": text})
+        return _tool_call_message([call])
+    if "answer" in entry:
+        return {"role": "assistant", "content": entry["answer"]}
+    tool_outputs = [m["content"] for m in _current_turn(messages) if m.get("role") == "tool"]
+    return {"role": "assistant", "content": "Here's what I found: " + " ".join(tool_outputs)}
+
+
+def schema_value(schema: dict, root: dict | None = None, position: int | None = None):
+    """Smallest plausible value for a JSON schema: minItems array items, first enum, etc.
+
+    Integers inside the i-th array item are i, so batched verdicts come back numbered.
+    """
+    root = root or schema
+    if "$ref" in schema:
+        node = root
+        for part in schema["$ref"].lstrip("#/").split("/"):
+            node = node[part]
+        return schema_value(node, root, position)
+    if "enum" in schema:
+        return schema["enum"][0]
+    kind = schema.get("type", "object")
+    if kind == "object":
+        return {name: schema_value(prop, root, position) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [schema_value(schema.get("items", {}), root, i) for i in range(max(1, schema.get("minItems", 1)))]
+    if kind in ("integer", "number"):
+        return 1 if position is None else position
+    if kind == "boolean":
+        return True
+    return "ok"
+
+
+def forced_reply(tools: list[dict], tool_choice) -> dict | None:
+    """Answer a request that forces one function, as the autoevals judges do."""
+    if not isinstance(tool_choice, dict):
+        return None
+    name = tool_choice.get("function", {}).get("name")
+    for tool in tools or ():
+        if tool["function"]["name"] == name:
+            return _tool_call_message([(name, schema_value(tool["function"].get("parameters", {})))])
+    return None
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this each response
+    # waits out the client's delayed ACK (~40 ms)
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers["Content-Length"])
+        data = self.rfile.read(length)
+        if len(data) < length:
+            # The client hung up mid-request (a cancelled hedge)
+            self.close_connection = True
+            return
+        body = json.loads(data)
+        retry_after = self.server.check_rate_limit()
+        if retry_after is not None:
+            self._send_json(
+                {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                status=429,
+                headers={"Retry-After": f"{retry_after:.3f}", "retry-after-ms": str(int(retry_after * 1000))},
+            )
+            return
+        if random.random() < self.server.error_rate:
+            self.server.count_error()
+            self._send_json({"error": {"message": "Injected server error", "type": "server_error"}}, status=500)
+            return
+        message = forced_reply(body.get("tools"), body.get("tool_choice")) or script_reply(
+            body["messages"], body.get("tools"), self.server.script
+        )
+        prompt_tokens = len(json.dumps(body["messages"])) // 4
+        cached_tokens = self.server.cached_prefix(body.get("tools"), body["messages"])
+        completion_tokens = len(json.dumps(message)) // 4
+        self.server.count_tokens(prompt_tokens, completion_tokens, cached_tokens)
+        spike = self.server.spike_latency if random.random() < self.server.spike_rate else 0.0
+        time.sleep(
+            self.server.latency + random.uniform(0, self.server.jitter) + completion_tokens * self.server.token_latency
+            + (prompt_tokens - cached_tokens) * self.server.prompt_token_latency + spike
+        )
+
+        if body.get("stream"):
+            self._send_stream(body["model"], message)
+            return
+        self._send_json({
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "choices": [
+                {
+                    "index": 0,
+                    "message": message,
+                    "finish_reason": "tool_calls" if message.get("tool_calls") else "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens},
+            },
+        })
+
+    def _send_stream(self, model: str, message: dict):
+        """Send the message as SSE chunks, the way the API streams deltas."""
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex[:24]}", "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+        deltas = [{"role": "assistant", "content": ""}]
+        for index, call in enumerate(message.get("tool_calls") or ()):
+            deltas.append({"tool_calls": [{"index": index, "id": call["id"], "type": "function", "function": {"name": call["function"]["name"], "arguments": ""}}]})
+            arguments = call["function"]["arguments"]
+            deltas.extend({"tool_calls": [{"index": index, "function": {"arguments": arguments[i:i + 8]}}]} for i in range(0, len(arguments), 8))
+        if message.get("content"):
+            deltas.extend({"content": word} for word in re.findall(r"\S+\s*", message["content"]))
+        finish_reason = "tool_calls" if message.get("tool_calls") else "stop"
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, delta in enumerate(deltas):
+            choice = {"index": 0, "delta": delta, "finish_reason": finish_reason if i == len(deltas) - 1 else None}
+            self._write_chunk(f"data: {json.dumps({**base, 'choices': [choice]})}\n\n")
+            time.sleep(self.server.chunk_delay)
+        self._write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, text: str):
+        data = text.encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, payload: dict, status: int = 200, headers: dict | None = None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(
+        self,
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        chunk_delay: float = 0.005,
+        rps: float | None = None,
+        script: list[dict] | None = None,
+        token_latency: float = 0.0,
+        spike_rate: float = 0.0,
+        spike_latency: float = 0.0,
+        error_rate: float = 0.0,
+        prompt_token_latency: float = 0.0,
+        prefix_cache_size: int = 10000,
+    ):
+        super().__init__(("127.0.0.1", port), FakeOpenAIHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.script = script
+        self.chunk_delay = chunk_delay
+        self.rps = rps
+        self.token_latency = token_latency
+        self.spike_rate = spike_rate
+        self.spike_latency = spike_latency
+        self.error_rate = error_rate
+        self.prompt_token_latency = prompt_token_latency
+        self.prefix_cache_size = prefix_cache_size
+        self.requests = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self._prefixes = OrderedDict()  # hash of tools + leading messages -> None, least recent first
+        self._window = deque()
+        self._lock = threading.Lock()
+
+    def check_rate_limit(self) -> float | None:
+        """Count a request; return its Retry-After if it exceeds rps over the last second."""
+        with self._lock:
+            self.requests += 1
+            if not self.rps:
+                return None
+            now = time.monotonic()
+            while self._window and self._window[0] <= now - 1:
+                self._window.popleft()
+            if len(self._window) >= self.rps:
+                self.rate_limited += 1
+                return self._window[0] + 1 - now
+            self._window.append(now)
+            return None
+
+    def count_tokens(self, prompt: int, completion: int, cached: int = 0):
+        with self._lock:
+            self.prompt_tokens += prompt
+            self.completion_tokens += completion
+            self.cached_tokens += cached
+
+    def cached_prefix(self, tools: list[dict] | None, messages: list[dict]) -> int:
+        """Tokens of the longest remembered prefix this request starts with; remembers its own."""
+        digest = hashlib.sha256(json.dumps(tools).encode())
+        keys = []
+        for message in messages:
+            digest.update(json.dumps(message, sort_keys=True).encode())
+            keys.append(digest.copy().hexdigest())
+        with self._lock:
+            hit = 0
+            for i, key in enumerate(keys):
+                if key in self._prefixes:
+                    hit = i + 1
+                    self._prefixes.move_to_end(key)
+                else:
+                    self._prefixes[key] = None
+            while len(self._prefixes) > self.prefix_cache_size:
+                self._prefixes.popitem(last=False)
+        return len(json.dumps(messages[:hit])) // 4 if hit else 0
+
+    def handle_error(self, request, client_address):
+        # Clients hang up on purpose (cancelled hedges, deadlines)
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def count_error(self):
+        with self._lock:
+            self.errors += 1
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+def load_script(path: str | None) -> list[dict] | None:
+    if not path:
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+@contextmanager
+def serve(**kwargs):
+    """Run a FakeOpenAIServer on a background thread for the duration of the block."""
+    server = FakeOpenAIServer(**kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds to wait before each response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra seconds, uniformly random")
+    parser.add_argument("--chunk-delay", type=float, default=0.005, help="Seconds between streamed chunks")
+    parser.add_argument("--rps", type=float, default=None, help="Answer 429 with Retry-After above this many requests/s")
+    parser.add_argument("--script", default=None, help="JSON file of scripted trajectories")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Extra seconds per completion token")
+    parser.add_argument("--spike-rate", type=float, default=0.0, help="Fraction of requests that get --spike-latency extra")
+    parser.add_argument("--spike-latency", type=float, default=0.0, help="Extra seconds for a spiked request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 500")
+    parser.add_argument("--prompt-token-latency", type=float, default=0.0, help="Extra seconds per uncached prompt token")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        chunk_delay=args.chunk_delay,
+        rps=args.rps,
+        script=load_script(args.script),
+        token_latency=args.token_latency,
+        spike_rate=args.spike_rate,
+        spike_latency=args.spike_latency,
+        error_rate=args.error_rate,
+        prompt_token_latency=args.prompt_token_latency,
+    )
+    print(f"Fake OpenAI server listening on {server.base_url}")
+    server.serve_forever()
@@ -0,0 +1,63 @@
+"""Run traced code offline: spans are created as usual but never uploaded.
+
+Without BRAINTRUST_API_KEY the default background logger tries to log in on
+flush and prints the failure. Benchmarks install DiscardLogger instead, so
+span ids, current_span() and root_span_id behave exactly as in a real run
+while the span payloads are dropped unevaluated.
+
+discard_logs() also sets a current logger. Without one, start_span() outside
+an eval returns a no-op span: the agent's tool spans vanish and the
+trace-based scorers (Faithfulness, expected_tool_path) score every row as
+if no tool ran.
+"""
+
+import threading
+
+import braintrust.logger
+from braintrust.util import LazyValue
+
+
+class DiscardLogger:
+    """Background logger that counts span events and drops them."""
+
+    def __init__(self):
+        self.events = 0
+        self._lock = threading.Lock()
+
+    def log(self, *args):
+        with self._lock:
+            self.events += len(args)
+
+    def flush(self, batch_size: int | None = None):
+        pass
+
+    def set_masking_function(self, masking_function):
+        pass
+
+    def enforce_queue_size_limit(self, enforce: bool):
+        pass
+
+    def internal_replace_api_conn(self, api_conn):
+        pass
+
+
+def discard_logs() -> DiscardLogger:
+    """Replace braintrust's global background logger for the rest of the process."""
+    logger = DiscardLogger()
+    braintrust.logger._state._global_bg_logger = LazyValue(lambda: logger, use_mutex=True)
+    # Without a current logger start_span() returns a no-op span with no root_span_id;
+    # the project is resolved lazily, on flush, which the discard logger never does
+    braintrust.init_logger(project="offline-bench")
+    return logger
+
+
+def computable_logs(project: str = "offline-bench"):
+    """Set a current logger whose span records can be computed without logging in.
+
+    discard_logs() never evaluates records; exporters that read them (root
+    span ids, metrics, errors) need the project id resolved, so the state is
+    marked logged in to a placeholder org and the project id is given outright.
+    """
+    braintrust.logger._state.logged_in = True
+    braintrust.logger._state.org_id = "offline"
+    return braintrust.init_logger(project=project, project_id=project)
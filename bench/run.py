@@ -0,0 +1,219 @@
+"""Offline benchmark suite for the tools, the agent loop and the scorers.
+
+Everything runs against the fake OpenAI server with spans discarded, so the
+numbers cover this repo's code plus the configured model latency and nothing
+else. Each scenario reports p50/p95/p99 latency, throughput and memory
+allocated per request; the results are written as JSON so runs on different
+commits can be diffed.
+
+Usage:
+    uv run python bench/run.py --out bench-results.json
+    uv run python bench/run.py --latency 0.05 --jitter 0.05 --concurrency 1 8 32 --requests 200
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench.bench_async_agent import QUERIES
+from bench.fake_openai import load_script, serve
+from bench.offline import discard_logs
+from init import DATASET
+from order_store import fresh_refunds
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: list[float], elapsed: float) -> dict:
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "elapsed_s": round(elapsed, 4),
+        "throughput_rps": round(len(values) / elapsed, 2) if elapsed else None,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+    }
+
+
+async def drive(fn, n: int, concurrency: int) -> tuple[list[float], float]:
+    """Call `await fn(i)` for i in range(n), at most `concurrency` at a time."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await fn(i)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    return latencies, time.perf_counter() - start
+
+
+async def allocations(fn, n: int, concurrency: int) -> dict:
+    """Memory allocated per request, from a separate run under tracemalloc."""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    await drive(fn, n, concurrency)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "peak_kib_per_in_flight": round((peak - baseline) / 1024 / min(n, concurrency), 2),
+        "retained_kib_per_request": round((current - baseline) / 1024 / n, 2),
+    }
+
+
+# ============================================================
+# SCENARIOS
+# ============================================================
+def bench_tools(iterations: int) -> dict:
+    from solution.agent import lookup_order, search_faq
+
+    calls = {
+        "lookup_order": lambda i: lookup_order(f"ORD-{1001 + i % 8}"),
+        "search_faq": lambda i: search_faq(QUERIES[i % len(QUERIES)]),
+    }
+    results = {}
+    for name, call in calls.items():
+        latencies = []
+        start = time.perf_counter()
+        for i in range(iterations):
+            t = time.perf_counter()
+            call(i)
+            latencies.append(time.perf_counter() - t)
+        results[name] = summarize(latencies, time.perf_counter() - start)
+    return results
+
+
+async def bench_agent(levels: list[int], requests: int, alloc_requests: int) -> dict:
+    from solution.agent import support_agent_async
+
+    async def one(i):
+        with fresh_refunds():
+            await support_agent_async(QUERIES[i % len(QUERIES)])
+
+    results = {}
+    for concurrency in levels:
+        latencies, elapsed = await drive(one, requests, concurrency)
+        results[str(concurrency)] = {
+            **summarize(latencies, elapsed),
+            **await allocations(one, alloc_requests, concurrency),
+        }
+    return results
+
+
+async def bench_scorers(levels: list[int], requests: int, alloc_requests: int) -> dict:
+    from braintrust import start_span
+
+    from solution.agent import support_agent_async
+    from solution.scorers import BRAND_CASCADE, FAITHFULNESS_CASCADE, brand_guidelines, expected_tool_path, faithfulness
+
+    scorers = {"BrandGuidelines": brand_guidelines, "faithfulness": faithfulness, "expected_tool_path": expected_tool_path}
+    latencies = {name: [] for name in scorers}
+
+    async def one(i):
+        row = DATASET[i % len(DATASET)]
+        # A root span per row, as Eval gives each row, so the recorded tool
+        # spans are found by the trace scorers
+        with start_span(name="bench-row"), fresh_refunds():
+            output = await support_agent_async(row["input"])
+            kwargs = {"input": row["input"], "output": output, "expected": row["expected"], "metadata": row["metadata"]}
+
+            async def score(name, scorer):
+                start = time.perf_counter()
+                with start_span(name=name, type="score"):
+                    await scorer(**kwargs)
+                latencies[name].append(time.perf_counter() - start)
+
+            await asyncio.gather(*(score(name, scorer) for name, scorer in scorers.items()))
+
+    results = {}
+    for concurrency in levels:
+        for values in latencies.values():
+            values.clear()
+        _, elapsed = await drive(one, requests, concurrency)
+        results[str(concurrency)] = {
+            **{name: summarize(values, elapsed) for name, values in latencies.items()},
+            **await allocations(one, alloc_requests, concurrency),
+        }
+    # Judge calls the rule checks avoided, per dataset category, over all levels
+    results["cascade"] = {cascade.name: cascade.stats() for cascade in (BRAND_CASCADE, FAITHFULNESS_CASCADE)}
+    return results
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default="bench-results.json")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake model latency per completion (s)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Extra random latency, up to this many seconds")
+    parser.add_argument("--script", default=None, help="JSON file of scripted trajectories for the fake server")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=96, help="Requests per concurrency level")
+    parser.add_argument("--alloc-requests", type=int, default=32, help="Requests in each tracemalloc run")
+    parser.add_argument("--tool-iterations", type=int, default=2000)
+    parser.add_argument("--metrics", default=None, help="Also write the agent's Prometheus metrics here")
+    args = parser.parse_args()
+
+    # Measure the code, not the caches
+    os.environ["LLM_CACHE_MODE"] = "passthrough"
+    os.environ["SCORE_CACHE"] = "off"
+    os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+    discard_logs()
+
+    with serve(latency=args.latency, jitter=args.jitter, script=load_script(args.script)) as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+
+        async def run_async():
+            return {
+                "agent": await bench_agent(args.concurrency, args.requests, args.alloc_requests),
+                "scorers": await bench_scorers(args.concurrency, args.requests, args.alloc_requests),
+            }
+
+        results = {"tools": bench_tools(args.tool_iterations), **asyncio.run(run_async())}
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "params": vars(args),
+        "fake_server_requests": server.requests,
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    if args.metrics:
+        from solution.agent_metrics import METRICS
+
+        METRICS.dump(args.metrics)
+
+    for level, stats in results["agent"].items():
+        print(f"agent  c={level:>3}: p50 {stats['p50_ms']:8.1f}ms  p99 {stats['p99_ms']:8.1f}ms  {stats['throughput_rps']:7.1f} req/s  {stats['peak_kib_per_in_flight']:8.1f} KiB/req")
+    for name, stats in results["tools"].items():
+        print(f"tool   {name}: p50 {stats['p50_ms']:.3f}ms  p99 {stats['p99_ms']:.3f}ms")
+    print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Semantic FAQ retrieval over hashed TF-IDF embeddings.
+
+Each FAQ is embedded locally, with no model or network: its words, word
+bigrams and character trigrams are hashed into a fixed number of signed
+dimensions and weighted by IDF. Character trigrams are what match
+paraphrases ("pay" against "payment"). Rows are L2-normalized, so a dot
+product is a cosine similarity.
+
+The embedding matrix is a contiguous float32 array saved as .npy and
+memory-mapped on load, so processes share one copy through the page cache.
+It is built or loaded on the first search, not at import.
+The file name carries a digest of the FAQs and the embedding settings, so an
+edited knowledge base is re-embedded on its own. A search is a single matrix
+product for a whole batch of queries, and a hit below `min_similarity`
+counts as no match.
+
+Configured through the environment:
+    FAQ_EMBEDDINGS_DIR  where the matrix is cached (default .faq_embeddings next to this file)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import zlib
+
+import numpy as np
+
+from data import FAQS
+from faq_index import tokenize
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".faq_embeddings")
+
+
+def features(text: str) -> list[str]:
+    """Words, word bigrams and character trigrams of the text's content words."""
+    words = tokenize(text)
+    grams = [f"w:{w}" for w in words]
+    grams += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"<{word}>"
+        grams += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    return grams
+
+
+class FAQEmbeddings:
+    def __init__(
+        self,
+        faqs: list[dict],
+        dimensions: int = 4096,
+        question_weight: float = 2.0,
+        min_similarity: float = 0.15,
+        directory: str = DEFAULT_DIR,
+    ):
+        self.faqs = faqs
+        self.dimensions = dimensions
+        self.question_weight = question_weight
+        self.min_similarity = min_similarity
+
+        settings = {"faqs": faqs, "dimensions": dimensions, "question_weight": question_weight, "features": 2}
+        digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:16]
+        self.path = os.path.join(directory, f"faqs-{digest}.npy")
+        self._stored = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> np.ndarray:
+        if self._stored is None:
+            with self._lock:
+                if self._stored is None:
+                    if not os.path.exists(self.path):
+                        self._build(self.path)
+                    self._stored = np.load(self.path, mmap_mode="r")
+        return self._stored
+
+    # Row 0 of the stored matrix holds the IDF weights, the rest one unit vector per FAQ
+    @property
+    def idf(self) -> np.ndarray:
+        return self._load()[0]
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self._load()[1:]
+
+    def _counts(self, text: str, weight: float = 1.0) -> np.ndarray:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for gram in features(text):
+            h = zlib.crc32(gram.encode())
+            # The top bit picks the sign, so colliding features tend to cancel out
+            vector[h % self.dimensions] += weight if h & 0x80000000 else -weight
+        return vector
+
+    def _build(self, path: str):
+        counts = np.stack([
+            self._counts(faq["question"], self.question_weight) + self._counts(faq["answer"])
+            for faq in self.faqs
+        ]) if self.faqs else np.zeros((0, self.dimensions), dtype=np.float32)
+        doc_freq = np.count_nonzero(counts, axis=0)
+        idf = np.log((1 + len(self.faqs)) / (1 + doc_freq)).astype(np.float32) + 1
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        partial = f"{path}.{os.getpid()}.partial.npy"
+        stored = np.lib.format.open_memmap(partial, mode="w+", dtype=np.float32, shape=(len(self.faqs) + 1, self.dimensions))
+        stored[0] = idf
+        stored[1:] = self._normalize(counts * idf)
+        stored.flush()
+        del stored
+        os.replace(partial, path)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """(len(texts), dimensions) float32 unit vectors."""
+        counts = np.stack([self._counts(text) for text in texts]) if texts else np.zeros((0, self.dimensions), np.float32)
+        return self._normalize(counts * self.idf)
+
+    def search_batch(self, queries: list[str], k: int = 3, min_similarity: float | None = None) -> list[list[tuple[float, dict]]]:
+        """For each query, up to `k` (similarity, faq) pairs, best first."""
+        threshold = self.min_similarity if min_similarity is None else min_similarity
+        if not queries or not self.faqs:
+            return [[] for _ in queries]
+        similarities = self.embed(queries) @ self.matrix.T
+        k = min(k, len(self.faqs))
+        top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in zip(similarities, top):
+            ranked = candidates[np.argsort(-row[candidates])]
+            results.append([(float(row[i]), self.faqs[i]) for i in ranked if row[i] >= threshold])
+        return results
+
+    def search(self, query: str, k: int = 3, min_similarity: float | None = None) -> list[tuple[float, dict]]:
+        return self.search_batch([query], k, min_similarity)[0]
+
+
+FAQ_EMBEDDINGS = FAQEmbeddings(FAQS, directory=os.environ.get("FAQ_EMBEDDINGS_DIR", DEFAULT_DIR))
@@ -0,0 +1,76 @@
+"""BM25 retrieval over the FAQ knowledge base.
+
+The index is built once at import time. Each posting stores the BM25 weight
+of its term in that entry, so a search only sums precomputed weights for
+the query terms instead of scanning every FAQ.
+"""
+
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+
+from data import FAQS
+
+STOPWORDS = frozenset("""
+a about all am an and any are as at be but by can could do does for from get
+has have how i if in into is it its me my no not of on or our please so that
+the their them then there these this to us was we what when where which who
+why will with would you your acme
+""".split())
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def stem(word: str) -> str:
+    """Strip the most common English plural suffixes."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> list[str]:
+    return [stem(w) for w in TOKEN_PATTERN.findall(text.lower()) if w not in STOPWORDS]
+
+
+class FAQIndex:
+    """Inverted index with BM25 scoring over FAQ questions and answers.
+
+    Question terms count `question_weight` times, so an FAQ whose question
+    matches outranks one that only mentions the term in its answer.
+    """
+
+    def __init__(self, faqs: list[dict], k1: float = 1.2, b: float = 0.75, question_weight: int = 2):
+        self.faqs = faqs
+        term_freqs = []
+        for faq in faqs:
+            tf = Counter(tokenize(faq["answer"]))
+            for term in tokenize(faq["question"]):
+                tf[term] += question_weight
+            term_freqs.append(tf)
+
+        n = len(faqs)
+        avg_len = sum(sum(tf.values()) for tf in term_freqs) / n if n else 0.0
+        doc_freq = Counter(term for tf in term_freqs for term in tf)
+
+        self.postings: dict[str, list[tuple[int, float]]] = defaultdict(list)
+        for doc_id, tf in enumerate(term_freqs):
+            norm = k1 * (1 - b + b * sum(tf.values()) / avg_len)
+            for term, freq in tf.items():
+                idf = math.log(1 + (n - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+                self.postings[term].append((doc_id, idf * freq * (k1 + 1) / (freq + norm)))
+        self.postings = dict(self.postings)
+
+    def search(self, query: str, k: int = 3, min_score: float = 0.0) -> list[tuple[float, dict]]:
+        """Return up to `k` (score, faq) pairs, best first, scoring above `min_score`."""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            for doc_id, weight in self.postings.get(term, ()):
+                scores[doc_id] += weight
+        top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(score, self.faqs[doc_id]) for doc_id, score in top if score > min_score]
+
+
+FAQ_INDEX = FAQIndex(FAQS)
@@ -3,13 +3,36 @@
 Run this once before the workshop to set up the Evals-101-Workshop project
 and populate its dataset with the 12 test cases used in the eval.
 
+It can also load real transcripts from JSONL or CSV files (input, expected and
+metadata fields/columns, metadata as JSON, optional id). Files are streamed,
+so they can be larger than memory. Each row gets a stable id (its own id, or
+a hash of its whole content, so rows that share an input stay apart) and a
+content hash; only rows whose hash differs from the last upload are sent, in
+batches. After each flushed batch the hashes and the number of rows read are
+saved to a local SQLite file, so running again uploads nothing new and an
+interrupted load resumes where it stopped.
+
+The built-in rows carry fixed ids, so editing one updates it in place.
+Earlier versions of this script stored them under random or hashed ids; the
+first built-in load into a dataset deletes those copies (rows whose input
+matches a built-in row under another id), once.
+
 Usage:
     uv run python init.py
+    uv run python init.py transcripts.jsonl more.csv --batch-size 1000
+    uv run python init.py transcripts.jsonl --sink local.jsonl   # dry run into a file
 """
 
-import braintrust
+import argparse
+import csv
+import hashlib
+import itertools
+import json
 import os
+import sqlite3
+from collections.abc import Iterable, Iterator
 
+import braintrust
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -20,67 +43,79 @@ DATASET_NAME = "support-agent-dataset"
 DATASET = [
     # --- Happy path: order lookup ---
     {
+        "id": "order-lookup-ord-1001",
         "input": "What's the status of order ORD-1001?",
         "expected": "Order ORD-1001 has been delivered. It contains Pro Plan (Annual) and the total was $299.99.",
         "metadata": {"category": "order_lookup", "expected_tool": "lookup_order", "expected_tool_path": ["lookup_order"]},
     },
     {
+        "id": "order-lookup-ord-1004",
         "input": "Can you tell me about order ORD-1004?",
         "expected": "Order ORD-1004 has been delivered. Items: Pro Plan (Monthly) and Storage Upgrade. Total: $74.98.",
         "metadata": {"category": "order_lookup", "expected_tool": "lookup_order", "expected_tool_path": ["lookup_order"]},
     },
     # --- Happy path: refund (eligible) ---
     {
+        "id": "refund-ord-1001",
         "input": "I'd like a refund for order ORD-1001, the product didn't meet my expectations.",
         "expected": "Refund of $299.99 for order ORD-1001 has been processed.",
         "metadata": {"category": "refund", "expected_tool": "process_refund", "expected_tool_path": ["process_refund"]},
     },
     # --- Happy path: FAQ ---
     {
+        "id": "faq-reset-password",
         "input": "How do I reset my password?",
         "expected": "Go to Settings > Security > Reset Password. You'll receive an email with a reset link.",
         "metadata": {"category": "faq", "expected_tool": "search_faq", "expected_tool_path": ["search_faq"]},
     },
     {
+        "id": "faq-payment-methods",
         "input": "What payment methods do you accept?",
         "expected": "We accept Visa, Mastercard, American Express, and PayPal.",
         "metadata": {"category": "faq", "expected_tool": "search_faq", "expected_tool_path": ["search_faq"]},
     },
     # --- Failure mode 1: Hallucinated order data (nonexistent order) ---
     {
+        "id": "order-not-found-ord-9999",
         "input": "What's the status of order ORD-9999?",
         "expected": "Order ORD-9999 was not found. Please double-check your order ID or contact support.",
         "metadata": {"category": "order_not_found", "expected_tool": "lookup_order", "expected_tool_path": ["lookup_order"]},
     },
     {
+        "id": "order-not-found-ord-0000",
         "input": "Tell me about order ORD-0000",
         "expected": "That order could not be found in our system.",
         "metadata": {"category": "order_not_found", "expected_tool": "lookup_order", "expected_tool_path": ["lookup_order"]},
     },
     # --- Failure mode 2: Wrong tool selection ---
     {
+        "id": "faq-free-trial",
         "input": "Do you offer a free trial?",
         "expected": "Yes! All plans include a 14-day free trial. No credit card required.",
         "metadata": {"category": "faq", "expected_tool": "search_faq", "expected_tool_path": ["search_faq"]},
     },
     {
+        "id": "faq-cancel-subscription",
         "input": "How do I cancel my subscription?",
         "expected": "Go to Settings > Billing > Cancel Subscription. Your access continues until the end of your billing period.",
         "metadata": {"category": "faq", "expected_tool": "search_faq", "expected_tool_path": ["search_faq"]},
     },
     # --- Failure mode 3: Refund policy violation (ineligible orders) ---
     {
+        "id": "refund-ineligible-ord-1002",
         "input": "I want a refund for order ORD-1002",
         "expected": "Order ORD-1002 is currently shipped and is not eligible for a refund. Only delivered orders can be refunded.",
         "metadata": {"category": "refund_ineligible", "expected_tool": "process_refund", "expected_tool_path": ["process_refund"]},
     },
     {
+        "id": "refund-ineligible-ord-1003",
         "input": "Please refund order ORD-1003, I changed my mind.",
         "expected": "Order ORD-1003 is still processing and cannot be refunded yet. Only delivered orders are eligible.",
         "metadata": {"category": "refund_ineligible", "expected_tool": "process_refund", "expected_tool_path": ["process_refund"]},
     },
     # --- Failure mode 4: FAQ mismatch ---
     {
+        "id": "faq-no-match-slack",
         "input": "Can I integrate Acme with Slack?",
         "expected": "I don't have information about Slack integration. Please contact support@acme.com for help.",
         "metadata": {"category": "faq_no_match", "expected_tool": "search_faq", "expected_tool_path": ["search_faq"]},
@@ -88,18 +123,164 @@ DATASET = [
 ]
 
 
-def main():
-    dataset = braintrust.init_dataset(project=PROJECT_NAME, name=DATASET_NAME, api_key=os.environ["BRAINTRUST_API_KEY"])
+def _digest(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
 
-    for row in DATASET:
-        dataset.insert(
-            input=row["input"],
-            expected=row["expected"],
-            metadata=row["metadata"],
-        )
 
+def read_rows(path: str, start: int = 0) -> Iterator[dict]:
+    """Stream dataset rows from a JSONL or CSV file, skipping the first `start`."""
+    with open(path, newline="") as f:
+        if path.endswith(".csv"):
+            for row in itertools.islice(csv.DictReader(f), start, None):
+                yield {
+                    **row,
+                    "metadata": json.loads(row["metadata"]) if row.get("metadata") else {},
+                }
+        else:
+            # Skipped lines aren't parsed
+            lines = (line for line in f if line.strip())
+            for line in itertools.islice(lines, start, None):
+                yield json.loads(line)
+
+
+def _content(row: dict) -> list:
+    return [row["input"], row.get("expected"), row.get("metadata")]
+
+
+def row_id(row: dict) -> str:
+    # Without an id of its own, an edited row is a new row
+    return row.get("id") or _digest(_content(row))[:32]
+
+
+class UploadState:
+    """Content hashes of uploaded rows and per-source progress, in SQLite."""
+
+    def __init__(self, path: str, target: str):
+        self.target = target
+        self._db = sqlite3.connect(path)
+        self._db.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS rows (target TEXT, id TEXT, hash TEXT, PRIMARY KEY (target, id)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS progress (target TEXT, source TEXT, fingerprint TEXT, rows_read INTEGER, PRIMARY KEY (target, source));
+        """)
+
+    def hashes(self, ids: list[str]) -> dict[str, str]:
+        found = {}
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(ids), 900):
+            chunk = ids[i:i + 900]
+            query = f"SELECT id, hash FROM rows WHERE target = ? AND id IN ({','.join('?' * len(chunk))})"
+            found.update(self._db.execute(query, (self.target, *chunk)))
+        return found
+
+    def resume_point(self, source: str, fingerprint: str) -> int:
+        row = self._db.execute(
+            "SELECT fingerprint, rows_read FROM progress WHERE target = ? AND source = ?", (self.target, source)
+        ).fetchone()
+        return row[1] if row and row[0] == fingerprint else 0
+
+    def commit(self, source: str, fingerprint: str, rows_read: int, uploaded: dict[str, str]):
+        """Record a flushed batch: its row hashes and how far the source has been read."""
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO rows VALUES (?, ?, ?)", ((self.target, id, h) for id, h in uploaded.items())
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO progress VALUES (?, ?, ?, ?)", (self.target, source, fingerprint, rows_read)
+            )
+
+
+class JsonlSink:
+    """Stand-in for a braintrust Dataset that appends inserted rows to a JSONL file."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "a")
+
+    def insert(self, **row) -> str:
+        self._file.write(json.dumps(row) + "\n")
+        return row["id"]
+
+    def flush(self):
+        self._file.flush()
+
+
+def retire_old_builtin_rows(dataset, state: UploadState) -> int:
+    """Delete built-in rows stored under other ids by earlier versions of this script, once per dataset."""
+    # Recorded like a source read to its end, so it runs once per target
+    if state.resume_point("builtin-ids", "fixed") == 1:
+        return 0
+    inputs = {json.dumps(row["input"]) for row in DATASET}
+    ids = {row["id"] for row in DATASET}
+    stale = [
+        record["id"] for record in dataset.fetch()
+        if json.dumps(record.get("input")) in inputs and record["id"] not in ids
+    ]
+    for id in stale:
+        dataset.delete(id)
     dataset.flush()
-    print(f"Loaded {len(DATASET)} rows into dataset '{DATASET_NAME}' in project '{PROJECT_NAME}'")
+    state.commit("builtin-ids", "fixed", 1, {})
+    return len(stale)
+
+
+def upload(rows: Iterable[dict], sink, state: UploadState, source: str, fingerprint: str, start: int = 0, batch_size: int = 500) -> dict:
+    """Send new or changed rows to `sink` in batches, recording progress after each flush."""
+    stats = {"read": start, "uploaded": 0, "unchanged": 0}
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, batch_size)):
+        # Later duplicates of an id within the batch win, as they would on upsert
+        pending = {row_id(row): row for row in batch}
+        hashes = {id: _digest(_content(row)) for id, row in pending.items()}
+        stored = state.hashes(list(pending))
+        changed = {id: h for id, h in hashes.items() if stored.get(id) != h}
+        for id in changed:
+            row = pending[id]
+            sink.insert(id=id, input=row["input"], expected=row.get("expected"), metadata=row.get("metadata"))
+        sink.flush()
+
+        stats["read"] += len(batch)
+        stats["uploaded"] += len(changed)
+        stats["unchanged"] += len(batch) - len(changed)
+        state.commit(source, fingerprint, stats["read"], changed)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="JSONL/CSV files to load (default: the built-in DATASET)")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--sink", default=None, help="Append to this JSONL file instead of uploading")
+    parser.add_argument("--state", default=os.environ.get("DATASET_UPLOAD_STATE", ".dataset_upload.sqlite"))
+    args = parser.parse_args()
+
+    if args.sink:
+        sink = JsonlSink(args.sink)
+        target = f"file:{os.path.abspath(args.sink)}"
+    else:
+        sink = braintrust.init_dataset(project=PROJECT_NAME, name=DATASET_NAME, api_key=os.environ["BRAINTRUST_API_KEY"])
+        target = f"braintrust:{PROJECT_NAME}/{DATASET_NAME}"
+    state = UploadState(args.state, target)
+
+    if args.files:
+        sources = []
+        for path in args.files:
+            stat = os.stat(path)
+            sources.append((os.path.abspath(path), f"{stat.st_size}:{stat.st_mtime_ns}", lambda start, path=path: read_rows(path, start)))
+    else:
+        sources = [("builtin", _digest(DATASET), lambda start: itertools.islice(DATASET, start, None))]
+        if not args.sink:
+            retired = retire_old_builtin_rows(sink, state)
+            if retired:
+                print(f"Deleted {retired} copies of built-in rows stored under old ids")
+
+    for source, fingerprint, reader in sources:
+        start = state.resume_point(source, fingerprint)
+        stats = upload(reader(start), sink, state, source, fingerprint, start=start, batch_size=args.batch_size)
+        print(
+            f"{source}: read {stats['read']} rows ({start} already done), uploaded {stats['uploaded']}, "
+            f"{stats['unchanged']} unchanged"
+        )
+    print(f"Dataset '{DATASET_NAME}' in project '{PROJECT_NAME}' is up to date" if not args.sink else f"Wrote new rows to {args.sink}")
 
 
 if __name__ == "__main__":
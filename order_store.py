@@ -0,0 +1,371 @@
+"""Order storage behind the lookup_order and process_refund tools.
+
+The workshop uses DictOrderStore over data.ORDERS. Set ORDERS_DB to a
+SQLite file to serve orders from disk instead: lookups go through the
+primary key, status and date are indexed, and nothing is loaded up front.
+
+Refunds go through OrderStore.refund, which refunds a delivered order at most
+once. Each refund carries an idempotency key (the agent uses the tool call
+id), so replaying the same call returns the original refund instead of an
+error. DictOrderStore serializes refunds per order with striped locks and
+keeps its ledger in memory, or appends it to the REFUND_LEDGER JSONL file.
+SQLiteOrderStore keeps the ledger in a refunds table, whose unique order_id
+makes claiming a refund a compare-and-swap, so no lock is held while the
+refund is issued. A claim stays pending until settle returns; calls that
+meet it meanwhile get the pending outcome. A claim left pending longer than
+`pending_timeout` (a crash mid-settle) is taken over by the next call for
+that order, which settles it again under its original refund id and key.
+
+The agent's tools use current_store(). Inside `with fresh_refunds():` that
+is ORDER_STORE's orders with an empty, in-memory refund ledger, so each
+eval row or bench pass refunds from a clean slate and scores the same on
+every run.
+
+Usage:
+    uv run python order_store.py load orders.db orders.jsonl   # or .csv
+"""
+
+import csv
+import datetime
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import islice
+from typing import Iterable, Iterator, Protocol
+
+from data import ORDERS
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class OrderStore(Protocol):
+    def get(self, order_id: str) -> dict | None:
+        """Return the order's fields (status, items, total, date), or None."""
+        ...
+
+    def find(self, status: str | None = None, date_from: str | None = None, date_to: str | None = None, limit: int = 100) -> list[dict]:
+        """Return orders (with order_id) matching status and an inclusive ISO date range."""
+        ...
+
+    def bulk_load(self, rows: Iterable[dict]) -> int:
+        """Insert or replace orders from dicts with order_id, status, items, total, date."""
+        ...
+
+    def refund(self, order_id: str, reason: str, idempotency_key: str) -> dict:
+        """Refund a delivered order at most once; returns {"outcome", "order", "refund"}.
+
+        outcome is one of REFUND_OUTCOMES; refund is the ledger entry for the
+        refunded, replayed and already_refunded outcomes, else None.
+        """
+        ...
+
+
+# refunded: a new refund; replayed: this idempotency key was already refunded;
+# already_refunded: the order was refunded under another key;
+# pending: another call is issuing the order's refund right now (SQLite only).
+# Both stores check in this order: replayed, not_found, already_refunded or
+# pending, ineligible
+REFUND_OUTCOMES = ("refunded", "replayed", "already_refunded", "pending", "not_found", "ineligible")
+
+
+def new_refund(order_id: str, order: dict, reason: str, idempotency_key: str) -> dict:
+    return {
+        "refund_id": f"RF-{uuid.uuid4().hex[:12]}",
+        "order_id": order_id,
+        "amount": order["total"],
+        "reason": reason,
+        "idempotency_key": idempotency_key,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+
+
+def settle(refund: dict):
+    """Issue a refund with the payment provider; the workshop has none.
+
+    Stores call it at most once per order, before the refund is recorded.
+    """
+
+
+class DictOrderStore:
+    def __init__(self, orders: dict[str, dict], ledger_path: str | None = None, lock_stripes: int = 256):
+        self.orders = orders
+        self.ledger_path = ledger_path
+        self.settle = settle
+        self._locks = [threading.Lock() for _ in range(lock_stripes)]
+        self._refunds = {}  # order_id -> refund
+        self._keys = {}  # idempotency key -> refund
+        self._ledger = None
+        if ledger_path:
+            if os.path.exists(ledger_path):
+                with open(ledger_path) as f:
+                    for line in f:
+                        try:
+                            refund = json.loads(line)
+                        except ValueError:
+                            continue  # a blank or torn line, from a crash mid-append
+                        self._refunds[refund["order_id"]] = self._keys[refund["idempotency_key"]] = refund
+            # O_APPEND writes of one line land whole, so appends need no lock
+            self._ledger = os.open(ledger_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def get(self, order_id: str) -> dict | None:
+        return self.orders.get(order_id)
+
+    def find(self, status=None, date_from=None, date_to=None, limit=100) -> list[dict]:
+        matches = (
+            {"order_id": order_id, **order}
+            for order_id, order in self.orders.items()
+            if (status is None or order["status"] == status)
+            and (date_from is None or order["date"] >= date_from)
+            and (date_to is None or order["date"] <= date_to)
+        )
+        return list(islice(matches, limit))
+
+    def bulk_load(self, rows: Iterable[dict]) -> int:
+        count = 0
+        for row in rows:
+            row = dict(row)
+            self.orders[row.pop("order_id")] = row
+            count += 1
+        return count
+
+    def _lock(self, order_id: str) -> threading.Lock:
+        return self._locks[zlib.crc32(order_id.encode()) % len(self._locks)]
+
+    def refund(self, order_id: str, reason: str, idempotency_key: str) -> dict:
+        # Only refunds of orders in the same stripe wait on each other
+        with self._lock(order_id):
+            refund = self._keys.get(idempotency_key)
+            if refund:
+                return {"outcome": "replayed", "order": self.get(refund["order_id"]), "refund": refund}
+            order = self.get(order_id)
+            if not order:
+                return {"outcome": "not_found", "order": None, "refund": None}
+            if order_id in self._refunds:
+                return {"outcome": "already_refunded", "order": order, "refund": self._refunds[order_id]}
+            if order["status"] != "delivered":
+                return {"outcome": "ineligible", "order": order, "refund": None}
+            refund = new_refund(order_id, order, reason, idempotency_key)
+            self.settle(refund)
+            if self._ledger is not None:
+                os.write(self._ledger, (json.dumps(refund) + "\n").encode())
+                os.fsync(self._ledger)
+            self._refunds[order_id] = self._keys[idempotency_key] = refund
+            return {"outcome": "refunded", "order": order, "refund": refund}
+
+
+class LedgerOverlay(DictOrderStore):
+    """Orders from another store, with a refund ledger of its own in memory."""
+
+    def __init__(self, inner: OrderStore):
+        super().__init__({})
+        self.inner = inner
+
+    def get(self, order_id: str) -> dict | None:
+        return self.inner.get(order_id)
+
+    def find(self, status=None, date_from=None, date_to=None, limit=100) -> list[dict]:
+        return self.inner.find(status, date_from, date_to, limit)
+
+    def bulk_load(self, rows: Iterable[dict]) -> int:
+        return self.inner.bulk_load(rows)
+
+
+class SQLiteOrderStore:
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS orders (
+        order_id TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        items TEXT NOT NULL,
+        total REAL NOT NULL,
+        date TEXT NOT NULL
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS orders_status ON orders (status, date);
+    CREATE INDEX IF NOT EXISTS orders_date ON orders (date);
+    CREATE TABLE IF NOT EXISTS refunds (
+        refund_id TEXT PRIMARY KEY,
+        order_id TEXT NOT NULL UNIQUE,
+        idempotency_key TEXT NOT NULL UNIQUE,
+        amount REAL NOT NULL,
+        reason TEXT NOT NULL,
+        created TEXT NOT NULL,
+        state TEXT NOT NULL,  -- pending while being issued, then issued
+        claimed REAL NOT NULL  -- when the pending claim was last taken (epoch seconds)
+    ) WITHOUT ROWID;
+    """
+    REFUND_FIELDS = ("refund_id", "order_id", "idempotency_key", "amount", "reason", "created")
+
+    def __init__(self, path: str, pending_timeout: float = 300.0):
+        self.path = path
+        self.pending_timeout = pending_timeout
+        self.settle = settle
+        self._local = threading.local()
+        self._conn.executescript(self.SCHEMA)
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections are per-thread; tools run on worker threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _to_order(row: sqlite3.Row) -> dict:
+        return {"status": row["status"], "items": json.loads(row["items"]), "total": row["total"], "date": row["date"]}
+
+    def get(self, order_id: str) -> dict | None:
+        row = self._conn.execute("SELECT * FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+        return self._to_order(row) if row else None
+
+    def find(self, status=None, date_from=None, date_to=None, limit=100) -> list[dict]:
+        clauses, params = [], []
+        for clause, value in (("status = ?", status), ("date >= ?", date_from), ("date <= ?", date_to)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._conn.execute(f"SELECT * FROM orders {where} ORDER BY date LIMIT ?", (*params, limit))
+        return [{"order_id": row["order_id"], **self._to_order(row)} for row in rows]
+
+    def bulk_load(self, rows: Iterable[dict], batch_size: int = 10_000) -> int:
+        conn = self._conn
+        count = 0
+        rows = iter(rows)
+        while batch := list(islice(rows, batch_size)):
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO orders VALUES (?, ?, ?, ?, ?)",
+                    [(r["order_id"], r["status"], json.dumps(r["items"]), r["total"], r["date"]) for r in batch],
+                )
+            count += len(batch)
+        return count
+
+    def _refund_where(self, column: str, value: str) -> sqlite3.Row | None:
+        return self._conn.execute(
+            f"SELECT {', '.join(self.REFUND_FIELDS)}, state, claimed FROM refunds WHERE {column} = ?", (value,)
+        ).fetchone()
+
+    def _issue(self, refund: dict):
+        """Settle a claimed refund and mark it issued; a failed settle releases the claim."""
+        conn = self._conn
+        try:
+            self.settle(refund)
+        except BaseException:
+            with conn:
+                conn.execute("DELETE FROM refunds WHERE refund_id = ? AND state = 'pending'", (refund["refund_id"],))
+            raise
+        with conn:
+            conn.execute("UPDATE refunds SET state = 'issued' WHERE refund_id = ?", (refund["refund_id"],))
+
+    def _existing(self, row: sqlite3.Row, order: dict | None, idempotency_key: str) -> dict:
+        """Outcome for a call that found the order's (or its key's) refund already claimed."""
+        refund = {field: row[field] for field in self.REFUND_FIELDS}
+        order = order or self.get(refund["order_id"])
+        own = refund["idempotency_key"] == idempotency_key
+        if row["state"] == "pending":
+            now = time.time()
+            if now - row["claimed"] < self.pending_timeout:
+                return {"outcome": "pending", "order": order, "refund": refund}
+            # Abandoned mid-settle; whoever swaps the claim time first finishes it
+            with self._conn as conn:
+                taken = conn.execute(
+                    "UPDATE refunds SET claimed = ? WHERE refund_id = ? AND state = 'pending' AND claimed = ?",
+                    (now, refund["refund_id"], row["claimed"]),
+                ).rowcount
+            if not taken:
+                return {"outcome": "pending", "order": order, "refund": refund}
+            self._issue(refund)
+            return {"outcome": "refunded" if own else "already_refunded", "order": order, "refund": refund}
+        return {"outcome": "replayed" if own else "already_refunded", "order": order, "refund": refund}
+
+    def refund(self, order_id: str, reason: str, idempotency_key: str) -> dict:
+        row = self._refund_where("idempotency_key", idempotency_key)
+        if row:
+            return self._existing(row, None, idempotency_key)
+        order = self.get(order_id)
+        if not order:
+            return {"outcome": "not_found", "order": None, "refund": None}
+        row = self._refund_where("order_id", order_id)
+        if row:
+            return self._existing(row, order, idempotency_key)
+        if order["status"] != "delivered":
+            return {"outcome": "ineligible", "order": order, "refund": None}
+        refund = new_refund(order_id, order, reason, idempotency_key)
+        # The unique order_id and idempotency_key make this insert the compare-and-swap
+        try:
+            with self._conn as conn:
+                conn.execute(
+                    "INSERT INTO refunds VALUES (?, ?, ?, ?, ?, ?, 'pending', ?)",
+                    (*(refund[field] for field in self.REFUND_FIELDS), time.time()),
+                )
+        except sqlite3.IntegrityError:
+            row = self._refund_where("idempotency_key", idempotency_key) or self._refund_where("order_id", order_id)
+            if row is None:
+                # The claim we collided with was released by a failed settle
+                return self.refund(order_id, reason, idempotency_key)
+            return self._existing(row, order, idempotency_key)
+        self._issue(refund)
+        return {"outcome": "refunded", "order": order, "refund": refund}
+
+
+def read_orders(path: str) -> Iterator[dict]:
+    """Stream orders from a JSONL or CSV file one row at a time.
+
+    CSV files need order_id, status, items, total and date columns; items is
+    either a JSON list or a semicolon-separated string.
+    """
+    with open(path, newline="") as f:
+        if path.endswith(".csv"):
+            for row in csv.DictReader(f):
+                items = row["items"]
+                row["items"] = json.loads(items) if items.startswith("[") else items.split(";")
+                row["total"] = float(row["total"])
+                yield row
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def open_store(path: str | None = None, ledger_path: str | None = None) -> OrderStore:
+    return SQLiteOrderStore(path) if path else DictOrderStore(ORDERS, ledger_path)
+
+
+ORDER_STORE = open_store(os.environ.get("ORDERS_DB"), os.environ.get("REFUND_LEDGER"))
+
+_scoped_store = ContextVar("scoped_order_store", default=None)
+
+
+def current_store() -> OrderStore:
+    """The store for the current eval row or bench pass, else ORDER_STORE."""
+    return _scoped_store.get() or ORDER_STORE
+
+
+@contextmanager
+def fresh_refunds():
+    """Run the block against ORDER_STORE's orders with an empty refund ledger."""
+    token = _scoped_store.set(LedgerOverlay(ORDER_STORE))
+    try:
+        yield
+    finally:
+        _scoped_store.reset(token)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "load":
+        sys.exit(__doc__)
+    _, _, db_path, source = sys.argv
+    loaded = SQLiteOrderStore(db_path).bulk_load(read_orders(source))
+    print(f"Loaded {loaded} orders from {source} into {db_path}")
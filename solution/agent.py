@@ -1,61 +1,100 @@
+import asyncio
 import json
 import sys
 import os
+import time
+import uuid
+import weakref
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
-from braintrust import init_logger, traced, wrap_openai
-from openai import OpenAI
-
-from data import FAQS, ORDERS
+from braintrust import current_span, init_logger, traced, wrap_openai
+from openai import AsyncOpenAI
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Project modules read their settings from the environment at import time
+from faq_embeddings import FAQ_EMBEDDINGS
+from order_store import current_store
+from solution.agent_metrics import METRICS, AgentRun
+from solution.llm_cache import LLM_CACHE
+from solution.rate_limits import AGENT_BUDGET
+from solution.request_policy import REQUEST_POLICY
+from solution.router import ROUTER
+from solution.templates import RESPONSE_TEMPLATES
+from solution.span_recorder import SPAN_RECORDER
+from solution.trace_export import TRACE_EXPORTER
+
 # --- Initialize tracing ---
 logger = init_logger(project="Evals-101-Workshop")
-client = wrap_openai(
-    OpenAI(
-        api_key=os.environ["OPENAI_API_KEY"]
-    )
-)
+# TRACE_EXPORT=sampled buffers production traces and keeps a sample plus errors and slow ones
+if TRACE_EXPORTER:
+    TRACE_EXPORTER.install()
+
+# httpx connection pools can't outlive the event loop that opened them, so
+# every loop (the eval's, or one per sync call) gets its own traced client.
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_client() -> AsyncOpenAI:
+    loop = asyncio.get_running_loop()
+    if loop not in _clients:
+        _clients[loop] = wrap_openai(
+            AsyncOpenAI(
+                api_key=os.environ["OPENAI_API_KEY"],
+                http_client=AGENT_BUDGET.http_client(),
+                # REQUEST_POLICY retries failed rounds itself
+                max_retries=0,
+            )
+        )
+    return _clients[loop]
 
 
 # --- Tool implementations ---
 
 @traced(type="tool")
+@SPAN_RECORDER.tool
 def lookup_order(order_id: str) -> str:
-    order = ORDERS.get(order_id)
+    order = current_store().get(order_id)
     if not order:
         return f"Order {order_id} not found."
     return json.dumps({"order_id": order_id, **order})
 
 
 @traced(type="tool")
-def process_refund(order_id: str, reason: str) -> str:
-    order = ORDERS.get(order_id)
-    if not order:
+@SPAN_RECORDER.tool
+def process_refund(order_id: str, reason: str, idempotency_key: str | None = None) -> str:
+    # The tool call id is the idempotency key, so a repeated call can't refund twice
+    result = current_store().refund(order_id, reason, idempotency_key or f"refund_{uuid.uuid4().hex}")
+    order, refund = result["order"], result["refund"]
+    if result["outcome"] == "not_found":
         return f"Error: Order {order_id} not found."
-    if order["status"] != "delivered":
+    if result["outcome"] == "ineligible":
         return f"Error: Order {order_id} is '{order['status']}' and is not eligible for a refund. Only delivered orders can be refunded."
-    return f"Refund of ${order['total']:.2f} for order {order_id} has been processed. Reason: {reason}"
+    if result["outcome"] == "already_refunded":
+        return f"Error: Order {order_id} was already refunded (${refund['amount']:.2f} on {refund['created'][:10]}) and can't be refunded again."
+    if result["outcome"] == "pending":
+        return f"A refund of ${refund['amount']:.2f} for order {refund['order_id']} is being processed right now; it hasn't completed yet."
+    return f"Refund of ${refund['amount']:.2f} for order {refund['order_id']} has been processed. Reason: {refund['reason']}"
 
 
 @traced(type="tool")
+@SPAN_RECORDER.tool
 def search_faq(query: str) -> str:
-    query_lower = query.lower()
-    for faq in FAQS:
-        if any(word in faq["question"].lower() for word in query_lower.split() if len(word) > 3):
-            return json.dumps(faq)
+    hits = FAQ_EMBEDDINGS.search(query, k=1)
+    if hits:
+        return json.dumps(hits[0][1])
     return json.dumps({"question": "No match", "answer": "I couldn't find a relevant FAQ entry. Please contact support@acme.com."})
 
 
 # --- Tool dispatch ---
+# Each entry takes the call's arguments and its tool_call id
 TOOL_MAP = {
-    "lookup_order": lambda args: lookup_order(**args),
-    "process_refund": lambda args: process_refund(**args),
-    "search_faq": lambda args: search_faq(**args),
+    "lookup_order": lambda args, call_id: lookup_order(**args),
+    "process_refund": lambda args, call_id: process_refund(**args, idempotency_key=call_id),
+    "search_faq": lambda args, call_id: search_faq(**args),
 }
 
 # --- OpenAI tool schemas ---
@@ -101,45 +140,223 @@ TOOLS = [
     },
 ]
 
+MODEL = "gpt-4o-mini"
+
 SYSTEM_PROMPT = """You are a helpful customer support agent for Acme Corp, a project management SaaS product.
 Use the provided tools to help customers with their questions. Be concise and friendly.
 If a tool returns an error, relay that information honestly to the customer — do not make up information."""
 
 
 # --- Agent loop ---
-@traced(type="task")
-def support_agent(user_message: str) -> str:
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": user_message},
+async def run_tool_call(
+    tool_call_id: str, fn_name: str, arguments: str, run: AgentRun | None = None, tool_map: dict = TOOL_MAP
+) -> dict:
+    fn_args = json.loads(arguments)
+    # Tools are blocking functions; run them off the loop so calls overlap
+    start = time.perf_counter()
+    result = await asyncio.to_thread(tool_map[fn_name], fn_args, tool_call_id)
+    if run is not None:
+        run.record_tool(fn_name, time.perf_counter() - start)
+    return {
+        "role": "tool",
+        "tool_call_id": tool_call_id,
+        "content": result,
+    }
+
+
+async def routed_turn(user_message: str, run: AgentRun) -> list[dict]:
+    """Run the routed tool for an obvious query and return the turn as if the model had called it."""
+    route = ROUTER.route(user_message)
+    if route is None:
+        return []
+    run.record_route(route.as_dict())
+    arguments = json.dumps(route.arguments)
+    # One id per request: tool call ids double as idempotency keys in TOOL_MAP
+    call_id = f"call_route_{uuid.uuid4().hex[:24]}"
+    return [
+        {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [{"id": call_id, "type": "function", "function": {"name": route.tool, "arguments": arguments}}],
+        },
+        await run_tool_call(call_id, route.tool, arguments, run),
     ]
 
+
+def templated_answer(tool_calls: list, results: list[dict], run: AgentRun) -> str | None:
+    """Canned reply when every tool result of a round fully determines the answer, else None."""
+    names = [call["function"]["name"] if isinstance(call, dict) else call.function.name for call in tool_calls]
+    reply = RESPONSE_TEMPLATES.reply([(name, result["content"]) for name, result in zip(names, results)])
+    if reply is None:
+        return None
+    answer, result_classes = reply
+    run.record_template(result_classes)
+    return answer
+
+
+async def agent_loop(
+    client: AsyncOpenAI, messages: list, user_message: str, run: AgentRun, session=None
+) -> tuple[str, str]:
+    """Answer the user message that ends `messages`, appending each round to it: (answer, exit reason)."""
+    tools, tool_map = (TOOLS, TOOL_MAP) if session is None else (session.tools, session.tool_map)
+    # Obvious queries skip the tool-choosing round. A follow-up ("refund it") may
+    # lean on earlier turns the router can't see, so it goes to the model.
+    turn = await routed_turn(user_message, run) if session is None or not session.turns else []
+    messages.extend(turn)
+    # Terminal tool results skip the phrasing round
+    answer = templated_answer(turn[0]["tool_calls"], turn[1:], run) if turn else None
+    if answer:
+        return answer, "template"
+
     for _ in range(3):
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        start = time.perf_counter()
+        response, request = await REQUEST_POLICY.call(lambda: LLM_CACHE.create(
+            client,
+            model=MODEL,
             messages=messages,
-            tools=TOOLS,
-        )
+            tools=tools,
+        ))
         choice = response.choices[0]
+        run.record_round(time.perf_counter() - start, response.usage, len(choice.message.tool_calls or ()), request)
 
         if choice.finish_reason == "stop":
-            return choice.message.content
+            return choice.message.content, "stop"
 
-        # Process tool calls
+        # Process this round's tool calls concurrently, keeping their order
         messages.append(choice.message)
-        for tool_call in choice.message.tool_calls:
-            fn_name = tool_call.function.name
-            fn_args = json.loads(tool_call.function.arguments)
-            result = TOOL_MAP[fn_name](fn_args)
-            messages.append({
-                "role": "tool",
-                "tool_call_id": tool_call.id,
-                "content": result,
-            })
+        results = await asyncio.gather(*(
+            run_tool_call(tc.id, tc.function.name, tc.function.arguments, run, tool_map)
+            for tc in choice.message.tool_calls
+        ))
+        messages.extend(results)
+        answer = templated_answer(choice.message.tool_calls, results, run)
+        if answer:
+            return answer, "template"
 
     # Exhausted tool-call rounds — get a final answer
-    final = client.chat.completions.create(model="gpt-4o-mini", messages=messages)
-    return final.choices[0].message.content
+    start = time.perf_counter()
+    final, request = await REQUEST_POLICY.call(lambda: LLM_CACHE.create(client, model=MODEL, messages=messages))
+    run.record_round(time.perf_counter() - start, final.usage, request=request)
+    return final.choices[0].message.content, "exhausted"
+
+
+@traced(type="task", name="support_agent")
+async def support_agent_async(user_message: str, session=None) -> str:
+    """Answer one message. With a Session (solution/session.py) the earlier turns go along with it."""
+    client = get_client()
+    run = AgentRun()
+    if session is None:
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_message},
+        ]
+    else:
+        messages = session.prompt(user_message)
+    first = len(messages) - 1
+    answer, exit_reason = await agent_loop(client, messages, user_message, run, session)
+    run.finish(current_span(), exit_reason)
+    if session is not None:
+        session.record(messages[first:], answer)
+    return answer
+
+
+@traced(type="task", name="support_agent", notrace_io=True)
+async def support_agent_stream(user_message: str):
+    """Streaming variant of support_agent_async that yields answer text deltas.
+
+    Tool-call deltas are assembled as they arrive. A call's tool starts as
+    soon as its arguments are complete, which is when the next call begins
+    or when the stream ends, so tools overlap with the rest of the stream.
+    """
+    client = get_client()
+    run = AgentRun()
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_message},
+    ]
+    start = time.perf_counter()
+    time_to_first_token = None
+    text = []
+    exit_reason = "exhausted"
+    turn = await routed_turn(user_message, run)
+    messages.extend(turn)
+    answer = templated_answer(turn[0]["tool_calls"], turn[1:], run) if turn else None
+
+    # Three tool-call rounds, then one final round without tools
+    for round_index in range(0 if answer else 4):
+        tools = {"tools": TOOLS} if round_index < 3 else {}
+        round_start = time.perf_counter()
+        stream, request = await REQUEST_POLICY.call(lambda: client.chat.completions.create(
+            model=MODEL, messages=messages, stream=True, stream_options={"include_usage": True}, **tools
+        ), stream=True)
+        usage = None
+        round_text = []
+        calls = {}  # delta index -> {"id", "name", "arguments"}
+        running = {}  # delta index -> tool task
+
+        def start_ready_calls(before_index):
+            for index, call in calls.items():
+                if index < before_index and index not in running:
+                    running[index] = asyncio.create_task(run_tool_call(call["id"], call["name"], call["arguments"], run))
+
+        async for chunk in stream:
+            # With include_usage the last chunk carries the usage and no choices
+            usage = chunk.usage or usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                if time_to_first_token is None:
+                    time_to_first_token = time.perf_counter() - start
+                round_text.append(delta.content)
+                yield delta.content
+            for tool_delta in delta.tool_calls or ():
+                start_ready_calls(tool_delta.index)
+                call = calls.setdefault(tool_delta.index, {"id": None, "name": "", "arguments": ""})
+                call["id"] = tool_delta.id or call["id"]
+                if tool_delta.function:
+                    call["name"] += tool_delta.function.name or ""
+                    call["arguments"] += tool_delta.function.arguments or ""
+
+        text.extend(round_text)
+        run.record_round(time.perf_counter() - round_start, usage, len(calls), request)
+        if not calls:
+            # The tool-less final round always ends without calls; only an earlier stop is the model's
+            exit_reason = "stop" if round_index < 3 else "exhausted"
+            break
+        start_ready_calls(float("inf"))
+        messages.append({
+            "role": "assistant",
+            "content": "".join(round_text) or None,
+            "tool_calls": [
+                {"id": call["id"], "type": "function", "function": {"name": call["name"], "arguments": call["arguments"]}}
+                for _, call in sorted(calls.items())
+            ],
+        })
+        results = await asyncio.gather(*(running[index] for index in sorted(calls)))
+        messages.extend(results)
+        answer = templated_answer(messages[-len(results) - 1]["tool_calls"], results, run)
+        if answer:
+            break
+
+    if answer:
+        exit_reason = "template"
+        time_to_first_token = time_to_first_token or time.perf_counter() - start
+        text.append(answer)
+        yield answer
+
+    span = current_span()
+    run.finish(span, exit_reason)
+    span.log(
+        input=user_message,
+        output="".join(text),
+        metrics={"time_to_first_token": time_to_first_token, "total_latency": time.perf_counter() - start},
+    )
+
+
+def support_agent(user_message: str) -> str:
+    """Synchronous entry point for callers without an event loop."""
+    return asyncio.run(support_agent_async(user_message))
 
 
 # --- Manual testing / trace generation ---
@@ -152,6 +369,15 @@ if __name__ == "__main__":
         "Can I integrate Acme with Slack?",
         "Please refund order ORD-1003, I changed my mind.",
     ]
-    for q in test_queries:
-        print(f"\nUser: {q}")
-        print(f"Agent: {support_agent(q)}")
+
+    async def main():
+        answers = await asyncio.gather(*(support_agent_async(q) for q in test_queries))
+        for q, a in zip(test_queries, answers):
+            print(f"\nUser: {q}")
+            print(f"Agent: {a}")
+
+    asyncio.run(main())
+    if LLM_CACHE.mode != "passthrough":
+        print(f"\nLLM cache: {LLM_CACHE.stats()}")
+    if os.environ.get("AGENT_METRICS_PATH"):
+        METRICS.dump(os.environ["AGENT_METRICS_PATH"])
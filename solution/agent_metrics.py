@@ -0,0 +1,176 @@
+"""Per-call metrics for the agent loop and a process-wide histogram registry.
+
+Each support_agent call fills an AgentRun: one entry per model round (its
+latency, token usage, attempts and whether it was hedged), one per tool call
+(its execution time) and how the loop ended ("stop" when the model answered,
+"template" when a canned reply did, "exhausted" when it ran out of tool-call
+rounds), plus the router's decision when it skipped the first round.
+AgentRun.finish logs the totals as metrics on the task span and the detail
+as metadata, then folds the run into METRICS.
+
+METRICS aggregates every run in the process and renders them in Prometheus
+text format:
+
+    AGENT_METRICS_PATH=agent.prom uv run python solution/agent.py
+"""
+
+import bisect
+import threading
+import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192)
+ROUND_BUCKETS = (1, 2, 3, 4)
+
+
+def _label_text(labels: tuple) -> str:
+    return ",".join(f'{name}="{value}"' for name, value in labels)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series = {}  # sorted label tuple -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        series = self._series.setdefault(tuple(sorted(labels.items())), [0] * len(self.buckets) + [0.0, 0])
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def totals(self) -> tuple[float, int]:
+        """Sum and count of every observation, across label sets."""
+        return sum(series[-2] for series in self._series.values()), sum(series[-1] for series in self._series.values())
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            prefix = _label_text(labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}{"," if prefix else ""}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}{"," if prefix else ""}le="+Inf"}} {series[-1]}')
+            suffix = f"{{{prefix}}}" if prefix else ""
+            lines.append(f"{self.name}_sum{suffix} {series[-2]}")
+            lines.append(f"{self.name}_count{suffix} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._series = {}  # sorted label tuple -> count
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        self._series[key] = self._series.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, count in sorted(self._series.items()):
+            suffix = f"{{{_label_text(labels)}}}" if labels else ""
+            lines.append(f"{self.name}{suffix} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self.lock = threading.Lock()
+
+    def histogram(self, name: str, help: str, buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help, buckets))
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help))
+
+    def to_prometheus(self) -> str:
+        with self.lock:
+            return "\n".join(line for metric in self._metrics.values() for line in metric.render()) + "\n"
+
+    def dump(self, path: str):
+        with open(path, "w") as f:
+            f.write(self.to_prometheus())
+
+
+METRICS = MetricsRegistry()
+CALL_SECONDS = METRICS.histogram("agent_call_seconds", "End-to-end support_agent latency")
+ROUNDS = METRICS.histogram("agent_rounds", "Model rounds per support_agent call", ROUND_BUCKETS)
+LLM_SECONDS = METRICS.histogram("agent_llm_round_seconds", "Latency of one model round")
+PROMPT_TOKENS = METRICS.histogram("agent_prompt_tokens", "Prompt tokens of one model round", TOKEN_BUCKETS)
+COMPLETION_TOKENS = METRICS.histogram("agent_completion_tokens", "Completion tokens of one model round", TOKEN_BUCKETS)
+TOOL_SECONDS = METRICS.histogram("agent_tool_seconds", "Execution time of one tool call")
+EXITS = METRICS.counter("agent_exits_total", "support_agent calls by how the loop ended")
+ROUTES = METRICS.counter("agent_routes_total", "support_agent calls by routed tool (none: the model chose)")
+
+
+class AgentRun:
+    """Metrics of one support_agent call."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.rounds = []
+        self.tools = []
+        self.route = None
+        self.template = None
+
+    def record_round(self, latency: float, usage=None, tool_calls: int = 0, request: dict | None = None):
+        self.rounds.append({
+            "latency": latency,
+            "prompt_tokens": getattr(usage, "prompt_tokens", None) or 0,
+            "completion_tokens": getattr(usage, "completion_tokens", None) or 0,
+            "tool_calls": tool_calls,
+            "attempts": (request or {}).get("attempts", 1),
+            "hedged": (request or {}).get("hedged", False),
+        })
+
+    def record_route(self, route: dict):
+        self.route = route
+
+    def record_template(self, result_classes: list[str]):
+        self.template = result_classes
+
+    def record_tool(self, name: str, latency: float):
+        self.tools.append({"name": name, "latency": latency})
+
+    def finish(self, span, exit_reason: str) -> dict:
+        """Log this run on `span` and add it to METRICS."""
+        total = time.perf_counter() - self.start
+        metrics = {
+            "rounds": len(self.rounds),
+            "llm_seconds": sum(r["latency"] for r in self.rounds),
+            "tool_seconds": sum(t["latency"] for t in self.tools),
+            "prompt_tokens": sum(r["prompt_tokens"] for r in self.rounds),
+            "completion_tokens": sum(r["completion_tokens"] for r in self.rounds),
+            "retries": sum(r["attempts"] - 1 for r in self.rounds),
+            "hedges": sum(r["hedged"] for r in self.rounds),
+        }
+        span.log(
+            metrics=metrics,
+            metadata={
+                "exit_reason": exit_reason,
+                "route": self.route,
+                "template": self.template,
+                "rounds": self.rounds,
+                "tools": self.tools,
+            },
+        )
+
+        with METRICS.lock:
+            CALL_SECONDS.observe(total)
+            ROUNDS.observe(len(self.rounds))
+            EXITS.inc(reason=exit_reason)
+            ROUTES.inc(tool=self.route["tool"] if self.route else "none")
+            for r in self.rounds:
+                LLM_SECONDS.observe(r["latency"])
+                PROMPT_TOKENS.observe(r["prompt_tokens"])
+                COMPLETION_TOKENS.observe(r["completion_tokens"])
+            for t in self.tools:
+                TOOL_SECONDS.observe(t["latency"], tool=t["name"])
+        return metrics
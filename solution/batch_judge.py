@@ -0,0 +1,172 @@
+"""Batched LLM-classifier judging: several rows per judge request.
+
+An LLMClassifier sends its whole rubric once per row. BatchClassifier sends
+the rubric once for up to `max_batch` rows that ask for a verdict within
+`max_wait` seconds of each other. The rows are numbered in a single prompt,
+and the judge answers with one forced `select_choices` call that holds one
+verdict (reasoning and choice) per row. Each verdict becomes that row's own
+Score.
+
+When a verdict is missing, repeated, out of range or has an unknown choice,
+or the whole response fails to parse, the affected rows are judged one by
+one with the wrapped per-row classifier, so a bad batch never costs a score.
+
+It has the same eval_async / _name interface as the classifier, so
+SCORE_CACHE and the cascades wrap it unchanged.
+
+Configured through the environment:
+    JUDGE_BATCH          rows per judge request (default 1: no batching)
+    JUDGE_BATCH_WAIT_MS  how long a row waits for others to join (default 50)
+"""
+
+import asyncio
+import json
+import os
+
+import chevron
+from autoevals import Score
+from autoevals.oai import arun_cached_request
+
+BATCH_TOOL = "select_choices"
+
+
+class BatchClassifier:
+    def __init__(self, scorer, rubric: str, row_template: str, question: str, max_batch: int = 8, max_wait: float = 0.05):
+        self.scorer = scorer
+        self.rubric = rubric
+        self.row_template = row_template
+        self.question = question
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.model = scorer.model
+        self.batches = 0
+        self.batched_rows = 0
+        self.fallbacks = 0
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+    @classmethod
+    def from_env(cls, scorer, rubric: str, row_template: str, question: str) -> "BatchClassifier | None":
+        max_batch = int(os.environ.get("JUDGE_BATCH", "1"))
+        if max_batch <= 1:
+            return None
+        return cls(scorer, rubric, row_template, question, max_batch, float(os.environ.get("JUDGE_BATCH_WAIT_MS", "50")) / 1000)
+
+    def _name(self) -> str:
+        return self.scorer._name()
+
+    def stats(self) -> dict:
+        return {"batches": self.batches, "batched_rows": self.batched_rows, "fallbacks": self.fallbacks}
+
+    async def eval_async(self, output, expected=None, **fields) -> Score:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(({"output": output, "expected": expected, **fields}, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._judge(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    # --- Request ---
+    def _request(self, rows: list[dict]) -> dict:
+        choices = list(self.scorer.choice_scores)
+        parts = [self.rubric, f"Evaluate each of the following {len(rows)} rows on its own."]
+        for index, fields in enumerate(rows):
+            parts.append(f"Row {index}:\n" + chevron.render(self.row_template, fields, warn=True))
+        parts.append(
+            f"For each row: {self.question} Answer by calling `{BATCH_TOOL}` with exactly one verdict per row, "
+            f"giving the row number, your reasoning in a step-by-step manner, then a single choice from {json.dumps(choices)}."
+        )
+        verdict = {
+            "type": "object",
+            "properties": {
+                "row": {"description": "The row number", "type": "integer"},
+                "reasons": {"description": "Step-by-step reasoning for this row, before the choice", "type": "string"},
+                "choice": {"description": "The choice", "type": "string", "enum": choices},
+            },
+            "required": ["row", "reasons", "choice"],
+        }
+        return {
+            **self.scorer.extra_args,
+            "model": self.model,
+            "messages": [{"role": "user", "content": "\n\n".join(parts)}],
+            "tools": [{
+                "type": "function",
+                "function": {
+                    "name": BATCH_TOOL,
+                    "description": "Call this function to give one verdict per row.",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {"verdicts": {"type": "array", "items": verdict, "minItems": len(rows), "maxItems": len(rows)}},
+                        "required": ["verdicts"],
+                    },
+                },
+            }],
+            "tool_choice": {"type": "function", "function": {"name": BATCH_TOOL}},
+        }
+
+    def _parse(self, response: dict, size: int) -> dict[int, Score]:
+        """Valid verdicts by row number; rows with none (or two) are left out."""
+        message = response["choices"][0]["message"]
+        call = message["tool_calls"][0]["function"]
+        if call["name"] != BATCH_TOOL:
+            raise ValueError(f"Unexpected tool call ({call['name']}) found in response")
+        scores = {}
+        seen = set()
+        for verdict in json.loads(call["arguments"])["verdicts"]:
+            row = verdict.get("row")
+            choice = str(verdict.get("choice", "")).strip()
+            if not isinstance(row, int) or not 0 <= row < size or choice not in self.scorer.choice_scores:
+                continue
+            if row in seen:
+                scores.pop(row, None)
+                continue
+            seen.add(row)
+            scores[row] = Score(
+                name=self._name(),
+                score=self.scorer.choice_scores[choice],
+                metadata={"choice": choice, "rationale": verdict.get("reasons", ""), "batch_size": size},
+            )
+        return scores
+
+    async def _judge(self, batch: list[tuple[dict, asyncio.Future]]):
+        rows = [fields for fields, _ in batch]
+        scores = {}
+        if len(batch) > 1:
+            try:
+                scores = self._parse(await arun_cached_request(client=self.scorer.client, **self._request(rows)), len(rows))
+                self.batches += 1
+                self.batched_rows += len(scores)
+            except Exception:
+                scores = {}
+
+        async def single(fields, future):
+            try:
+                score = await self.scorer.eval_async(**fields)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(score)
+
+        fallbacks = []
+        for index, (fields, future) in enumerate(batch):
+            if index in scores:
+                if not future.done():
+                    future.set_result(scores[index])
+            else:
+                fallbacks.append(single(fields, future))
+        self.fallbacks += len(fallbacks) if len(batch) > 1 else 0
+        await asyncio.gather(*fallbacks)
@@ -0,0 +1,54 @@
+"""Cheap rule checks in front of an expensive LLM judge.
+
+A Cascade holds rules, plain functions of (output, tool_outputs) that
+return a score when the answer is clear from the text alone and None when it
+isn't. Rules run in order and the first verdict wins; only when every rule
+is inconclusive is the judge called; without a judge such rows go unscored.
+Scores decided by a rule carry the rule's name in metadata["cascade"].
+
+Each cascade counts rows per dataset category (metadata["category"]): how
+many were settled by each rule and how many still went to the judge.
+"""
+
+import threading
+from collections import Counter, defaultdict
+
+from autoevals import Score
+
+
+class Cascade:
+    def __init__(self, name: str, rules: list):
+        self.name = name
+        self.rules = rules
+        self._counts = defaultdict(Counter)  # category -> rule name / "judged" / "unscored" -> rows
+        self._lock = threading.Lock()
+
+    async def run(self, judge, output: str, tool_outputs: list[str], metadata: dict | None = None) -> Score | None:
+        """Score with the first conclusive rule, else `await judge()` (None if `judge` is None)."""
+        category = (metadata or {}).get("category", "uncategorized")
+        for rule in self.rules:
+            verdict = rule(output or "", tool_outputs)
+            if verdict is not None:
+                self._count(category, rule.__name__)
+                return Score(name=self.name, score=verdict, metadata={"cascade": rule.__name__})
+        if judge is None:
+            self._count(category, "unscored")
+            return None
+        self._count(category, "judged")
+        return await judge()
+
+    def _count(self, category: str, outcome: str):
+        with self._lock:
+            self._counts[category][outcome] += 1
+
+    def stats(self) -> dict:
+        """Per category: rows settled by each rule, rows judged or left unscored, and judge calls avoided."""
+        with self._lock:
+            return {
+                category: {
+                    **counts,
+                    "judged": counts["judged"],
+                    "avoided": sum(counts.values()) - counts["judged"] - counts["unscored"],
+                }
+                for category, counts in sorted(self._counts.items())
+            }
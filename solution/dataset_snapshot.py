@@ -0,0 +1,265 @@
+"""On-disk snapshots of the eval dataset, keyed by dataset version.
+
+init_dataset fetches every row into memory before the eval sees the first
+one. DATASET_SNAPSHOTS.data() instead returns a SnapshotDataset: the remote
+Dataset, so Eval still links the experiment to it and records each row's
+origin, but iterating it lazily reads a local JSONL snapshot. Rows start
+running as soon as they are read and memory stays flat however large the
+dataset is.
+
+Before reading, the remote dataset's version (its latest _xact_id) and row
+count are checked with one aggregate query; the count catches deleted rows,
+which don't change the latest _xact_id:
+  - same version and count as the snapshot: the snapshot is read as is
+  - newer version: only rows with a newer _xact_id are fetched and merged
+    into a new snapshot while it is being read. If the counts show that rows
+    were deleted, the live ids are also streamed into a temporary SQLite file
+    and rows that are no longer live are dropped; the id list never has to
+    fit in memory
+  - no snapshot yet: the dataset is fetched page by page, each page written
+    to the snapshot and handed to the eval as it arrives
+
+A snapshot is only replaced once it has been read to the end, so an eval
+that stops early never leaves a partial one behind. Each writer uses its own
+temporary file, so processes refreshing the same snapshot (sharded evals)
+don't clobber each other.
+
+Configured through the environment:
+    DATASET_SNAPSHOT      auto (default) | offline (use the snapshot, never
+                          query the server; rows only, no dataset link) |
+                          off (plain init_dataset)
+    DATASET_SNAPSHOT_DIR  snapshot directory (default .dataset_snapshots)
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+from collections.abc import Iterator
+
+from braintrust import init_dataset
+from braintrust.logger import Dataset, ObjectMetadata, ProjectDatasetMetadata
+from braintrust.util import LazyValue
+
+MODES = ("auto", "offline", "off")
+
+# Dataset row fields kept in the snapshot; Eval turns them into EvalCases
+FIELDS = ("id", "input", "expected", "metadata", "tags", "created", "_xact_id")
+
+STAR = [{"op": "star"}]
+XACT_ID = {"op": "ident", "name": ["_xact_id"]}
+# Latest _xact_id and number of live rows, in one aggregate query (no select)
+VERSION_QUERY = {
+    "measures": [
+        {"alias": "version", "expr": {"op": "function", "name": {"op": "ident", "name": ["max"]}, "args": [XACT_ID]}},
+        {"alias": "rows", "expr": {"op": "function", "name": {"op": "ident", "name": ["count"]}, "args": [{"op": "literal", "value": 1}]}},
+    ],
+}
+
+
+def _query(dataset: Dataset, limit: int = 1000, **query) -> Iterator[dict]:
+    """Page through a BTQL query over the dataset, one request per page.
+
+    Rows are selected whole unless the query has its own select or is an
+    aggregate (measures), which BTQL doesn't allow alongside a select.
+    """
+    # Resolving the id logs in, which api_conn() needs
+    dataset_id = dataset.id
+    if "measures" not in query:
+        query.setdefault("select", STAR)
+    cursor = None
+    while True:
+        response = dataset.logging_state.api_conn().post(
+            "btql",
+            json={
+                "query": {
+                    "from": {"op": "function", "name": {"op": "ident", "name": ["dataset"]}, "args": [{"op": "literal", "value": dataset_id}]},
+                    "cursor": cursor,
+                    "limit": limit,
+                    **query,
+                },
+                "use_columnstore": False,
+                "brainstore_realtime": True,
+            },
+            headers={"Accept-Encoding": "gzip"},
+        )
+        response.raise_for_status()
+        body = response.json()
+        yield from body["data"]
+        cursor = body.get("cursor")
+        if not cursor or not body["data"]:
+            return
+
+
+def _row(record: dict) -> dict:
+    return {field: record[field] for field in FIELDS if record.get(field) is not None}
+
+
+def _read(path: str) -> Iterator[dict]:
+    with open(path) as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def fetch_version(dataset: Dataset) -> tuple[str, int]:
+    """(latest _xact_id, live rows) of the remote dataset."""
+    latest = next(_query(dataset, **VERSION_QUERY), None) or {}
+    return latest.get("version") or "0", latest.get("rows") or 0
+
+
+class SnapshotDataset(Dataset):
+    """The remote dataset as Eval data, its rows read through a local snapshot."""
+
+    def __init__(self, snapshots: "DatasetSnapshots", project: str, name: str):
+        remote = init_dataset(project=project, name=name)
+        # Resolved on first use, like init_dataset's own metadata
+        metadata = LazyValue(
+            lambda: ProjectDatasetMetadata(
+                project=remote.project,
+                dataset=ObjectMetadata(id=remote.id, name=remote.name, full_info=remote.data),
+            ),
+            use_mutex=True,
+        )
+        super().__init__(metadata, state=remote.logging_state)
+        self._snapshots = snapshots
+        self._project = project
+        self._name = name
+        self._remote_version = None
+
+    def remote_version(self) -> tuple[str, int]:
+        """(latest _xact_id, live rows), queried once per SnapshotDataset."""
+        if self._remote_version is None:
+            self._remote_version = fetch_version(self)
+        return self._remote_version
+
+    @property
+    def version(self) -> str:
+        # Dataset.version fetches every row; Eval records this on the experiment
+        return self.remote_version()[0]
+
+    def fetch(self, batch_size: int | None = None) -> Iterator[dict]:
+        return self._snapshots._rows(self._project, self._name, self)
+
+
+class DatasetSnapshots:
+    def __init__(self, directory: str = ".dataset_snapshots", mode: str = "auto"):
+        if mode not in MODES:
+            raise ValueError(f"Dataset snapshot mode must be one of {MODES}, got {mode!r}")
+        self.directory = directory
+        self.mode = mode
+        self.hits = 0
+        self.refreshes = 0
+        self.downloads = 0
+
+    @classmethod
+    def from_env(cls) -> "DatasetSnapshots":
+        return cls(
+            directory=os.environ.get("DATASET_SNAPSHOT_DIR", ".dataset_snapshots"),
+            mode=os.environ.get("DATASET_SNAPSHOT", "auto"),
+        )
+
+    def data(self, project: str, name: str):
+        """Eval `data` for the dataset: a SnapshotDataset, rows only when offline, the Dataset itself when off."""
+        if self.mode == "off":
+            return init_dataset(project=project, name=name)
+        if self.mode == "offline":
+            return self._rows(project, name)
+        return SnapshotDataset(self, project, name)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "refreshes": self.refreshes, "downloads": self.downloads}
+
+    # --- Snapshot files ---
+    def _folder(self, project: str, name: str) -> str:
+        return os.path.join(self.directory, project.replace(os.sep, "_"), name.replace(os.sep, "_"))
+
+    def _manifest(self, folder: str) -> dict | None:
+        try:
+            with open(os.path.join(folder, "manifest.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write(self, folder: str, version: str, rows: Iterator[dict], previous: dict | None) -> Iterator[dict]:
+        """Write `rows` to a new snapshot while yielding them; commit it once they run out."""
+        os.makedirs(folder, exist_ok=True)
+        filename = f"{version}.jsonl"
+        fd, partial = tempfile.mkstemp(dir=folder, prefix=f"{filename}.", suffix=".partial")
+        count = 0
+        try:
+            with os.fdopen(fd, "w") as f:
+                for row in rows:
+                    f.write(json.dumps(row) + "\n")
+                    count += 1
+                    yield row
+        except BaseException:
+            os.remove(partial)
+            raise
+        os.replace(partial, os.path.join(folder, filename))
+        fd, manifest = tempfile.mkstemp(dir=folder, prefix="manifest.json.", suffix=".partial")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"version": version, "file": filename, "rows": count}, f)
+        os.replace(manifest, os.path.join(folder, "manifest.json"))
+        if previous and previous["file"] != filename:
+            try:
+                os.remove(os.path.join(folder, previous["file"]))
+            except FileNotFoundError:
+                pass  # another process refreshed it first
+
+    # --- Reading ---
+    def _rows(self, project: str, name: str, dataset: SnapshotDataset | None = None) -> Iterator[dict]:
+        folder = self._folder(project, name)
+        manifest = self._manifest(folder)
+        if self.mode == "offline":
+            if manifest is None:
+                raise FileNotFoundError(f"No snapshot of {project}/{name} in {self.directory}; run once with DATASET_SNAPSHOT=auto")
+            self.hits += 1
+            yield from _read(os.path.join(folder, manifest["file"]))
+            return
+
+        dataset = dataset or SnapshotDataset(self, project, name)
+        version, rows = dataset.remote_version()
+
+        if manifest and manifest["version"] == version and manifest["rows"] == rows:
+            self.hits += 1
+            yield from _read(os.path.join(folder, manifest["file"]))
+        elif manifest:
+            self.refreshes += 1
+            yield from self._write(folder, version, self._merge(dataset, folder, manifest), manifest)
+        else:
+            self.downloads += 1
+            yield from self._write(folder, version, (_row(record) for record in _query(dataset)), None)
+
+    def _merge(self, dataset: SnapshotDataset, folder: str, manifest: dict) -> Iterator[dict]:
+        """The snapshot's rows with changes since its version applied."""
+        newer = {"filter": {"op": "gt", "left": XACT_ID, "right": {"op": "literal", "value": manifest["version"]}}}
+        # Rows added or edited since the snapshot: the increment, held in memory
+        changed = {record["id"]: _row(record) for record in _query(dataset, **newer)}
+        path = os.path.join(folder, manifest["file"])
+        kept = sum(1 for row in _read(path) if row["id"] not in changed)
+        if kept + len(changed) == dataset.remote_version()[1]:
+            for row in _read(path):
+                yield changed.pop(row["id"], row)
+            yield from changed.values()
+            return
+
+        # Some snapshot rows were deleted; look each one up among the live ids
+        fd, ids_path = tempfile.mkstemp(dir=folder, suffix=".ids.sqlite")
+        os.close(fd)
+        ids = sqlite3.connect(ids_path)
+        try:
+            ids.execute("CREATE TABLE live (id TEXT PRIMARY KEY) WITHOUT ROWID")
+            select_id = [{"expr": {"op": "ident", "name": ["id"]}, "alias": "id"}]
+            ids.executemany(
+                "INSERT OR IGNORE INTO live VALUES (?)", ((record["id"],) for record in _query(dataset, select=select_id))
+            )
+            for row in _read(path):
+                if ids.execute("SELECT 1 FROM live WHERE id = ?", (row["id"],)).fetchone():
+                    yield changed.pop(row["id"], row)
+            yield from changed.values()
+        finally:
+            ids.close()
+            os.remove(ids_path)
+
+
+DATASET_SNAPSHOTS = DatasetSnapshots.from_env()
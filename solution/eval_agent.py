@@ -1,129 +1,53 @@
-from autoevals import LLMClassifier, Score
-from autoevals.ragas import Faithfulness
-from braintrust import Eval, init_dataset, _internal_get_global_state
+import os
 
-from solution.agent import support_agent
+from braintrust import Eval
 
+from order_store import fresh_refunds
 
-# ============================================================
-# TASK: Wrap the agent for eval
-# ============================================================
-def task(input, hooks):
-    return support_agent(input)
-
-
-# ============================================================
-# SCORER 1: Brand guidelines (custom LLM-as-a-judge)
-# ============================================================
-brand_guidelines = LLMClassifier(
-    name="BrandGuidelines",
-    prompt_template="""You are evaluating a customer support agent's response for brand guideline compliance.
-
-The agent represents Acme Corp, a project management SaaS company.
-
-Brand voice requirements:
-- Concise: Responses should be direct and to the point, not overly verbose
-- Friendly: Warm and approachable tone, not robotic or cold
-- Professional: Appropriate language, no slang or inappropriate humor
-- Empathetic: Acknowledges the customer's situation or feelings
-- Honest: Does not fabricate information or make promises that cannot be kept
-- Solution-oriented: Focuses on helping the customer resolve their issue
-
-The customer asked: {{input}}
-The agent responded: {{output}}
-
-Does the agent's response comply with ALL of the brand voice requirements listed above?""",
-    choice_scores={"Yes": 1, "No": 0},
-    use_cot=True,
-)
+from solution.agent import support_agent_async, support_agent_stream
+from solution.dataset_snapshot import DATASET_SNAPSHOTS
+from solution.incremental import INCREMENTAL
+from solution.sampling import EVAL_SAMPLER
+from solution.scorers import CASCADE_REPORTER, brand_guidelines, expected_tool_path, faithfulness
 
 
 # ============================================================
-# SCORER 2: Faithfulness (RAGAS, trace-based context extraction)
+# TASK: Wrap the agent for eval
 # ============================================================
-_faithfulness_scorer = Faithfulness()
-
+# AGENT_STREAMING=1 evaluates the streaming agent; the joined deltas are the output
+STREAMING = os.environ.get("AGENT_STREAMING") == "1"
 
-async def faithfulness(input, output, expected, trace=None, **kwargs):
-    """Check if the agent's output is grounded in the tool outputs (context).
 
-    Extracts tool call outputs from the trace spans to use as context,
-    then uses the RAGAS Faithfulness scorer to verify groundedness.
-    """
-    _internal_get_global_state().span_cache.disable()
-    if not trace:
-        return Score(name="Faithfulness", score=0, metadata={"reason": "no trace available"})
-
-    # Extract tool outputs from trace spans as context
-    tool_spans = await trace.get_spans(span_type=["tool"])
-
-    # Skip scoring if lookup_order is the only tool called
-    tool_names = [s.span_attributes.get("name") for s in tool_spans]
-    if tool_names and all(name == "lookup_order" for name in tool_names):
-        return None
-
-    tool_outputs = []
-    for span in tool_spans:
-        if span.output:
-            tool_outputs.append(f"{span.span_attributes.get('name')}: {span.output}")
-
-    if not tool_outputs:
-        return Score(name="Faithfulness", score=0, metadata={"reason": "no tool outputs found in trace"})
-
-    context = "\n".join(tool_outputs)
-
-    result = await _faithfulness_scorer.eval_async(
-        output=output,
-        expected=output,
-        input=input,
-        context=context,
-    )
-    return result
+async def task(input, hooks):
+    # Each row (and trial) refunds from an empty ledger, so reruns score alike
+    with fresh_refunds():
+        if STREAMING:
+            return "".join([delta async for delta in support_agent_stream(input)])
+        return await support_agent_async(input)
 
 
 # ============================================================
-# SCORER 3: Expected tool call path (trace-based, sequence check)
+# RUN THE EVAL
 # ============================================================
-async def expected_tool_path(input, output, expected, metadata=None, trace=None, **kwargs):
-    """Check if the agent called tools in the expected order.
+data = DATASET_SNAPSHOTS.data(project="Evals-101-Workshop", name="support-agent-dataset")
+scores = [
+    brand_guidelines,
+    faithfulness,
+    expected_tool_path,
+]
 
-    Compares the actual sequence of tool calls (from trace spans)
-    against the expected_tool_path in metadata.
-    """
-    _internal_get_global_state().span_cache.disable()
-    if not metadata or "expected_tool_path" not in metadata:
-        return None
+# Every row records its fingerprint; EVAL_BASELINE=<experiment> copies unchanged rows from it
+task, scores = INCREMENTAL.wrap("Evals-101-Workshop", task, scores)
 
-    target_path = set(metadata["expected_tool_path"])
+# EVAL_SAMPLE=stratified runs a per-category sample until the scores settle
+if EVAL_SAMPLER:
+    data, task, scores = EVAL_SAMPLER.rows(data), EVAL_SAMPLER.task(task), EVAL_SAMPLER.scorers(scores)
 
-    if not trace:
-        return Score(name="expected_tool_path", score=0, metadata={"reason": "no trace"})
-
-    # Get tool spans in order and extract the call sequence
-    tool_spans = await trace.get_spans(span_type=["tool"])
-    actual_path = set([s.span_attributes.get("name") for s in tool_spans])
-
-    match = actual_path == target_path
-    return Score(
-        name="expected_tool_path",
-        score=1 if match else 0,
-        metadata={
-            "expected_path": target_path,
-            "actual_path": actual_path,
-        },
-    )
-
-
-# ============================================================
-# RUN THE EVAL
-# ============================================================
 Eval(
     "Evals-101-Workshop",
-    data=init_dataset(project="Evals-101-Workshop", name="support-agent-dataset"),
+    data=data,
     task=task,
-    scores=[
-        brand_guidelines,
-        faithfulness,
-        expected_tool_path,
-    ],
+    scores=scores,
+    # Prints the summary, then rows each rule settled and judge calls avoided
+    reporter=CASCADE_REPORTER,
 )
@@ -0,0 +1,276 @@
+"""Change-aware incremental evals: rerun only the rows a code change can affect.
+
+Every row records a fingerprint in metadata["fingerprint"] that covers:
+    row           the dataset row (input, expected, metadata)
+    system_prompt, tools_schema, model
+    agent         the task's code, minus the tools (see CodeDigest)
+    tools         one digest per tool the row actually called
+    scorers       the scorers' code and judge prompts
+
+With EVAL_BASELINE set, a row found in the baseline gets its fingerprint
+recomputed against today's code for the tools it used back then. If that
+matches the stored fingerprint, the agent and scorers are skipped and the
+baseline's output and scores are copied. An edit to search_faq therefore
+reruns only the rows that searched the FAQ. metadata["provenance"] says
+whether a row was reused, and from where.
+
+Reused scores are all reported by the first scorer; the others return no
+scores for that row (an empty list, since None would log a None score under
+the scorer's own name over the reused one).
+
+EVAL_BASELINE is either a Braintrust experiment name in the eval's project,
+or a path to results on disk: a .jsonl file, or a directory of them (such
+as a solution/sharded_eval.py run directory).
+
+What CodeDigest can't see forces no rerun: data outside the repo (an
+ORDERS_DB database), environment variables read inside functions, and
+model nondeterminism.
+"""
+
+import ast
+import glob
+import hashlib
+import inspect
+import json
+import os
+import sys
+import types
+
+from autoevals import Score
+from braintrust import init as init_experiment
+
+from solution.score_cache import judge_fingerprint
+from solution.span_recorder import SPAN_RECORDER
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Metadata that runners add to a row and that is not part of the dataset row
+RUN_METADATA = ("fingerprint", "provenance", "shard", "shard_attempt")
+
+
+def _digest(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def _in_repo(path: str | None) -> bool:
+    if not path:
+        return False
+    path = os.path.abspath(path)
+    return path.startswith(REPO_ROOT + os.sep) and f"{os.sep}site-packages{os.sep}" not in path and f"{os.sep}.venv{os.sep}" not in path
+
+
+def _code_names(code: types.CodeType) -> set[str]:
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _code_names(const)
+    return names
+
+
+class CodeDigest:
+    """Digest of the repo code, settings and data an object can reach.
+
+    Functions contribute their own source, then whatever globals their code
+    names. Repo modules contribute their whole file and the repo modules they
+    import. Classes and instances of repo classes pull in their module, and
+    instances also add their str/bool attributes (switches like
+    ROUTER.enabled). Plain values are hashed as they are, and autoevals
+    judges by their prompt. Functions in `exclude` are skipped.
+    """
+
+    def __init__(self, exclude=()):
+        self.exclude = {id(inspect.unwrap(fn)) for fn in exclude}
+
+    def __call__(self, *objects) -> str:
+        parts = set()
+        seen = set()
+        for obj in objects:
+            self._visit(obj, parts, seen)
+        return _digest(sorted(parts))
+
+    def _visit(self, obj, parts: set, seen: set):
+        if id(obj) in seen:
+            return
+        seen.add(id(obj))
+        if obj is None or isinstance(obj, (str, int, float, bool)):
+            parts.add(f"value:{obj!r}")
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            for item in obj:
+                self._visit(item, parts, seen)
+        elif isinstance(obj, dict):
+            for key, value in obj.items():
+                parts.add(f"key:{key!r}")
+                self._visit(value, parts, seen)
+        elif isinstance(obj, types.MethodType):
+            self._visit(obj.__func__, parts, seen)
+        elif isinstance(obj, types.FunctionType):
+            self._function(obj, parts, seen)
+        elif isinstance(obj, types.ModuleType):
+            self._module(obj, parts, seen)
+        elif isinstance(obj, type):
+            module = sys.modules.get(obj.__module__)
+            if module is not None:
+                self._visit(module, parts, seen)
+        elif _in_repo(getattr(sys.modules.get(type(obj).__module__), "__file__", None)):
+            self._visit(type(obj), parts, seen)
+            for name, value in sorted(vars(obj).items()):
+                if isinstance(value, (str, bool)):
+                    parts.add(f"setting:{type(obj).__qualname__}.{name}={value!r}")
+        elif hasattr(obj, "_name") and hasattr(obj, "messages"):
+            parts.add(f"judge:{judge_fingerprint(obj)}")
+
+    def _function(self, fn, parts: set, seen: set):
+        fn = inspect.unwrap(fn)
+        seen.add(id(fn))
+        if id(fn) in self.exclude or not _in_repo(fn.__code__.co_filename):
+            return
+        parts.add(f"function:{fn.__module__}.{fn.__qualname__}:{inspect.getsource(fn)}")
+        for name in sorted(_code_names(fn.__code__)):
+            if name in fn.__globals__:
+                self._visit(fn.__globals__[name], parts, seen)
+
+    def _module(self, module, parts: set, seen: set):
+        path = getattr(module, "__file__", None)
+        if not _in_repo(path):
+            return
+        with open(path) as f:
+            source = f.read()
+        parts.add(f"module:{os.path.relpath(path, REPO_ROOT)}:{source}")
+        for node in ast.walk(ast.parse(source)):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                if name in sys.modules:
+                    self._visit(sys.modules[name], parts, seen)
+
+
+def row_digest(input, expected, metadata: dict | None) -> str:
+    metadata = {key: value for key, value in (metadata or {}).items() if key not in RUN_METADATA}
+    return _digest({"input": input, "expected": expected, "metadata": metadata})
+
+
+def _read_results(path: str):
+    files = sorted(glob.glob(os.path.join(path, "*.jsonl"))) if os.path.isdir(path) else [path]
+    for file in files:
+        with open(file) as f:
+            for line in f:
+                yield json.loads(line)
+
+
+class IncrementalEval:
+    def __init__(self, baseline: str | None = None):
+        self.baseline = baseline
+        self.reused = 0
+        self.rerun = 0
+        self._baseline_rows = None
+
+    @classmethod
+    def from_env(cls) -> "IncrementalEval":
+        return cls(baseline=os.environ.get("EVAL_BASELINE") or None)
+
+    def stats(self) -> dict:
+        return {"reused": self.reused, "rerun": self.rerun}
+
+    # --- Fingerprints ---
+    def _prepare(self, task, scorers: list):
+        from solution import agent
+
+        self.components = {
+            "system_prompt": _digest(agent.SYSTEM_PROMPT),
+            "tools_schema": _digest(agent.TOOLS),
+            "model": agent.MODEL,
+        }
+        # Tools are looked up by name at fingerprint time, so a patched tool is seen
+        self._agent = agent
+        tools = [getattr(agent, name) for name in agent.TOOL_MAP]
+        self.components["agent"] = CodeDigest(exclude=tools)(task)
+        self.components["scorers"] = CodeDigest()(scorers)
+        self._tool_digests = {}
+
+    def tool_digest(self, name: str) -> str:
+        fn = getattr(self._agent, name, None)
+        key = (name, id(fn))
+        if key not in self._tool_digests:
+            self._tool_digests[key] = CodeDigest()(fn) if fn is not None else "missing"
+        return self._tool_digests[key]
+
+    def fingerprint(self, row: str, tools: list[str]) -> dict:
+        components = {**self.components, "row": row, "tools": {name: self.tool_digest(name) for name in sorted(set(tools))}}
+        return {"digest": _digest(components), "row": row, "tools": sorted(set(tools)), "components": components}
+
+    # --- Baseline ---
+    def _load_baseline(self, project: str) -> dict:
+        """Baseline root rows that carry a fingerprint, by row digest."""
+        if os.path.exists(self.baseline):
+            records = _read_results(self.baseline)
+        else:
+            experiment = init_experiment(project=project, experiment=self.baseline, open=True)
+            records = (record for record in experiment.fetch() if record.get("span_id") == record.get("root_span_id"))
+        rows = {}
+        for record in records:
+            fingerprint = (record.get("metadata") or {}).get("fingerprint")
+            if fingerprint and not record.get("error"):
+                rows[fingerprint["row"]] = {
+                    "id": record.get("id"),
+                    "output": record.get("output"),
+                    "scores": record.get("scores") or {},
+                    "fingerprint": fingerprint,
+                }
+        return rows
+
+    def reusable(self, row: str) -> dict | None:
+        stored = self._baseline_rows.get(row) if self._baseline_rows else None
+        if stored and self.fingerprint(row, stored["fingerprint"]["tools"])["digest"] == stored["fingerprint"]["digest"]:
+            return stored
+        return None
+
+    # --- Eval wrappers ---
+    def wrap(self, project: str, task, scorers: list):
+        """Eval task and scorers that record fingerprints and reuse unchanged baseline rows."""
+        self._prepare(task, scorers)
+        # Sharded runs wrap once per shard; the baseline is read once per process
+        if self.baseline and self._baseline_rows is None:
+            self._baseline_rows = self._load_baseline(project)
+        takes_hooks = len(inspect.signature(task).parameters) == 2
+
+        async def fingerprinted(input, hooks):
+            row = row_digest(input, hooks.expected, hooks.metadata)
+            stored = self.reusable(row)
+            if stored:
+                self.reused += 1
+                hooks.metadata["fingerprint"] = stored["fingerprint"]
+                hooks.metadata["provenance"] = {"reused_from": self.baseline, "baseline_row": stored["id"], "scores": stored["scores"]}
+                return stored["output"]
+            self.rerun += 1
+            output = task(input, hooks) if takes_hooks else task(input)
+            output = await output if inspect.isawaitable(output) else output
+            trace = SPAN_RECORDER.trace()
+            tools = [span.span_attributes.get("name") for span in trace.spans] if trace else []
+            hooks.metadata["fingerprint"] = self.fingerprint(row, tools)
+            hooks.metadata["provenance"] = {"reused_from": None}
+            return output
+
+        return fingerprinted, [self._scorer(scorer, first=index == 0) for index, scorer in enumerate(scorers)]
+
+    def _scorer(self, scorer, first: bool):
+        async def scored(**kwargs):
+            provenance = (kwargs.get("metadata") or {}).get("provenance") or {}
+            if provenance.get("reused_from"):
+                if not first:
+                    return []
+                return [
+                    Score(name=name, score=score, metadata={"reused_from": provenance["reused_from"]})
+                    for name, score in provenance["scores"].items()
+                ]
+            result = scorer(**kwargs)
+            return await result if inspect.isawaitable(result) else result
+
+        scored.__name__ = scorer.__name__
+        return scored
+
+
+INCREMENTAL = IncrementalEval.from_env()
@@ -0,0 +1,147 @@
+"""Record/replay cache for the agent's chat.completions calls.
+
+Responses are stored on disk under the SHA-256 of the request (model,
+messages, tool schemas and any other arguments), so an unchanged
+SYSTEM_PROMPT, TOOLS and input replays the same trajectory without touching
+the network.
+
+Configured through the environment:
+    LLM_CACHE_MODE    passthrough (default) | record | replay
+    LLM_CACHE_DIR     cache directory (default .llm_cache)
+    LLM_CACHE_MAX_MB  size bound; least recently used entries are evicted (default 256)
+
+In record mode hits are served from disk and misses call the model and are
+stored. In replay mode a miss raises CacheMiss instead of calling the model.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from braintrust import start_span
+from openai.types.chat import ChatCompletion
+
+MODES = ("passthrough", "record", "replay")
+
+
+class CacheMiss(LookupError):
+    pass
+
+
+def to_jsonable(obj):
+    """Turn SDK message objects (pydantic models) into plain JSON values."""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(exclude_none=True)
+    raise TypeError(f"Cannot serialize {type(obj).__name__}")
+
+
+class LLMCache:
+    def __init__(self, directory: str = ".llm_cache", mode: str = "passthrough", max_bytes: int = 256 << 20):
+        if mode not in MODES:
+            raise ValueError(f"LLM cache mode must be one of {MODES}, got {mode!r}")
+        self.directory = directory
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = None  # path -> size, least recently used first
+        self._total_bytes = 0
+
+    @classmethod
+    def from_env(cls) -> "LLMCache":
+        return cls(
+            directory=os.environ.get("LLM_CACHE_DIR", ".llm_cache"),
+            mode=os.environ.get("LLM_CACHE_MODE", "passthrough"),
+            max_bytes=int(float(os.environ.get("LLM_CACHE_MAX_MB", "256")) * (1 << 20)),
+        )
+
+    @staticmethod
+    def key(request: dict) -> str:
+        canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), default=to_jsonable)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def stats(self) -> dict:
+        return {"mode": self.mode, "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    async def create(self, client, **request) -> ChatCompletion:
+        """Drop-in for `await client.chat.completions.create(**request)`."""
+        if self.mode == "passthrough":
+            return await client.chat.completions.create(**request)
+
+        path = self._path(self.key(request))
+        cached = self._read(path)
+        if cached is not None:
+            self.hits += 1
+            response = ChatCompletion.model_validate_json(cached)
+            # Replays bypass wrap_openai, so log the LLM span ourselves
+            with start_span(name="Chat Completion", type="llm") as span:
+                span.log(
+                    input=json.loads(json.dumps(request["messages"], default=to_jsonable)),
+                    output=[choice.model_dump(exclude_none=True) for choice in response.choices],
+                    metadata={"model": request.get("model"), "llm_cache": "hit"},
+                )
+            return response
+
+        self.misses += 1
+        if self.mode == "replay":
+            raise CacheMiss(f"No recorded response for request {os.path.basename(path)} in {self.directory}")
+        response = await client.chat.completions.create(**request)
+        self._write(path, response.model_dump_json())
+        return response
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _load_index(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    stat = os.stat(os.path.join(root, name))
+                    entries.append((stat.st_mtime, os.path.join(root, name), stat.st_size))
+        self._entries = OrderedDict((path, size) for _, path, size in sorted(entries))
+        self._total_bytes = sum(self._entries.values())
+
+    def _read(self, path: str) -> str | None:
+        with self._lock:
+            if self._entries is None:
+                self._load_index()
+            if path not in self._entries:
+                return None
+            self._entries.move_to_end(path)
+        try:
+            with open(path) as f:
+                data = f.read()
+            os.utime(path)  # mtime is the recency order across runs
+            return data
+        except FileNotFoundError:
+            return None
+
+    def _write(self, path: str, data: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        size = os.path.getsize(path)
+
+        with self._lock:
+            if self._entries is None:
+                self._load_index()
+            self._total_bytes += size - self._entries.pop(path, 0)
+            self._entries[path] = size
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                old_path, size = self._entries.popitem(last=False)
+                self._total_bytes -= size
+                self.evictions += 1
+                try:
+                    os.remove(old_path)
+                except FileNotFoundError:
+                    pass
+
+
+LLM_CACHE = LLMCache.from_env()
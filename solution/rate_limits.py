@@ -0,0 +1,244 @@
+"""Rate-limit-aware scheduling for agent and judge traffic.
+
+Agent and judge requests go through separate RateBudgets, each with its own
+requests-per-minute and tokens-per-minute token buckets and an adaptive
+concurrency limit. The limit grows by one per window of successful requests,
+halves on a 429, and the budget pauses for the server's Retry-After. Without
+a configured limit, concurrency is unlimited until the first 429, which sets
+the limit to half the requests then in flight; it goes back to unlimited once
+it has grown past `max_concurrency`.
+
+Requests that continue a row already in flight (later agent rounds, judge
+calls) are admitted before requests that would start a new row, so rows
+finish instead of piling up half-done.
+
+The budgets are applied at the HTTP layer by RateLimitedTransport, which the
+agent's and judges' OpenAI clients use, so 429s are retried here before the
+SDK sees them. A request holds its concurrency slot until its response body
+is closed, so a streamed answer counts against the limit while it streams.
+
+Configured through the environment (unset means unlimited):
+    AGENT_RPM, AGENT_TPM, AGENT_CONCURRENCY
+    JUDGE_RPM, JUDGE_TPM, JUDGE_CONCURRENCY
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import time
+
+import httpx
+from openai import DefaultAsyncHttpxClient
+
+IN_FLIGHT = 0
+NEW_ROW = 1
+
+
+class TokenBucket:
+    """Refills at `per_minute` / 60 per second and holds at most `burst_seconds` of that.
+
+    A take larger than the capacity is allowed once the bucket is full and
+    leaves it in debt, so the average rate still holds for large requests.
+    """
+
+    def __init__(self, per_minute: float | None, burst_seconds: float = 0.1):
+        self.rate = per_minute / 60 if per_minute else None
+        self.capacity = max(1.0, self.rate * burst_seconds) if per_minute else None
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be taken (0 if it can be taken now)."""
+        if not self.capacity:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float):
+        if self.capacity:
+            self._refill()
+            self.level -= amount
+
+
+class RateBudget:
+    def __init__(
+        self, name: str, rpm: float | None = None, tpm: float | None = None, concurrency: int | None = None, max_concurrency: int = 512
+    ):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.limit = float(concurrency) if concurrency else None  # None: unlimited
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.rate_limited = 0
+        self.completed = 0
+        self._waiting = []  # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._changed = None
+        self._loop = None
+
+    @classmethod
+    def from_env(cls, name: str) -> "RateBudget":
+        prefix = name.upper()
+        rpm = os.environ.get(f"{prefix}_RPM")
+        tpm = os.environ.get(f"{prefix}_TPM")
+        concurrency = os.environ.get(f"{prefix}_CONCURRENCY")
+        return cls(
+            name,
+            rpm=float(rpm) if rpm else None,
+            tpm=float(tpm) if tpm else None,
+            concurrency=int(concurrency) if concurrency else None,
+        )
+
+    def _notify(self):
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = asyncio.Event()
+
+    def _event(self) -> asyncio.Event:
+        # Events bind to one loop; sync agent calls each run their own loop
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._changed = asyncio.Event()
+        return self._changed
+
+    async def acquire(self, tokens: float, priority: int = NEW_ROW):
+        entry = (priority, next(self._seq))
+        heapq.heappush(self._waiting, entry)
+        try:
+            while True:
+                wait = None
+                if self._waiting[0] == entry and (self.limit is None or self.in_flight < int(self.limit)):
+                    wait = max(self.paused_until - time.monotonic(), self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                    if wait <= 0:
+                        self.requests.take(1)
+                        self.tokens.take(tokens)
+                        self.in_flight += 1
+                        return
+                try:
+                    await asyncio.wait_for(self._event().wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._waiting.remove(entry)
+            heapq.heapify(self._waiting)
+            self._notify()
+
+    def release(self, rate_limited: bool = False, retry_after: float | None = None):
+        self.in_flight -= 1
+        if rate_limited:
+            self.rate_limited += 1
+            self.limit = max(1.0, (self.in_flight + 1 if self.limit is None else self.limit) / 2)
+            self.paused_until = max(self.paused_until, time.monotonic() + (retry_after or 1.0))
+        else:
+            self.completed += 1
+            if self.limit is not None:
+                self.limit += 1 / self.limit
+                if self.limit > self.max_concurrency:
+                    self.limit = None
+        self._notify()
+
+    def stats(self) -> dict:
+        return {
+            "completed": self.completed,
+            "rate_limited": self.rate_limited,
+            "concurrency_limit": None if self.limit is None else int(self.limit),
+        }
+
+    def http_client(self, priority: int | None = None) -> httpx.AsyncClient:
+        """httpx client for an OpenAI SDK client whose requests draw on this budget."""
+        return DefaultAsyncHttpxClient(transport=RateLimitedTransport(self, priority))
+
+
+def _retry_after(response: httpx.Response) -> float | None:
+    for header, scale in (("retry-after-ms", 1000), ("retry-after", 1)):
+        value = response.headers.get(header)
+        if value:
+            try:
+                return float(value) / scale
+            except ValueError:
+                pass
+    return None
+
+
+def _estimate(request: httpx.Request) -> tuple[float, int]:
+    """Estimate a chat request's tokens (~4 bytes each) and its priority."""
+    try:
+        body = json.loads(request.content)
+    except ValueError:
+        return len(request.content) / 4, NEW_ROW
+    tokens = len(request.content) / 4 + (body.get("max_tokens") or body.get("max_completion_tokens") or 256)
+    # A first agent round carries just the system and user messages
+    priority = IN_FLIGHT if len(body.get("messages", ())) > 2 else NEW_ROW
+    return tokens, priority
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """A response body that gives its request's slot back when it is closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            release, self._release = self._release, None
+            if release is not None:
+                release()
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, budget: RateBudget, priority: int | None = None, max_attempts: int = 8):
+        self.budget = budget
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self._inner = httpx.AsyncHTTPTransport(limits=httpx.Limits(max_connections=1000, max_keepalive_connections=100))
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        tokens, priority = _estimate(request)
+        if self.priority is not None:
+            priority = self.priority
+        for attempt in range(self.max_attempts):
+            await self.budget.acquire(tokens, priority)
+            try:
+                response = await self._inner.handle_async_request(request)
+            except BaseException:
+                self.budget.release()
+                raise
+            if response.status_code != 429 or attempt == self.max_attempts - 1:
+                return httpx.Response(
+                    response.status_code,
+                    headers=response.headers,
+                    stream=_ReleasingStream(response.stream, self.budget.release),
+                    extensions=response.extensions,
+                    request=request,
+                )
+            self.budget.release(rate_limited=True, retry_after=_retry_after(response))
+            await response.aclose()
+            # Retries finish a started request; let them jump the queue
+            priority = IN_FLIGHT
+
+    async def aclose(self):
+        await self._inner.aclose()
+
+
+AGENT_BUDGET = RateBudget.from_env("agent")
+JUDGE_BUDGET = RateBudget.from_env("judge")
@@ -0,0 +1,217 @@
+"""Retries, hedging and a per-round deadline for the agent's model requests.
+
+REQUEST_POLICY.call runs one model round. A failed request (connection
+error, timeout, 5xx, or a 429 the rate-limit transport gave up on) is
+retried up to `max_attempts` times with full-jitter exponential backoff:
+a random wait in [0, min(max_delay, base_delay * 2**retry)].
+
+With hedging on, a request that hasn't answered after the recent p95 model
+latency gets a duplicate. Whichever copy answers first is used and the other
+is cancelled. The p95 comes from the last `window` successful requests, and
+no request is hedged before `min_samples` of them. Hedges are capped at
+`max_hedge_ratio` of all requests, so a slowdown that affects every request
+doesn't double the load.
+
+A round deadline bounds the whole round (every attempt, hedge and backoff).
+When it passes, the round raises RoundDeadlineExceeded. For streamed rounds
+the policy covers opening the stream, not reading it, and never hedges:
+wrap_openai hands back an unread stream that can't be closed through public
+calls, so a losing copy would keep its connection until garbage collection.
+
+Retries are handled here, so the agent's OpenAI client is built with the
+SDK's own retries off.
+
+Configured through the environment:
+    AGENT_MAX_ATTEMPTS    attempts per round (default 3)
+    AGENT_RETRY_BASE_MS   backoff base (default 250)
+    AGENT_RETRY_MAX_MS    backoff cap (default 4000)
+    AGENT_ROUND_DEADLINE  seconds per round (default unset: no deadline)
+    AGENT_HEDGE           1 to hedge slow requests (default off)
+    AGENT_HEDGE_QUANTILE  latency quantile that triggers a hedge (default 0.95)
+
+Retries, hedges and deadlines are counted in METRICS (agent_metrics.py).
+"""
+
+import asyncio
+import os
+import random
+import time
+from collections import deque
+
+import openai
+from openai import AsyncStream
+
+from solution.agent_metrics import METRICS
+
+REQUESTS = METRICS.counter("agent_requests_total", "Model requests sent, by kind (primary, retry, hedge)")
+HEDGE_OUTCOMES = METRICS.counter("agent_hedges_total", "Hedged model rounds, by which copy answered first")
+FAILURES = METRICS.counter("agent_request_failures_total", "Failed model requests, by error type")
+DEADLINES = METRICS.counter("agent_round_deadlines_total", "Model rounds that ran out of time")
+
+
+class RoundDeadlineExceeded(TimeoutError):
+    pass
+
+
+def retryable(error: BaseException) -> bool:
+    if isinstance(error, (openai.APIConnectionError, openai.InternalServerError, openai.RateLimitError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code in (408, 409)
+
+
+async def close_stream(response):
+    """Close a streamed response that won't be read: an AsyncStream, or wrap_openai's generator over one."""
+    if isinstance(response, AsyncStream):
+        await response.close()
+    elif hasattr(response, "aclose"):
+        await response.aclose()
+
+
+async def _discard(task: asyncio.Task):
+    """Cancel a losing request; close it if it already returned a stream."""
+    if task.cancel():
+        return
+    if not task.cancelled() and task.exception() is None:
+        await close_stream(task.result())
+
+
+class RequestPolicy:
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.25,
+        max_delay: float = 4.0,
+        round_deadline: float | None = None,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        min_samples: int = 20,
+        window: int = 200,
+        max_hedge_ratio: float = 0.1,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.round_deadline = round_deadline
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.min_samples = min_samples
+        self.max_hedge_ratio = max_hedge_ratio
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.deadlines = 0
+
+    @classmethod
+    def from_env(cls) -> "RequestPolicy":
+        deadline = os.environ.get("AGENT_ROUND_DEADLINE")
+        return cls(
+            max_attempts=int(os.environ.get("AGENT_MAX_ATTEMPTS", "3")),
+            base_delay=float(os.environ.get("AGENT_RETRY_BASE_MS", "250")) / 1000,
+            max_delay=float(os.environ.get("AGENT_RETRY_MAX_MS", "4000")) / 1000,
+            round_deadline=float(deadline) if deadline else None,
+            hedge=os.environ.get("AGENT_HEDGE") == "1",
+            hedge_quantile=float(os.environ.get("AGENT_HEDGE_QUANTILE", "0.95")),
+        )
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "deadlines": self.deadlines,
+            "hedge_delay": self.hedge_delay(),
+        }
+
+    def hedge_delay(self) -> float | None:
+        """Seconds before a request gets a duplicate, or None when it won't."""
+        if not self.hedge or len(self.latencies) < self.min_samples:
+            return None
+        values = sorted(self.latencies)
+        return values[min(len(values) - 1, int(self.hedge_quantile * len(values)))]
+
+    def backoff(self, retry: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+    # --- Requests ---
+    def _send(self, make_request, kind: str) -> asyncio.Task:
+        self.requests += 1
+        with METRICS.lock:
+            REQUESTS.inc(kind=kind)
+        started = time.perf_counter()
+
+        async def timed():
+            response = await make_request()
+            self.latencies.append(time.perf_counter() - started)
+            return response
+
+        return asyncio.ensure_future(timed())
+
+    async def _attempt(self, make_request, kind: str, deadline: float | None, hedge: bool) -> tuple:
+        """One attempt, hedged if `hedge` and it runs slow: (response, hedged, hedge_won)."""
+        tasks = [self._send(make_request, kind)]
+        delay = self.hedge_delay() if hedge else None
+        winner = None
+        try:
+            if delay is not None and (deadline is None or time.monotonic() + delay < deadline):
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done and self.hedges < self.max_hedge_ratio * self.requests:
+                    self.hedges += 1
+                    tasks.append(self._send(make_request, "hedge"))
+            pending = set(tasks)
+            error = None
+            while pending:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise RoundDeadlineExceeded(f"Model round exceeded its {self.round_deadline}s deadline")
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        hedge_won = len(tasks) > 1 and task is tasks[1]
+                        if len(tasks) > 1:
+                            self.hedge_wins += hedge_won
+                            with METRICS.lock:
+                                HEDGE_OUTCOMES.inc(winner="hedge" if hedge_won else "primary")
+                        return task.result(), len(tasks) > 1, hedge_won
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if task is not winner:
+                    await _discard(task)
+
+    async def call(self, make_request, stream: bool = False) -> tuple:
+        """Run one model round: (response, {"attempts", "hedged", "hedge_won"}).
+
+        `make_request` returns a fresh request coroutine each time it's called.
+        Pass stream=True for streamed rounds, which are retried but not hedged.
+        """
+        deadline = time.monotonic() + self.round_deadline if self.round_deadline else None
+        for attempt in range(self.max_attempts):
+            try:
+                response, hedged, hedge_won = await self._attempt(make_request, "retry" if attempt else "primary", deadline, not stream)
+                return response, {"attempts": attempt + 1, "hedged": hedged, "hedge_won": hedge_won}
+            except RoundDeadlineExceeded:
+                self.deadlines += 1
+                with METRICS.lock:
+                    DEADLINES.inc()
+                raise
+            except Exception as e:
+                with METRICS.lock:
+                    FAILURES.inc(error=type(e).__name__)
+                if not retryable(e) or attempt == self.max_attempts - 1:
+                    raise
+                wait = self.backoff(attempt)
+                if deadline is not None and time.monotonic() + wait >= deadline:
+                    self.deadlines += 1
+                    with METRICS.lock:
+                        DEADLINES.inc()
+                    raise RoundDeadlineExceeded(f"Model round exceeded its {self.round_deadline}s deadline") from e
+                self.retries += 1
+                await asyncio.sleep(wait)
+
+
+REQUEST_POLICY = RequestPolicy.from_env()
@@ -0,0 +1,70 @@
+"""Deterministic routing of obvious queries straight to a tool.
+
+For a message with exactly one order id and a lookup verb, or one whose every
+content word appears in a single FAQ question, the tool the model would pick
+is not in doubt. The agent then runs that tool itself and adds the
+call to the conversation as if the model had made it, so the model is only
+asked to phrase the answer. Anything less clear-cut returns None and goes
+through the normal tool-choosing round.
+
+Only the read-only tools are routed. A message that mentions a refund may
+ask about one, refuse one or request one, so it always goes to the model:
+process_refund moves money and never runs on a pattern match.
+
+Off by default, since it changes the answers the eval measures; set
+AGENT_ROUTER=on to enable it.
+"""
+
+import os
+import re
+
+from faq_index import FAQ_INDEX, FAQIndex, tokenize
+
+ORDER_ID = re.compile(r"\bORD-\d+\b", re.IGNORECASE)
+REFUND = re.compile(r"\brefund", re.IGNORECASE)
+LOOKUP = re.compile(r"\b(?:status|where|track|tracking|look ?up|check|about|details|shipped|delivered|arrive)\b", re.IGNORECASE)
+
+
+class Route:
+    def __init__(self, tool: str, arguments: dict, reason: str):
+        self.tool = tool
+        self.arguments = arguments
+        self.reason = reason
+
+    def as_dict(self) -> dict:
+        return {"tool": self.tool, "arguments": self.arguments, "reason": self.reason}
+
+
+class IntentRouter:
+    def __init__(self, faq_index: FAQIndex, enabled: bool = False):
+        self.faq_index = faq_index
+        self.enabled = enabled
+        self._question_terms = {id(faq): set(tokenize(faq["question"])) for faq in faq_index.faqs}
+
+    @classmethod
+    def from_env(cls) -> "IntentRouter":
+        return cls(FAQ_INDEX, enabled=os.environ.get("AGENT_ROUTER", "off") == "on")
+
+    def route(self, user_message: str) -> Route | None:
+        if not self.enabled:
+            return None
+
+        order_ids = {match.upper() for match in ORDER_ID.findall(user_message)}
+        if len(order_ids) == 1:
+            order_id = order_ids.pop()
+            if REFUND.search(user_message):
+                return None
+            if LOOKUP.search(user_message):
+                return Route("lookup_order", {"order_id": order_id}, "order id with lookup verb")
+            return None
+        if order_ids:
+            return None
+
+        terms = set(tokenize(user_message))
+        hits = self.faq_index.search(user_message, k=1)
+        if terms and hits and terms <= self._question_terms[id(hits[0][1])]:
+            return Route("search_faq", {"query": user_message}, "all terms in one FAQ question")
+        return None
+
+
+ROUTER = IntentRouter.from_env()
@@ -0,0 +1,264 @@
+"""Stratified sampling with early stopping for quick eval passes.
+
+With EVAL_SAMPLE=stratified the eval doesn't run every row. Rows are bucketed
+by metadata["category"] (a bounded uniform reservoir per category) and handed
+out one at a time, always to the category whose scores are least certain.
+Filling the reservoirs reads the whole dataset once, so the first row is
+handed out only after that read. Every finished score updates a running mean
+and Wilson confidence interval per (category, scorer), logged at debug level.
+A category stops getting rows once every scorer's interval is narrower than
+EVAL_CI_WIDTH, and the eval ends when all categories have stopped or run out
+of rows.
+
+At most EVAL_SAMPLE_IN_FLIGHT rows are out at once. A row is back when all
+its scorers have reported for it (later trials of the row don't count), or
+after EVAL_SAMPLE_ROW_TIMEOUT seconds, which frees the slots of rows that
+never run, such as rows left out by `braintrust eval --filter`.
+
+Configured through the environment:
+    EVAL_SAMPLE              "stratified" to enable (default: run every row)
+    EVAL_CI_WIDTH            target full interval width (default 0.2)
+    EVAL_CI_CONFIDENCE       interval confidence (default 0.95)
+    EVAL_MIN_PER_CATEGORY    rows scored per category before it can stop (default 5)
+    EVAL_SAMPLE_IN_FLIGHT    rows running at once, so stopping is timely (default 16)
+    EVAL_SAMPLE_ROW_TIMEOUT  seconds a row holds its slot at most (default 30)
+    EVAL_SAMPLE_POOL         rows kept per category for sampling (default 1000)
+    EVAL_SAMPLE_SEED         sampling seed (default 0)
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from statistics import NormalDist
+
+from autoevals import Score
+
+logger = logging.getLogger(__name__)
+
+# The sampled row whose task or scorers are running in this context
+_current_row = ContextVar("sampled_row", default=None)
+
+
+def wilson_interval(mean: float, n: int, z: float) -> tuple[float, float]:
+    """Wilson score interval for a mean of [0, 1] scores; never zero-width for small n."""
+    if n == 0:
+        return 0.0, 1.0
+    center = (mean + z * z / (2 * n)) / (1 + z * z / n)
+    half = z / (1 + z * z / n) * math.sqrt(mean * (1 - mean) / n + z * z / (4 * n * n))
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def row_key(input, expected, metadata: dict | None) -> str:
+    """Key a row by what its task and scorers both see, as braintrust gives scorers no row id."""
+    content = json.dumps([input, expected, metadata], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class RunningMean:
+    def __init__(self):
+        self.n = 0
+        self.total = 0.0
+
+    def add(self, value: float):
+        self.n += 1
+        self.total += value
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.n if self.n else 0.0
+
+
+class StratifiedSampler:
+    def __init__(
+        self,
+        width: float = 0.2,
+        confidence: float = 0.95,
+        min_per_category: int = 5,
+        in_flight: int = 16,
+        pool_size: int = 1000,
+        seed: int = 0,
+        key: str = "category",
+        row_timeout: float = 30.0,
+    ):
+        self.width = width
+        self.z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        self.min_per_category = min_per_category
+        self.in_flight = in_flight
+        self.pool_size = pool_size
+        self.key = key
+        self.row_timeout = row_timeout
+        self._random = random.Random(seed)
+        self._scores = defaultdict(lambda: defaultdict(RunningMean))  # category -> scorer -> RunningMean
+        self._rows_scored = defaultdict(int)
+        self._scorers = 1
+        self._out = {}  # row key -> [reports still due, deadline], per copy handed out
+        self._changed = None
+
+    @classmethod
+    def from_env(cls) -> "StratifiedSampler | None":
+        if os.environ.get("EVAL_SAMPLE") != "stratified":
+            return None
+        return cls(
+            width=float(os.environ.get("EVAL_CI_WIDTH", "0.2")),
+            confidence=float(os.environ.get("EVAL_CI_CONFIDENCE", "0.95")),
+            min_per_category=int(os.environ.get("EVAL_MIN_PER_CATEGORY", "5")),
+            in_flight=int(os.environ.get("EVAL_SAMPLE_IN_FLIGHT", "16")),
+            pool_size=int(os.environ.get("EVAL_SAMPLE_POOL", "1000")),
+            seed=int(os.environ.get("EVAL_SAMPLE_SEED", "0")),
+            row_timeout=float(os.environ.get("EVAL_SAMPLE_ROW_TIMEOUT", "30")),
+        )
+
+    # --- Wiring into Eval ---
+    def rows(self, data):
+        """Eval `data`: rows of `data` in stratified order, paced by the scores coming back."""
+
+        async def sampled():
+            pools = self._pools(data)
+            while True:
+                open_categories = [c for c, pool in pools.items() if pool and not self.converged(c)]
+                if not open_categories:
+                    return
+                while self._in_flight() >= self.in_flight:
+                    await self._wait()
+                category = max(open_categories, key=self._uncertainty)
+                pool = pools[category]
+                # Pools are unordered samples; pop a random row so order doesn't bias early stops
+                index = self._random.randrange(len(pool))
+                pool[index], pool[-1] = pool[-1], pool[index]
+                row = pool.pop()
+                key = row_key(row.get("input"), row.get("expected"), row.get("metadata"))
+                self._out.setdefault(key, []).append([self._scorers, time.monotonic() + self.row_timeout])
+                yield row
+                # Let the row's task start before deciding the next one
+                await asyncio.sleep(0)
+
+        return sampled()
+
+    def task(self, task):
+        """Eval `task` that frees the row's slot if the task fails and its scorers never run."""
+
+        async def tracked(input, hooks):
+            # Keyed before the wrapped task adds its own metadata; the row's scorers run in this context
+            key = row_key(input, hooks.expected, hooks.metadata)
+            _current_row.set(key)
+            try:
+                return await task(input, hooks)
+            except BaseException:
+                self._report(key, self._scorers)
+                raise
+
+        tracked.__name__ = getattr(task, "__name__", "task")
+        return tracked
+
+    def scorers(self, scorers: list) -> list:
+        """Eval `scores`, each reporting its results to the sampler."""
+        self._scorers = len(scorers)
+        return [self._track(scorer) for scorer in scorers]
+
+    def _track(self, scorer):
+        async def tracked(**kwargs):
+            try:
+                result = await scorer(**kwargs)
+            finally:
+                self._report(_current_row.get(), 1)
+            category = (kwargs.get("metadata") or {}).get(self.key, "uncategorized")
+            for score in result if isinstance(result, list) else [result]:
+                if isinstance(score, Score) and score.score is not None:
+                    self._record(category, score.name, score.score)
+            return result
+
+        tracked.__name__ = scorer.__name__
+        return tracked
+
+    # --- Statistics ---
+    def interval(self, category: str, scorer: str) -> tuple[float, float]:
+        stat = self._scores[category][scorer]
+        return wilson_interval(stat.mean, stat.n, self.z)
+
+    def converged(self, category: str) -> bool:
+        scores = self._scores.get(category)
+        if not scores or self._rows_scored[category] < self.min_per_category:
+            return False
+        return all(high - low <= self.width for low, high in (self.interval(category, name) for name in scores))
+
+    def _uncertainty(self, category: str) -> float:
+        scores = self._scores.get(category)
+        if not scores:
+            return float("inf")
+        return max(high - low for low, high in (self.interval(category, name) for name in scores))
+
+    def summary(self) -> dict:
+        return {
+            category: {
+                name: {"mean": stat.mean, "n": stat.n, "interval": self.interval(category, name)}
+                for name, stat in sorted(scores.items())
+            }
+            for category, scores in sorted(self._scores.items())
+        }
+
+    # --- Internals ---
+    def _pools(self, data) -> dict[str, list]:
+        """Reservoir-sample up to pool_size rows per category, reading all of `data`."""
+        pools = defaultdict(list)
+        seen = defaultdict(int)
+        for row in data:
+            category = (row.get("metadata") or {}).get(self.key, "uncategorized")
+            seen[category] += 1
+            if len(pools[category]) < self.pool_size:
+                pools[category].append(row)
+            else:
+                slot = self._random.randrange(seen[category])
+                if slot < self.pool_size:
+                    pools[category][slot] = row
+        return pools
+
+    def _record(self, category: str, scorer: str, value: float):
+        stat = self._scores[category][scorer]
+        stat.add(value)
+        self._rows_scored[category] = max(self._rows_scored[category], stat.n)
+        if logger.isEnabledFor(logging.DEBUG):
+            low, high = self.interval(category, scorer)
+            done = " (converged)" if self.converged(category) else ""
+            logger.debug("[%s] %s: %.3f [%.3f, %.3f] n=%d%s", category, scorer, stat.mean, low, high, stat.n, done)
+
+    def _in_flight(self) -> int:
+        """Copies still out, after releasing any past their deadline."""
+        now = time.monotonic()
+        for key in list(self._out):
+            copies = [copy for copy in self._out[key] if copy[1] > now]
+            if copies:
+                self._out[key] = copies
+            else:
+                del self._out[key]
+        return sum(len(copies) for copies in self._out.values())
+
+    def _report(self, key: str | None, count: int):
+        # Reports for a row no longer out (a later trial, or past its deadline) are ignored
+        copies = self._out.get(key)
+        if not copies:
+            return
+        copies[0][0] -= count
+        if copies[0][0] <= 0:
+            copies.pop(0)
+            if not copies:
+                del self._out[key]
+        if self._changed is not None:
+            self._changed.set()
+
+    async def _wait(self):
+        self._changed = asyncio.Event()
+        deadline = min(copy[1] for copies in self._out.values() for copy in copies)
+        try:
+            await asyncio.wait_for(self._changed.wait(), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            pass
+
+
+EVAL_SAMPLER = StratifiedSampler.from_env()
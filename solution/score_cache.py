@@ -0,0 +1,130 @@
+"""Persistent memo of LLM-judge scores.
+
+Each result is stored under a fingerprint of the judge (its prompt
+messages, choice scores, classification tools (which carry use_cot),
+model, class and the autoevals version, which pins RAGAS's built-in
+prompts) plus the exact fields it scored. Re-running the eval on
+unchanged agent outputs then returns the stored Score without a judge call.
+
+When a judge's fingerprint changes (say the brand rubric is edited), its
+old entries are deleted the first time the new judge is used. A
+BatchClassifier asks its per-row classifier's question with the same
+rubric and choices, so it shares that classifier's fingerprint and
+entries: turning JUDGE_BATCH on or off keeps the cache.
+
+Off unless asked for, like LLM_CACHE_MODE, so a run scores with the judges
+as they are unless it opts into stored verdicts.
+
+Configured through the environment:
+    SCORE_CACHE       "on" to reuse stored scores (default: always call the judges)
+    SCORE_CACHE_PATH  SQLite file (default .score_cache.sqlite)
+
+Usage:
+    uv run python solution/score_cache.py clear [ScorerName]
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+from importlib.metadata import version
+
+from autoevals import Score
+
+
+def _digest(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def judge_fingerprint(scorer) -> str:
+    # A BatchClassifier is fingerprinted as the classifier it wraps
+    scorer = getattr(scorer, "scorer", scorer)
+    return _digest({
+        "class": type(scorer).__qualname__,
+        "messages": getattr(scorer, "messages", None),
+        "choice_scores": getattr(scorer, "choice_scores", None),
+        "use_cot": getattr(scorer, "use_cot", None),
+        "classification_tools": getattr(scorer, "classification_tools", None),
+        "model": getattr(scorer, "model", None),
+        "autoevals": version("autoevals"),
+    })
+
+
+class ScoreCache:
+    def __init__(self, path: str = ".score_cache.sqlite", enabled: bool = False):
+        self.path = path
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._registered = {}  # id(scorer) -> fingerprint
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @classmethod
+    def from_env(cls) -> "ScoreCache":
+        return cls(
+            path=os.environ.get("SCORE_CACHE_PATH", ".score_cache.sqlite"),
+            enabled=os.environ.get("SCORE_CACHE") == "on",
+        )
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS scores (key TEXT PRIMARY KEY, scorer TEXT NOT NULL, judge TEXT NOT NULL, score TEXT NOT NULL)"
+            )
+        return self._conn
+
+    def _register(self, scorer) -> str:
+        """Fingerprint a judge and drop entries from its earlier prompt or model."""
+        fingerprint = self._registered.get(id(scorer))
+        if fingerprint is None:
+            fingerprint = judge_fingerprint(scorer)
+            with self._lock, self._db() as db:
+                db.execute("DELETE FROM scores WHERE scorer = ? AND judge != ?", (scorer._name(), fingerprint))
+            self._registered[id(scorer)] = fingerprint
+        return fingerprint
+
+    def clear(self, scorer_name: str | None = None) -> int:
+        with self._lock, self._db() as db:
+            if scorer_name is None:
+                return db.execute("DELETE FROM scores").rowcount
+            return db.execute("DELETE FROM scores WHERE scorer = ?", (scorer_name,)).rowcount
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+    async def eval_async(self, scorer, **fields) -> Score:
+        """Drop-in for `await scorer.eval_async(**fields)`."""
+        if not self.enabled:
+            return await scorer.eval_async(**fields)
+
+        judge = self._register(scorer)
+        key = _digest({"judge": judge, "fields": fields})
+        with self._lock:
+            row = self._db().execute("SELECT score FROM scores WHERE key = ?", (key,)).fetchone()
+        if row:
+            self.hits += 1
+            stored = json.loads(row[0])
+            return Score(name=stored["name"], score=stored["score"], metadata={**stored["metadata"], "score_cache": "hit"})
+
+        self.misses += 1
+        result = await scorer.eval_async(**fields)
+        with self._lock, self._db() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?)",
+                (key, scorer._name(), judge, json.dumps(result.as_dict(), default=str)),
+            )
+        return result
+
+
+SCORE_CACHE = ScoreCache.from_env()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3) or sys.argv[1] != "clear":
+        sys.exit(__doc__)
+    removed = SCORE_CACHE.clear(sys.argv[2] if len(sys.argv) == 3 else None)
+    print(f"Removed {removed} cached scores from {SCORE_CACHE.path}")
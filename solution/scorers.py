@@ -0,0 +1,295 @@
+"""Scorers for the support agent eval.
+
+Kept apart from eval_agent.py so benchmarks and other runners can import
+them without starting an Eval.
+"""
+
+import json
+import os
+import re
+
+from autoevals import LLMClassifier, Score
+from autoevals.oai import PROXY_URL
+from autoevals.ragas import Faithfulness
+from braintrust import wrap_openai
+from braintrust.framework import ReporterDef, report_evaluator_result
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+
+from solution.batch_judge import BatchClassifier
+from solution.cascade import Cascade
+from solution.rate_limits import IN_FLIGHT, JUDGE_BUDGET
+from solution.score_cache import SCORE_CACHE
+from solution.span_recorder import SPAN_RECORDER
+from solution.span_snapshot import SPAN_SNAPSHOTS
+
+load_dotenv()
+
+
+def judge_client() -> AsyncOpenAI | None:
+    """The client autoevals would build, drawing on JUDGE_BUDGET; None without a key.
+
+    Same key and endpoint resolution as autoevals (the Braintrust proxy unless
+    OPENAI_BASE_URL is set). Judge calls always belong to rows whose agent run
+    has finished, so they go ahead of rows that haven't started. Only this
+    module's scorers get it; autoevals' global client is left alone.
+    """
+    api_key = os.environ.get("OPENAI_API_KEY") or os.environ.get("BRAINTRUST_API_KEY")
+    if not api_key:
+        return None  # autoevals reports the missing key when a judge runs
+    return wrap_openai(AsyncOpenAI(
+        api_key=api_key,
+        base_url=os.environ.get("OPENAI_BASE_URL", PROXY_URL),
+        http_client=JUDGE_BUDGET.http_client(priority=IN_FLIGHT),
+    ))
+
+
+JUDGE_CLIENT = judge_client()
+
+
+# ============================================================
+# SCORER 1: Brand guidelines (custom LLM-as-a-judge)
+# ============================================================
+BRAND_RUBRIC = """You are evaluating a customer support agent's response for brand guideline compliance.
+
+The agent represents Acme Corp, a project management SaaS company.
+
+Brand voice requirements:
+- Concise: Responses should be direct and to the point, not overly verbose
+- Friendly: Warm and approachable tone, not robotic or cold
+- Professional: Appropriate language, no slang or inappropriate humor
+- Empathetic: Acknowledges the customer's situation or feelings
+- Honest: Does not fabricate information or make promises that cannot be kept
+- Solution-oriented: Focuses on helping the customer resolve their issue"""
+BRAND_ROW = """The customer asked: {{input}}
+The agent responded: {{output}}"""
+BRAND_QUESTION = "Does the agent's response comply with ALL of the brand voice requirements listed above?"
+
+_brand_guidelines_scorer = LLMClassifier(
+    name="BrandGuidelines",
+    prompt_template="\n\n".join([BRAND_RUBRIC, BRAND_ROW, BRAND_QUESTION]),
+    choice_scores={"Yes": 1, "No": 0},
+    use_cot=True,
+    client=JUDGE_CLIENT,
+)
+
+# JUDGE_BATCH=8 judges up to 8 rows per request, sending the rubric once
+BRAND_BATCH = BatchClassifier.from_env(_brand_guidelines_scorer, BRAND_RUBRIC, BRAND_ROW, BRAND_QUESTION)
+
+# --- Rule checks that settle a row without the judge ---
+RAW_JSON = re.compile(r'\{\s*"\w+"\s*:')
+
+
+def empty_response(output, tool_outputs):
+    return 0 if not output.strip() else None
+
+
+def raw_tool_output(output, tool_outputs):
+    """Pasting a JSON tool result at the customer is neither concise nor friendly."""
+    return 0 if RAW_JSON.search(output) else None
+
+
+def over_length(output, tool_outputs):
+    return 0 if len(output.split()) > 250 else None
+
+
+BRAND_CASCADE = Cascade("BrandGuidelines", [empty_response, raw_tool_output, over_length])
+
+
+async def brand_guidelines(input, output, metadata=None, **kwargs):
+    """Brand voice judge, skipped when a rule check already fails the response."""
+    # With SCORE_CACHE=on, unchanged (input, output) pairs reuse their stored verdict
+    return await BRAND_CASCADE.run(
+        lambda: SCORE_CACHE.eval_async(BRAND_BATCH or _brand_guidelines_scorer, input=input, output=output),
+        output,
+        [],
+        metadata,
+    )
+
+
+# ============================================================
+# SCORER 2: Faithfulness (RAGAS, trace-based context extraction)
+# ============================================================
+_faithfulness_scorer = Faithfulness(client=JUDGE_CLIENT)
+
+# --- Rule checks that settle a row without the judge ---
+NOT_FOUND = re.compile(r"\bnot found\b", re.IGNORECASE)
+REFUSAL = re.compile(
+    r"(?:couldn't|could not|can't|cannot|unable to|wasn't able to) (?:find|locate)|not found|doesn't exist|does not exist",
+    re.IGNORECASE,
+)
+ORDER_DETAILS = re.compile(r"\$\d|\b(?:delivered|shipped|processing|cancelled|pending)\b", re.IGNORECASE)
+INELIGIBLE = re.compile(r"is '(\w+)' and is not eligible for a refund")
+NOT_ELIGIBLE = re.compile(r"not eligible|isn't eligible|ineligible|(?:can't|cannot|can not) be refunded|only delivered", re.IGNORECASE)
+REFUND_CLAIMED = re.compile(r"refund\b[^.]*\b(?:has been|was|is being) (?:processed|issued)|has been refunded", re.IGNORECASE)
+FACT = re.compile(r"\$?\d[\d,.]*\d|\$?\d|ORD-\d+|[\w.+-]+@[\w-]+\.[\w.]+|https?://\S+")
+WORD = re.compile(r"[a-z][a-z'-]*")
+
+# Words a passing answer may use that the tool outputs needn't contain:
+# function words and support pleasantries, plus each rule's own phrasing
+FILLER = frozenset("""
+a about again all also am an and any anything are as assist at be been but by can could do else feel for free
+from glad happy has have help here hope need i i'd i'll i'm if in is it it's its just know let me more my no
+not of on or our out please questions reach so sorry sure thank thanks that that's the there this to today us
+was we we're were what will with would you you'd you're your
+""".split())
+REFUSAL_WORDS = frozenset("""
+able check correct couldn't double-check exist find found id locate number order process refund try unable wasn't
+""".split())
+INELIGIBLE_WORDS = frozenset("""
+can't cannot currently delivered eligible ineligible isn't once only order orders refund refunded refunds status yet
+""".split())
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def covered(output: str, tool_outputs: list[str], vocabulary: frozenset = frozenset()) -> bool:
+    """Every figure, id and word of the output comes from the tools, FILLER or `vocabulary`.
+
+    Anything else may be a claim the tools don't support, which is the
+    judge's call, not a rule's.
+    """
+    context = " ".join(tool_outputs)
+    if not all(fact.strip(".,") in context for fact in FACT.findall(output)):
+        return False
+    known = {word.strip("'-") for word in WORD.findall(context.lower())} | FILLER | vocabulary
+    return all(word.strip("'-") in known for word in WORD.findall(output.lower()))
+
+
+def missing_order_refusal(output, tool_outputs):
+    """Every lookup failed: saying so and nothing more is grounded, describing the order is not."""
+    if not tool_outputs or not all(NOT_FOUND.search(t) for t in tool_outputs):
+        return None
+    if ORDER_DETAILS.search(output):
+        return 0
+    return 1 if REFUSAL.search(output) and covered(output, tool_outputs, REFUSAL_WORDS) else None
+
+
+def ineligible_refund(output, tool_outputs):
+    """Every refund was refused: relaying the status and nothing more is grounded, claiming a refund is not."""
+    statuses = [match.group(1) for t in tool_outputs if (match := INELIGIBLE.search(t))]
+    if not statuses or len(statuses) != len(tool_outputs):
+        return None
+    if REFUND_CLAIMED.search(output):
+        return 0
+    if (
+        NOT_ELIGIBLE.search(output)
+        and all(status in output.lower() for status in statuses)
+        and covered(output, tool_outputs, INELIGIBLE_WORDS)
+    ):
+        return 1
+    return None
+
+
+def _answer(tool_output: str) -> str:
+    try:
+        return json.loads(tool_output).get("answer") or tool_output
+    except (ValueError, AttributeError):
+        return tool_output
+
+
+def contains_tool_answer(output, tool_outputs):
+    """The output quotes a tool's answer verbatim and says nothing the tools don't."""
+    normalized = _normalize(output)
+    if not any(_normalize(_answer(t)) in normalized for t in tool_outputs if t):
+        return None
+    return 1 if covered(output, tool_outputs) else None
+
+
+FAITHFULNESS_CASCADE = Cascade("Faithfulness", [missing_order_refusal, ineligible_refund, contains_tool_answer])
+
+
+async def faithfulness(input, output, expected, metadata=None, trace=None, **kwargs):
+    """Check if the agent's output is grounded in the tool outputs (context).
+
+    Extracts tool call outputs from the trace spans to use as context,
+    then uses the RAGAS Faithfulness scorer to verify groundedness.
+    """
+    # Prefer the spans recorded in-process; the remote trace costs a fetch
+    trace = SPAN_RECORDER.trace() or trace
+    if not trace:
+        return Score(name="Faithfulness", score=0, metadata={"reason": "no trace available"})
+
+    # Extract tool outputs from trace spans as context
+    tool_spans = await SPAN_SNAPSHOTS.tool_spans(trace)
+
+    # Rows where lookup_order is the only tool called go to the rule checks but not the judge
+    tool_names = [s.span_attributes.get("name") for s in tool_spans]
+    if tool_names and all(name == "lookup_order" for name in tool_names):
+        return await FAITHFULNESS_CASCADE.run(None, output, [span.output for span in tool_spans if span.output], metadata)
+
+    tool_outputs = []
+    for span in tool_spans:
+        if span.output:
+            tool_outputs.append(f"{span.span_attributes.get('name')}: {span.output}")
+
+    if not tool_outputs:
+        return Score(name="Faithfulness", score=0, metadata={"reason": "no tool outputs found in trace"})
+
+    context = "\n".join(tool_outputs)
+
+    # Clear-cut rows are settled by the rule checks; the rest go to the judge
+    return await FAITHFULNESS_CASCADE.run(
+        lambda: SCORE_CACHE.eval_async(
+            _faithfulness_scorer,
+            output=output,
+            expected=output,
+            input=input,
+            context=context,
+        ),
+        output,
+        [span.output for span in tool_spans if span.output],
+        metadata,
+    )
+
+
+# ============================================================
+# SCORER 3: Expected tool call path (trace-based, sequence check)
+# ============================================================
+async def expected_tool_path(input, output, expected, metadata=None, trace=None, **kwargs):
+    """Check if the agent called tools in the expected order.
+
+    Compares the actual sequence of tool calls (from trace spans)
+    against the expected_tool_path in metadata.
+    """
+    if not metadata or "expected_tool_path" not in metadata:
+        return None
+
+    target_path = set(metadata["expected_tool_path"])
+
+    trace = SPAN_RECORDER.trace() or trace
+    if not trace:
+        return Score(name="expected_tool_path", score=0, metadata={"reason": "no trace"})
+
+    # Get tool spans in order and extract the call sequence
+    tool_spans = await SPAN_SNAPSHOTS.tool_spans(trace)
+    actual_path = set([s.span_attributes.get("name") for s in tool_spans])
+
+    match = actual_path == target_path
+    return Score(
+        name="expected_tool_path",
+        score=1 if match else 0,
+        metadata={
+            "expected_path": target_path,
+            "actual_path": actual_path,
+        },
+    )
+
+
+# ============================================================
+# REPORTER: the usual summary plus how often each cascade skipped its judge
+# ============================================================
+def report_with_cascades(evaluator, result, verbose, jsonl):
+    ok = report_evaluator_result(evaluator, result, verbose, jsonl)
+    stats = {cascade.name: cascade.stats() for cascade in (BRAND_CASCADE, FAITHFULNESS_CASCADE)}
+    print(json.dumps({"cascade": stats}) if jsonl else f"Cascade: {json.dumps(stats, indent=2)}")
+    return ok
+
+
+CASCADE_REPORTER = ReporterDef(
+    name="cascade",
+    report_eval=report_with_cascades,
+    report_run=lambda results, verbose, jsonl: all(results),
+)
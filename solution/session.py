@@ -0,0 +1,183 @@
+"""Multi-turn support conversations with a bounded context.
+
+support_agent_async(message) starts from the system prompt on every call. A
+Session carries a conversation across calls:
+
+    session = Session.from_env()
+    await session.ask("What's the status of order ORD-1001?")
+    await session.ask("It arrived broken, please refund it")
+
+Each request is the system prompt, a summary of folded turns, the recent
+turns and the new message, with TOOLS plus get_tool_result. The history is
+kept compact:
+
+- A turn is compacted once, when it's recorded. Its tool results are stored
+  in `session.results` and the history keeps a reference with the first
+  SESSION_RESULT_CHARS of each, e.g. `[R3] {"order_id": "ORD-1001", ...`.
+  The turn's answer already says what the customer was told; when the model
+  needs the rest, get_tool_result("R3") returns the stored result in full.
+- When the recent turns pass SESSION_HISTORY_TOKENS (~4 bytes per token),
+  the oldest are folded into the summary until they fit in half of it. The
+  summary has one clipped customer/agent line per folded turn and keeps the
+  latest lines that fit in SESSION_SUMMARY_TOKENS, counting the rest.
+
+Once a conversation has turns, messages skip the router (solution/router.py)
+and go to the model, which can resolve "refund it" from the history.
+
+SYSTEM_PROMPT and the tools are never rewritten, and between compactions the
+history only grows at its end, so each request starts with the previous
+one and provider prefix caching keeps hitting. Folding down to half the
+budget means the part after the system prompt changes once every few
+turns, not on every turn.
+
+Configured through the environment:
+    SESSION_HISTORY_TOKENS  budget for the recent turns (default 2000)
+    SESSION_SUMMARY_TOKENS  budget for the summary of folded turns (default 400)
+    SESSION_RESULT_CHARS    characters of a tool result kept beside its reference (default 160)
+"""
+
+import asyncio
+import json
+import os
+from collections import OrderedDict
+
+from solution.agent import SYSTEM_PROMPT, TOOL_MAP, TOOLS, support_agent_async
+from solution.llm_cache import to_jsonable
+
+RESULT_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "get_tool_result",
+        "description": "Get the full text of an earlier tool result that the conversation shows clipped, by its reference.",
+        "parameters": {
+            "type": "object",
+            "properties": {"ref": {"type": "string", "description": "The result's reference, e.g. R3"}},
+            "required": ["ref"],
+        },
+    },
+}
+
+
+def estimate_tokens(messages: list[dict]) -> int:
+    return len(json.dumps(messages, default=to_jsonable)) // 4
+
+
+def _clip(text: str | None, limit: int) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+class Turn:
+    def __init__(self, user_message: str, answer: str, messages: list[dict]):
+        self.user_message = user_message
+        self.answer = answer
+        self.messages = messages
+        self.tokens = estimate_tokens(messages)
+
+
+class Session:
+    def __init__(
+        self,
+        history_tokens: int = 2000,
+        summary_tokens: int = 400,
+        result_chars: int = 160,
+        max_results: int = 1000,
+    ):
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        self.result_chars = result_chars
+        self.max_results = max_results
+        self.turns = []  # recent turns, oldest first
+        self.summary_lines = []
+        self.omitted = 0  # folded turns whose summary lines were dropped
+        self.results = OrderedDict()  # reference -> full tool result
+        self.compactions = 0
+        self._refs = 0
+        self._lock = asyncio.Lock()
+        self.tools = [*TOOLS, RESULT_TOOL]
+        self.tool_map = {**TOOL_MAP, "get_tool_result": lambda args, call_id: self.result(**args)}
+
+    @classmethod
+    def from_env(cls) -> "Session":
+        return cls(
+            history_tokens=int(os.environ.get("SESSION_HISTORY_TOKENS", "2000")),
+            summary_tokens=int(os.environ.get("SESSION_SUMMARY_TOKENS", "400")),
+            result_chars=int(os.environ.get("SESSION_RESULT_CHARS", "160")),
+        )
+
+    def stats(self) -> dict:
+        return {
+            "turns": len(self.turns) + len(self.summary_lines) + self.omitted,
+            "recent_turns": len(self.turns),
+            "folded_turns": len(self.summary_lines) + self.omitted,
+            "history_tokens": sum(turn.tokens for turn in self.turns),
+            "summary_tokens": estimate_tokens(self._summary()),
+            "compactions": self.compactions,
+            "results": len(self.results),
+        }
+
+    async def ask(self, user_message: str) -> str:
+        """Answer the next message of the conversation; turns run one at a time."""
+        async with self._lock:
+            return await support_agent_async(user_message, session=self)
+
+    def result(self, ref: str) -> str:
+        """Full text of a tool result the history refers to by `ref`."""
+        ref = ref.strip("[]")
+        if ref not in self.results:
+            return f"Error: No stored tool result {ref}; it may be too old to keep."
+        return self.results[ref]
+
+    # --- Hooks for support_agent_async ---
+    def prompt(self, user_message: str) -> list[dict]:
+        """Messages for a request: system prompt, summary, recent turns, then the new message."""
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}, *self._summary()]
+        for turn in self.turns:
+            messages.extend(turn.messages)
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+    def record(self, messages: list, answer: str):
+        """Store a finished turn (its user message and rounds) in compact form."""
+        compact = []
+        for message in messages:
+            message = message if isinstance(message, dict) else to_jsonable(message)
+            if message["role"] == "tool":
+                message = {**message, "content": self._store(message["content"])}
+            elif message.get("tool_calls"):
+                message = {"role": "assistant", "content": message.get("content"), "tool_calls": message["tool_calls"]}
+            compact.append(message)
+        compact.append({"role": "assistant", "content": answer})
+        self.turns.append(Turn(messages[0]["content"], answer, compact))
+        if sum(turn.tokens for turn in self.turns) > self.history_tokens:
+            self._compact()
+
+    # --- Compaction ---
+    def _store(self, content: str) -> str:
+        self._refs += 1
+        ref = f"R{self._refs}"
+        self.results[ref] = content
+        while len(self.results) > self.max_results:
+            self.results.popitem(last=False)
+        if len(content) <= self.result_chars:
+            return f"[{ref}] {content}"
+        return f"[{ref}] {content[:self.result_chars]}… ({len(content) - self.result_chars} more chars)"
+
+    def _compact(self):
+        self.compactions += 1
+        tokens = sum(turn.tokens for turn in self.turns)
+        while len(self.turns) > 1 and tokens > self.history_tokens // 2:
+            turn = self.turns.pop(0)
+            tokens -= turn.tokens
+            self.summary_lines.append(f"- Customer: {_clip(turn.user_message, 120)} | Agent: {_clip(turn.answer, 200)}")
+        while self.summary_lines and estimate_tokens(self._summary()) > self.summary_tokens:
+            self.summary_lines.pop(0)
+            self.omitted += 1
+
+    def _summary(self) -> list[dict]:
+        if not self.summary_lines and not self.omitted:
+            return []
+        lines = ["Summary of earlier turns in this conversation:"]
+        if self.omitted:
+            lines.append(f"({self.omitted} earlier turns omitted)")
+        return [{"role": "system", "content": "\n".join(lines + self.summary_lines)}]
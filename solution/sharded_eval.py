@@ -0,0 +1,532 @@
+"""Run one eval file across worker processes, or machines sharing a directory.
+
+A single `Eval` runs every row on one event loop in one process. Here the
+dataset is split into shards by a stable hash of each row's id (init.row_id:
+its own id, or a digest of its whole content), and each shard is its own
+`EvalAsync` run that appends to one shared experiment (update=True). Rows
+from every worker therefore land in the same experiment, with their traces,
+and the experiment summary covers all of them.
+
+Planning reads the dataset once and writes each shard's rows to the run
+directory. A worker process imports the eval file once, for its task and
+scorers, and runs every shard it claims from those files.
+
+Workers coordinate only through files in the run directory:
+    plan.json                 eval file, shard count, experiment name
+    shard-0007.data.jsonl     the shard's rows, keyed in metadata["shard_row"]
+    shard-0007.attempt-1      claim, created with O_EXCL and kept fresh by a
+                              heartbeat; stale after `lease` seconds
+    shard-0007.attempt-1.failed   the attempt raised or its process died
+    shard-0007.attempt-1.rows     keys of the rows the attempt has logged so far
+    shard-0007.jsonl          per-row results of the attempt that finished
+    shard-0007.done           that attempt's summary (rows, errors, score sums)
+    worker-<host>-<pid>.log   a worker's stderr: progress bars and tracebacks
+
+A shard whose latest attempt failed or went stale is claimed again under the
+next attempt number, up to `attempts`, so a failed shard is retried on its
+own without rerunning the others. On every heartbeat an attempt flushes the
+experiment logs and appends the rows it finished before the previous beat
+to its .rows journal. A retry skips every row in earlier attempts' journals,
+so no row is logged to the experiment twice; every row carries `shard`,
+`shard_attempt` and `shard_row` metadata. `merge` adds up the done summaries
+into one. Rows kept from an abandoned attempt count toward `rows` (as
+`reused`), but their scores are only in the experiment.
+
+Machines sharing the run directory also need the same checkout.
+
+Usage:
+    python -m solution.sharded_eval run solution/eval_agent.py --workers 8
+    # or across machines that share /mnt/evals/run-1:
+    python -m solution.sharded_eval plan solution/eval_agent.py --dir /mnt/evals/run-1 --shards 64
+    python -m solution.sharded_eval work --dir /mnt/evals/run-1 --processes 8   # on each machine
+    python -m solution.sharded_eval merge --dir /mnt/evals/run-1
+"""
+
+import argparse
+import asyncio
+import hashlib
+import inspect
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import runpy
+import socket
+import sys
+import threading
+import time
+import traceback
+import warnings
+from collections.abc import Iterable
+from importlib.metadata import version
+
+import braintrust
+from braintrust import EvalAsync
+from braintrust.framework import ReporterDef
+
+from init import row_id
+
+# Newest braintrust release whose private eval-loading hooks were checked
+BRAINTRUST_CHECKED = (0, 5)
+
+# Shard runs report through merge(), not one summary table per shard
+QUIET = ReporterDef(
+    name="shard",
+    report_eval=lambda evaluator, result, verbose, jsonl: result,
+    report_run=lambda results, verbose, jsonl: True,
+)
+
+
+def row_key(row: dict) -> str:
+    """The row's id as init.py assigns it: its own, or a digest of its whole content."""
+    return str(row_id(row))
+
+
+def shard_of(row: dict, shards: int) -> int:
+    digest = hashlib.sha256(row_key(row).encode()).digest()
+    return int.from_bytes(digest[:8], "big") % shards
+
+
+def _import_evaluators(path: str) -> list:
+    """The Evaluators an eval file defines, imported without running them.
+
+    braintrust has no public API for this. `braintrust eval` uses the private
+    framework._evals registry and _set_lazy_load, and so does this function,
+    the only place that touches them.
+    """
+    installed = version("braintrust")
+    try:
+        from braintrust.framework import _evals, _set_lazy_load
+    except ImportError as e:
+        raise RuntimeError(f"braintrust {installed} no longer has the eval-loading hooks sharded_eval relies on") from e
+    if tuple(int(part) for part in installed.split(".")[:2]) > BRAINTRUST_CHECKED:
+        warnings.warn(f"sharded_eval loads eval files through braintrust internals last checked on {BRAINTRUST_CHECKED}, not {installed}")
+    _evals.clear()
+    with _set_lazy_load(True):
+        runpy.run_path(path, run_name="__sharded_eval__")
+    evaluators = [instance.evaluator for instance in _evals.evaluators.values()]
+    _evals.clear()
+    return evaluators
+
+
+def load_evaluator(path: str):
+    """Import an eval file the way `braintrust eval` does and return its Evaluator."""
+    evaluators = _import_evaluators(path)
+    if len(evaluators) != 1:
+        raise ValueError(f"{path} defines {len(evaluators)} evals; sharding needs exactly one")
+    return evaluators[0]
+
+
+def eval_rows(evaluator) -> Iterable[dict]:
+    data = evaluator.data
+    if callable(data) and not isinstance(data, Iterable):
+        data = data()
+    if not isinstance(data, Iterable):
+        raise ValueError("Sharding needs eval data that can be iterated synchronously (not EVAL_SAMPLE=stratified)")
+    return data
+
+
+def _keyed(rows: Iterable[dict]) -> Iterable[dict]:
+    """Carry each row's key in its metadata, where the task can see it."""
+    for row in rows:
+        yield {**row, "metadata": {**(row.get("metadata") or {}), "shard_row": row_key(row)}}
+
+
+def _tagged(task, shard: int, attempt: int, finished: list):
+    """Wrap the eval task so each row records the shard attempt that produced it.
+
+    The keys of rows whose task returned go on `finished`, for the journal.
+    """
+    takes_hooks = len(inspect.signature(task).parameters) == 2
+
+    async def tagged(input, hooks):
+        hooks.metadata.update(shard=shard, shard_attempt=attempt)
+        output = task(input, hooks) if takes_hooks else task(input)
+        output = await output if inspect.isawaitable(output) else output
+        finished.append(hooks.metadata["shard_row"])
+        return output
+
+    return tagged
+
+
+class ShardedRun:
+    def __init__(self, directory: str, lease: float = 60.0, attempts: int = 3):
+        self.directory = directory
+        self.lease = lease
+        self.attempts = attempts
+
+    # --- Plan ---
+    def plan(
+        self,
+        eval_file: str,
+        shards: int,
+        experiment: str | None = None,
+        no_send_logs: bool = False,
+        concurrency: int | None = None,
+    ) -> dict:
+        """Split the eval's rows into shard files and write plan.json; the only read of the dataset."""
+        os.makedirs(self.directory, exist_ok=True)
+        evaluator = load_evaluator(eval_file)
+        self.split(eval_rows(evaluator), shards)
+        plan = {
+            "eval_file": eval_file,
+            "shards": shards,
+            "experiment": experiment or f"{evaluator.project_name}-sharded-{time.strftime('%Y%m%d-%H%M%S')}",
+            "no_send_logs": no_send_logs,
+            "concurrency": concurrency,
+        }
+        self._write_json("plan.json", plan)
+        return plan
+
+    def split(self, rows: Iterable[dict], shards: int):
+        """Stream `rows` into one data file per shard."""
+        names = [f"shard-{shard:04d}.data.jsonl" for shard in range(shards)]
+        files = [open(self._path(f"{name}.{os.getpid()}.partial"), "w") for name in names]
+        try:
+            for row in _keyed(rows):
+                files[shard_of(row, shards)].write(json.dumps(row, default=str) + "\n")
+        finally:
+            for f in files:
+                f.close()
+        for name in names:
+            os.replace(self._path(f"{name}.{os.getpid()}.partial"), self._path(name))
+
+    def shard_rows(self, shard: int) -> Iterable[dict]:
+        with open(self._path(f"shard-{shard:04d}.data.jsonl")) as f:
+            for line in f:
+                yield json.loads(line)
+
+    def load_plan(self) -> dict:
+        with open(self._path("plan.json")) as f:
+            return json.load(f)
+
+    # --- Claims ---
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _claim_path(self, shard: int, attempt: int) -> str:
+        return self._path(f"shard-{shard:04d}.attempt-{attempt}")
+
+    def _write_json(self, name: str, value):
+        partial = self._path(f"{name}.{os.getpid()}.partial")
+        with open(partial, "w") as f:
+            json.dump(value, f, default=str)
+        os.replace(partial, self._path(name))
+
+    def done(self, shard: int) -> bool:
+        return os.path.exists(self._path(f"shard-{shard:04d}.done"))
+
+    def _live(self, claim: str) -> bool:
+        if os.path.exists(claim + ".failed"):
+            return False
+        try:
+            return time.time() - os.path.getmtime(claim) < self.lease
+        except FileNotFoundError:
+            return False
+
+    def claim(self, shard: int) -> int | None:
+        """Take the next attempt of an unfinished shard, or None if it is done, running or out of attempts."""
+        if self.done(shard):
+            return None
+        for attempt in range(1, self.attempts + 1):
+            claim = self._claim_path(shard, attempt)
+            if os.path.exists(claim):
+                if self._live(claim):
+                    return None
+                continue
+            try:
+                fd = os.open(claim, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                return None
+            with os.fdopen(fd, "w") as f:
+                json.dump({"host": socket.gethostname(), "pid": os.getpid(), "started": time.time()}, f)
+            return attempt
+        return None
+
+    def logged(self, shard: int, attempt: int) -> set[str]:
+        """Keys of the rows that attempts before `attempt` logged to the experiment."""
+        keys = set()
+        for earlier in range(1, attempt):
+            try:
+                with open(self._claim_path(shard, earlier) + ".rows") as f:
+                    keys.update(json.loads(line) for line in f)
+            except FileNotFoundError:
+                continue
+        return keys
+
+    def fail(self, shard: int, attempt: int, reason: str):
+        with open(self._claim_path(shard, attempt) + ".failed", "w") as f:
+            f.write(reason)
+
+    def release(self, pid: int):
+        """Fail the unfinished claims of a local worker process that died."""
+        host = socket.gethostname()
+        plan = self.load_plan()
+        for shard in range(plan["shards"]):
+            if self.done(shard):
+                continue
+            for attempt in range(1, self.attempts + 1):
+                claim = self._claim_path(shard, attempt)
+                try:
+                    with open(claim) as f:
+                        owner = json.load(f)
+                except (FileNotFoundError, json.JSONDecodeError):
+                    continue
+                if owner["host"] == host and owner["pid"] == pid and self._live(claim):
+                    self.fail(shard, attempt, f"worker process {pid} exited")
+
+    def pending(self) -> list[int]:
+        return [shard for shard in range(self.load_plan()["shards"]) if not self.done(shard)]
+
+    def claimable(self) -> list[int]:
+        """Unfinished shards that nobody is running and that have attempts left."""
+        shards = []
+        for shard in self.pending():
+            claims = [self._claim_path(shard, attempt) for attempt in range(1, self.attempts + 1)]
+            taken = [claim for claim in claims if os.path.exists(claim)]
+            if len(taken) < self.attempts and not any(self._live(claim) for claim in taken):
+                shards.append(shard)
+        return shards
+
+    # --- Work ---
+    async def run_shard(self, shard: int, attempt: int, plan: dict, evaluator) -> dict:
+        claim = self._claim_path(shard, attempt)
+        stop = threading.Event()
+        logged = self.logged(shard, attempt)
+        finished = []  # row keys, in the order their tasks returned
+        journal = open(claim + ".rows", "a", buffering=1)
+        written = 0
+
+        def write_journal(upto: int):
+            nonlocal written
+            braintrust.flush()
+            journal.writelines(json.dumps(key) + "\n" for key in finished[written:upto])
+            written = max(written, upto)
+
+        def heartbeat():
+            # A row's output is logged on the event loop just after its task returns;
+            # the rows finished by the previous beat are surely logged by this one
+            ready = 0
+            while not stop.wait(self.lease / 3):
+                os.utime(claim)
+                write_journal(ready)
+                ready = len(finished)
+
+        beat = threading.Thread(target=heartbeat, daemon=True)
+        beat.start()
+        start = time.perf_counter()
+        try:
+            rows = (row for row in self.shard_rows(shard) if row["metadata"]["shard_row"] not in logged)
+            result = await EvalAsync(
+                evaluator.project_name,
+                data=rows,
+                task=_tagged(evaluator.task, shard, attempt, finished),
+                scores=evaluator.scores,
+                experiment_name=plan["experiment"],
+                update=True,
+                max_concurrency=plan.get("concurrency"),
+                summarize_scores=False,
+                no_send_logs=plan["no_send_logs"],
+                reporter=QUIET,
+            )
+        finally:
+            stop.set()
+            beat.join()
+            # Back on the event loop, every finished row has been logged
+            write_journal(len(finished))
+            journal.close()
+
+        summary = {
+            "shard": shard,
+            "attempt": attempt,
+            "host": socket.gethostname(),
+            "rows": len(logged),
+            "reused": len(logged),
+            "errors": 0,
+            "scores": {},
+        }
+        name = f"shard-{shard:04d}.jsonl"
+        partial = self._path(f"{name}.{attempt}.partial")
+        with open(partial, "w") as f:
+            for row in result.results:
+                summary["rows"] += 1
+                summary["errors"] += row.error is not None
+                for scorer, score in row.scores.items():
+                    if score is not None:
+                        total = summary["scores"].setdefault(scorer, [0.0, 0])
+                        total[0] += score
+                        total[1] += 1
+                f.write(json.dumps({
+                    "input": row.input,
+                    "expected": row.expected,
+                    "output": row.output,
+                    "scores": row.scores,
+                    "metadata": row.metadata,
+                    "error": None if row.error is None else repr(row.error),
+                }, default=str) + "\n")
+        os.replace(partial, self._path(name))
+        summary["seconds"] = time.perf_counter() - start
+        self._write_json(f"shard-{shard:04d}.done", summary)
+        return summary
+
+    def work(self) -> int:
+        """Claim and run shards until none are left to claim; return how many ran."""
+        # One event loop for every shard: the agent's and judge's clients keep pooled
+        # connections that belong to the loop they were opened on
+        return asyncio.run(self._work())
+
+    async def _work(self) -> int:
+        plan = self.load_plan()
+        evaluator = None  # imported on the first claim, then shared by every shard
+        ran = 0
+        claimed = True
+        while claimed:
+            claimed = False
+            for shard in range(plan["shards"]):
+                attempt = self.claim(shard)
+                if attempt is None:
+                    continue
+                claimed = True
+                try:
+                    evaluator = evaluator or load_evaluator(plan["eval_file"])
+                    await self.run_shard(shard, attempt, plan, evaluator)
+                    ran += 1
+                except Exception:
+                    self.fail(shard, attempt, traceback.format_exc())
+        return ran
+
+    def supervise(self, processes: int, initializer=None) -> list[int]:
+        """Run `processes` local workers, replacing any that die while shards remain; return unfinished shards."""
+        context = multiprocessing.get_context("spawn")
+
+        def start():
+            process = context.Process(target=_worker, args=(self.directory, self.lease, self.attempts, initializer))
+            process.start()
+            return process
+
+        running = {}
+        while True:
+            while len(running) < min(processes, len(self.claimable())):
+                process = start()
+                running[process.sentinel] = process
+            if not running:
+                return self.pending()
+            for sentinel in multiprocessing.connection.wait(list(running)):
+                process = running.pop(sentinel)
+                process.join()
+                if process.exitcode:
+                    self.release(process.pid)
+
+    # --- Merge ---
+    def merge(self) -> dict:
+        """Add up the finished shards' summaries and write summary.json."""
+        plan = self.load_plan()
+        merged = {
+            "experiment": plan["experiment"],
+            "shards": plan["shards"],
+            "rows": 0,
+            "reused": 0,
+            "errors": 0,
+            "scores": {},
+            "per_shard": [],
+            "unfinished": [],
+        }
+        totals = {}
+        for shard in range(plan["shards"]):
+            if not self.done(shard):
+                merged["unfinished"].append(shard)
+                continue
+            with open(self._path(f"shard-{shard:04d}.done")) as f:
+                summary = json.load(f)
+            merged["rows"] += summary["rows"]
+            merged["reused"] += summary["reused"]
+            merged["errors"] += summary["errors"]
+            for scorer, (total, count) in summary["scores"].items():
+                running = totals.setdefault(scorer, [0.0, 0])
+                running[0] += total
+                running[1] += count
+            merged["per_shard"].append({key: summary[key] for key in ("shard", "attempt", "host", "rows", "seconds")})
+        merged["scores"] = {scorer: {"mean": total / count, "count": count} for scorer, (total, count) in sorted(totals.items())}
+        self._write_json("summary.json", merged)
+        return merged
+
+
+def _worker(directory: str, lease: float, attempts: int, initializer=None):
+    # Progress bars and errors of several processes would interleave on one terminal
+    sys.stderr = open(os.path.join(directory, f"worker-{socket.gethostname()}-{os.getpid()}.log"), "a", buffering=1)
+    if initializer:
+        initializer()
+    ShardedRun(directory, lease, attempts).work()
+
+
+def run(
+    eval_file: str,
+    directory: str,
+    workers: int,
+    shards: int | None = None,
+    experiment: str | None = None,
+    concurrency: int | None = None,
+    no_send_logs: bool = False,
+    attempts: int = 3,
+    lease: float = 60.0,
+    initializer=None,
+) -> dict:
+    """Plan, run and merge a sharded eval on this machine."""
+    sharded = ShardedRun(directory, lease, attempts)
+    sharded.plan(eval_file, shards or workers * 4, experiment, no_send_logs, concurrency)
+    sharded.supervise(workers, initializer)
+    return sharded.merge()
+
+
+def print_summary(summary: dict):
+    print(f"{summary['experiment']}: {summary['rows']} rows, {summary['errors']} errors, "
+          f"{summary['shards'] - len(summary['unfinished'])}/{summary['shards']} shards")
+    for scorer, score in summary["scores"].items():
+        print(f"  {scorer:<24} {score['mean']:.3f} over {score['count']} rows")
+    retried = [shard for shard in summary["per_shard"] if shard["attempt"] > 1]
+    if retried:
+        print(f"  retried shards: {', '.join(str(shard['shard']) for shard in retried)}"
+              f" ({summary['reused']} rows kept from abandoned attempts)")
+    if summary["unfinished"]:
+        print(f"  unfinished shards: {', '.join(map(str, summary['unfinished']))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Plan, run and merge on this machine")
+    plan_parser = commands.add_parser("plan", help="Write the plan for workers sharing --dir")
+    for sub in (run_parser, plan_parser):
+        sub.add_argument("eval_file")
+        sub.add_argument("--shards", type=int, help="Default: 4 per worker")
+        sub.add_argument("--experiment")
+        sub.add_argument("--concurrency", type=int, help="Rows in flight per worker process")
+        sub.add_argument("--no-send-logs", action="store_true")
+    run_parser.add_argument("--workers", type=int, default=os.cpu_count())
+    work_parser = commands.add_parser("work", help="Run shards from --dir until none are left")
+    work_parser.add_argument("--processes", type=int, default=os.cpu_count())
+    commands.add_parser("merge", help="Merge the finished shards in --dir")
+    for sub in (run_parser, plan_parser, work_parser, commands.choices["merge"]):
+        sub.add_argument("--dir", default=".sharded_eval")
+        sub.add_argument("--attempts", type=int, default=3)
+        sub.add_argument("--lease", type=float, default=60.0, help="Seconds before a silent claim is taken over")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        summary = run(args.eval_file, args.dir, args.workers, args.shards, args.experiment, args.concurrency, args.no_send_logs, args.attempts, args.lease)
+    else:
+        sharded = ShardedRun(args.dir, args.lease, args.attempts)
+        if args.command == "plan":
+            plan = sharded.plan(args.eval_file, args.shards or 4 * os.cpu_count(), args.experiment, args.no_send_logs, args.concurrency)
+            print(json.dumps(plan, indent=2))
+            return
+        if args.command == "work":
+            sharded.supervise(args.processes)
+        summary = sharded.merge()
+    print_summary(summary)
+    sys.exit(1 if summary["unfinished"] else 0)
+
+
+if __name__ == "__main__":
+    main()
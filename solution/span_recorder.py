@@ -0,0 +1,87 @@
+"""In-process recorder of the agent's tool spans.
+
+Tools decorated with SPAN_RECORDER.tool record their name, arguments, output
+and timing under the root span id of the row they run in. Scorers get that
+recording back through RecordedTrace, which has the same get_configuration /
+get_spans interface as braintrust's LocalTrace. They can then read tool
+outputs without a backend round trip, even when the eval passes no trace at
+all (for example with no_send_logs=True).
+"""
+
+import functools
+import inspect
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from braintrust import current_span
+from braintrust.trace import SpanData
+
+
+def _row_key() -> str | None:
+    # Task, tool and scorer spans of one eval row share its root span id
+    return getattr(current_span(), "root_span_id", None)
+
+
+class RecordedTrace:
+    """Trace stand-in over locally recorded spans."""
+
+    def __init__(self, root_span_id: str, spans: list[SpanData]):
+        self.root_span_id = root_span_id
+        self.spans = spans
+
+    def get_configuration(self) -> dict[str, str]:
+        return {"object_type": "local", "object_id": "", "root_span_id": self.root_span_id}
+
+    async def get_spans(self, span_type: list[str] | None = None) -> list[SpanData]:
+        if not span_type:
+            return list(self.spans)
+        return [span for span in self.spans if span.span_attributes.get("type") in span_type]
+
+
+class SpanRecorder:
+    def __init__(self, max_rows: int = 1024):
+        self.max_rows = max_rows
+        self._rows = OrderedDict()  # root_span_id -> list[SpanData]
+        self._lock = threading.Lock()
+
+    def tool(self, fn):
+        """Record every call of `fn` as a tool span of the current row."""
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.time()
+            output = fn(*args, **kwargs)
+            end = time.time()
+            self.add(SpanData(
+                input=dict(signature.bind(*args, **kwargs).arguments),
+                output=output,
+                span_id=str(uuid.uuid4()),
+                span_attributes={"name": fn.__name__, "type": "tool"},
+                metrics={"start": start, "end": end},
+            ))
+            return output
+
+        return wrapper
+
+    def add(self, span: SpanData):
+        key = _row_key()
+        if key is None:
+            return
+        with self._lock:
+            self._rows.setdefault(key, []).append(span)
+            self._rows.move_to_end(key)
+            while len(self._rows) > self.max_rows:
+                self._rows.popitem(last=False)
+
+    def trace(self) -> RecordedTrace | None:
+        """Return the current row's recording, or None if nothing was recorded."""
+        key = _row_key()
+        with self._lock:
+            spans = self._rows.get(key)
+            return RecordedTrace(key, list(spans)) if spans else None
+
+
+SPAN_RECORDER = SpanRecorder()
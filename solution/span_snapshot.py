@@ -0,0 +1,48 @@
+"""Per-row snapshot of a trace's tool spans, shared by the trace-based scorers.
+
+Braintrust runs a row's scorers concurrently. The first scorer to ask for the
+row's tool spans starts the fetch and every other scorer awaits that same
+task, so a row costs one span fetch however many scorers read it.
+"""
+
+import asyncio
+from collections import OrderedDict
+
+from braintrust import current_span
+
+
+def _failed(task: asyncio.Future) -> bool:
+    return task.done() and (task.cancelled() or task.exception() is not None)
+
+
+class SpanSnapshots:
+    def __init__(self, max_rows: int = 1024):
+        self.max_rows = max_rows
+        self.fetches = 0
+        self.reads = 0
+        self._rows = OrderedDict()  # root_span_id -> [task, fetch count]
+
+    async def tool_spans(self, trace) -> list:
+        """Return the row's tool spans, fetching them at most once per row."""
+        key = trace.get_configuration()["root_span_id"]
+        # No await between lookup and insert, so concurrent scorers on one
+        # event loop can't both start a fetch
+        row = self._rows.get(key)
+        if row is None or _failed(row[0]):
+            fetch = asyncio.ensure_future(trace.get_spans(span_type=["tool"]))
+            row = self._rows[key] = [fetch, (row[1] if row else 0) + 1]
+            self.fetches += 1
+            while len(self._rows) > self.max_rows:
+                self._rows.popitem(last=False)
+        self._rows.move_to_end(key)
+        self.reads += 1
+
+        spans = await asyncio.shield(row[0])
+        current_span().log(metadata={"tool_span_fetches": row[1]})
+        return spans
+
+    def stats(self) -> dict:
+        return {"rows": len(self._rows), "fetches": self.fetches, "reads": self.reads}
+
+
+SPAN_SNAPSHOTS = SpanSnapshots()
@@ -0,0 +1,84 @@
+"""Canned replies for tool results that fully determine the answer.
+
+When every tool result of a round is terminal (an order that doesn't exist,
+a refund refused because of the order's status or an earlier refund) the
+model's next round would only rephrase it. ResponseTemplates recognizes those
+results by tool name and result pattern and writes the customer reply
+locally; any other result returns None and the model phrases the answer as
+usual.
+
+Off by default, since it changes the answers the eval measures; set
+AGENT_TEMPLATES=on to enable it.
+"""
+
+import os
+import re
+
+ORDER_NOT_FOUND = re.compile(r"^(?:Error: )?Order (?P<order_id>\S+) not found\.$")
+REFUND_INELIGIBLE = re.compile(
+    r"^Error: Order (?P<order_id>\S+) is '(?P<status>\w+)' and is not eligible for a refund\."
+)
+ALREADY_REFUNDED = re.compile(
+    r"^Error: Order (?P<order_id>\S+) was already refunded \((?P<amount>\$[\d.,]+) on (?P<date>[\d-]+)\)"
+)
+
+# (tool, result class, result pattern, reply template over the pattern's groups)
+TEMPLATES = [
+    (
+        "lookup_order",
+        "not_found",
+        ORDER_NOT_FOUND,
+        "I'm sorry, I couldn't find an order with the ID {order_id}. "
+        "Could you double-check the order number and try again?",
+    ),
+    (
+        "process_refund",
+        "not_found",
+        ORDER_NOT_FOUND,
+        "I'm sorry, I couldn't find an order with the ID {order_id}, so I wasn't able to process a refund. "
+        "Could you double-check the order number and try again?",
+    ),
+    (
+        "process_refund",
+        "ineligible",
+        REFUND_INELIGIBLE,
+        "I'm sorry, but order {order_id} is currently {status}, so it isn't eligible for a refund yet. "
+        "Only delivered orders can be refunded, so please reach out again once it has been delivered.",
+    ),
+    (
+        "process_refund",
+        "already_refunded",
+        ALREADY_REFUNDED,
+        "Order {order_id} was already refunded ({amount} on {date}), so it can't be refunded a second time.",
+    ),
+]
+
+
+class ResponseTemplates:
+    def __init__(self, templates: list = TEMPLATES, enabled: bool = False):
+        self.templates = templates
+        self.enabled = enabled
+
+    @classmethod
+    def from_env(cls) -> "ResponseTemplates":
+        return cls(enabled=os.environ.get("AGENT_TEMPLATES", "off") == "on")
+
+    def reply(self, results: list[tuple[str, str]]) -> tuple[str, list[str]] | None:
+        """Reply to a round's (tool name, result) pairs and name the matched result classes, or None."""
+        if not self.enabled or not results:
+            return None
+        replies = []
+        classes = []
+        for tool, result in results:
+            for name, result_class, pattern, template in self.templates:
+                match = pattern.match(result) if name == tool else None
+                if match:
+                    replies.append(template.format(**match.groupdict()))
+                    classes.append(f"{tool}:{result_class}")
+                    break
+            else:
+                return None
+        return " ".join(replies), classes
+
+
+RESPONSE_TEMPLATES = ResponseTemplates.from_env()
@@ -0,0 +1,278 @@
+"""Sampled, buffered export of production traces.
+
+Every @traced span hands its events to braintrust's background logger. With
+TRACE_EXPORT=sampled, TRACE_EXPORTER sits in front of that logger:
+
+- Span events go into a bounded queue. A full queue drops the event; the
+  request only sets it aside unread and never waits on tracing. The export
+  thread then reads which trace it belonged to and drops the rest of that
+  trace too (decision "incomplete"), so no trace is exported with spans
+  missing. At most TRACE_QUEUE_SIZE refused events are set aside per drain;
+  past that they are only counted.
+- A background thread drains the queue every TRACE_FLUSH_MS and groups
+  project-log events by trace (root_span_id) until the root span ends. Then
+  it keeps or drops the whole trace:
+      head   a TRACE_SAMPLE_RATE share of traces, chosen by a hash of the
+             trace id, so a trace is kept or dropped as a unit
+      error  any span in the trace logged an error
+      slow   the root span took at least TRACE_SLOW_MS
+  Kept traces are handed to braintrust's logger in batches of up to
+  TRACE_BATCH_SIZE events, for it to upload.
+- Experiment and dataset events (evals) pass straight through unsampled.
+
+A trace whose root hasn't ended within TRACE_TTL_S, or that is pushed out
+by more than `max_pending` newer open traces, is decided on what has arrived.
+At exit the queue is drained and every open trace is decided.
+
+Configured through the environment:
+    TRACE_EXPORT        sampled to enable (default off: braintrust's logger as is)
+    TRACE_SAMPLE_RATE   head sampling rate (default 0.1)
+    TRACE_SLOW_MS       root spans at least this slow are kept (default 5000)
+    TRACE_QUEUE_SIZE    queued span events before dropping (default 10000)
+    TRACE_BATCH_SIZE    events per hand-off to braintrust's logger (default 100)
+    TRACE_FLUSH_MS      how often the queue is drained (default 500)
+    TRACE_TTL_S         seconds an open trace waits for its root to end (default 300)
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import braintrust.logger
+from braintrust.util import LazyValue
+
+from solution.agent_metrics import METRICS
+
+TRACES = METRICS.counter(
+    "trace_export_traces_total", "Finished traces by export decision (head, error, slow, dropped, incomplete)"
+)
+DROPPED = METRICS.counter("trace_export_dropped_total", "Span events dropped because the export queue was full")
+
+
+def head_sampled(root_span_id: str, rate: float) -> bool:
+    return zlib.crc32(root_span_id.encode()) < rate * 2 ** 32
+
+
+class OpenTrace:
+    def __init__(self):
+        self.events = []
+        self.opened = time.monotonic()
+        self.error = False
+        self.start = None
+        self.end = None
+
+
+class TraceExporter:
+    def __init__(
+        self,
+        inner=None,
+        sample_rate: float = 0.1,
+        slow_seconds: float = 5.0,
+        queue_size: int = 10000,
+        batch_size: int = 100,
+        flush_interval: float = 0.5,
+        max_pending: int = 1000,
+        ttl: float = 300.0,
+    ):
+        self.inner = inner
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.passed_through = 0
+        self.exported = 0
+        self.batches = 0
+        self.decisions = {"head": 0, "error": 0, "slow": 0, "dropped": 0, "incomplete": 0}
+        self._pending = OrderedDict()  # root_span_id -> OpenTrace, oldest first
+        self._lost = []  # events the full queue refused, not yet read
+        self._lost_lock = threading.Lock()
+        self._max_lost = queue_size
+        self._lost_count = 0  # refused since the last drain, set aside or not
+        self._decided = OrderedDict()  # root_span_id -> kept, for events that arrive late
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @classmethod
+    def from_env(cls) -> "TraceExporter | None":
+        if os.environ.get("TRACE_EXPORT", "off") != "sampled":
+            return None
+        return cls(
+            sample_rate=float(os.environ.get("TRACE_SAMPLE_RATE", "0.1")),
+            slow_seconds=float(os.environ.get("TRACE_SLOW_MS", "5000")) / 1000,
+            queue_size=int(os.environ.get("TRACE_QUEUE_SIZE", "10000")),
+            batch_size=int(os.environ.get("TRACE_BATCH_SIZE", "100")),
+            flush_interval=float(os.environ.get("TRACE_FLUSH_MS", "500")) / 1000,
+            ttl=float(os.environ.get("TRACE_TTL_S", "300")),
+        )
+
+    def install(self, state=None) -> "TraceExporter":
+        """Put this exporter in front of braintrust's current background logger."""
+        state = state or braintrust.logger._state
+        if self.inner is None:
+            self.inner = state._global_bg_logger.get()
+        state._global_bg_logger = LazyValue(lambda: self, use_mutex=False)
+        atexit.register(self.close)
+        return self
+
+    def stats(self) -> dict:
+        return {
+            "dropped": self.dropped,
+            "exported": self.exported,
+            "passed_through": self.passed_through,
+            "batches": self.batches,
+            "open_traces": len(self._pending),
+            "queued": self.queue.qsize(),
+            **self.decisions,
+        }
+
+    # --- braintrust background logger interface ---
+    def log(self, *events):
+        if self._thread is None:
+            self._start()
+        for event in events:
+            try:
+                self.queue.put_nowait(event)
+            except queue.Full:
+                # Reading the record here could make the request wait on it
+                with self._lost_lock:
+                    self._lost_count += 1
+                    if len(self._lost) < self._max_lost:
+                        self._lost.append(event)
+
+    def flush(self, batch_size: int | None = None):
+        self._drain(final=False)
+        self.inner.flush()
+
+    def close(self):
+        self._drain(final=True)
+        self.inner.flush()
+
+    def set_masking_function(self, masking_function):
+        self.inner.set_masking_function(masking_function)
+
+    def enforce_queue_size_limit(self, enforce: bool):
+        self.inner.enforce_queue_size_limit(enforce)
+
+    def internal_replace_api_conn(self, api_conn):
+        self.inner.internal_replace_api_conn(api_conn)
+
+    # --- Export thread ---
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        # Waking per event would compete with requests for the GIL; drain in bulk
+        while True:
+            time.sleep(self.flush_interval)
+            self._drain(final=False)
+
+    def _drain(self, final: bool):
+        with self._lock:
+            batch = []
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            with self._lost_lock:
+                lost, self._lost = self._lost, []
+                lost_count, self._lost_count = self._lost_count, 0
+            if lost_count:
+                self.dropped += lost_count
+                with METRICS.lock:
+                    DROPPED.inc(lost_count)
+            for root in {self._root(event) for event in lost} - {None}:
+                self._drop_incomplete(root)
+            out = []
+            for event in batch:
+                self._route(event, out)
+            now = time.monotonic()
+            while self._pending:
+                root, trace = next(iter(self._pending.items()))
+                if not final and len(self._pending) <= self.max_pending and now - trace.opened < self.ttl:
+                    break
+                self._decide(root, out)
+            for start in range(0, len(out), self.batch_size):
+                self.inner.log(*out[start:start + self.batch_size])
+                self.batches += 1
+            self.exported += len(out)
+
+    def _route(self, event, out: list):
+        try:
+            record = event.get()
+        except Exception:
+            # braintrust's logger reports records it can't compute; let it
+            out.append(event)
+            return
+        root = record.get("root_span_id")
+        if record.get("log_id") != "g" or not root:
+            self.passed_through += 1
+            out.append(event)
+            return
+        if root in self._decided:
+            if self._decided[root]:
+                out.append(event)
+            return
+        trace = self._pending.get(root)
+        if trace is None:
+            trace = self._pending[root] = OpenTrace()
+        trace.events.append(event)
+        trace.error = trace.error or bool(record.get("error"))
+        if record.get("span_id") == root:
+            metrics = record.get("metrics") or {}
+            trace.start = metrics.get("start", trace.start)
+            trace.end = metrics.get("end", trace.end)
+            if trace.end is not None:
+                self._decide(root, out)
+
+    @staticmethod
+    def _root(event) -> str | None:
+        try:
+            return event.get().get("root_span_id")
+        except Exception:
+            return None
+
+    def _drop_incomplete(self, root: str):
+        if root in self._decided:
+            return  # a kept trace already went out; a dropped one stays dropped
+        self._pending.pop(root, None)
+        self.decisions["incomplete"] += 1
+        with METRICS.lock:
+            TRACES.inc(decision="incomplete")
+        self._remember(root, False)
+
+    def _remember(self, root: str, kept: bool):
+        self._decided[root] = kept
+        while len(self._decided) > 10 * self.max_pending:
+            self._decided.popitem(last=False)
+
+    def _decide(self, root: str, out: list):
+        trace = self._pending.pop(root)
+        if head_sampled(root, self.sample_rate):
+            reason = "head"
+        elif trace.error:
+            reason = "error"
+        elif trace.start is not None and trace.end is not None and trace.end - trace.start >= self.slow_seconds:
+            reason = "slow"
+        else:
+            reason = "dropped"
+        self.decisions[reason] += 1
+        with METRICS.lock:
+            TRACES.inc(decision=reason)
+        self._remember(root, reason != "dropped")
+        if reason != "dropped":
+            out.extend(trace.events)
+
+
+TRACE_EXPORTER = TraceExporter.from_env()